@@ -0,0 +1,251 @@
+# backend/app/answer_cache.py
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+
+import numpy as np
+
+
+class SemanticAnswerCache:
+    """Reuse generated answers for near-duplicate questions.
+
+    Entries are scoped by platform and matched by cosine similarity between
+    query embeddings. Entries expire after ``ttl_seconds`` and the oldest are
+    evicted once ``max_entries`` is exceeded.
+
+    With ``db_path`` set, answers are also written to a SQLite file and every
+    lookup first pulls in rows added by other worker processes.
+    """
+
+    # Trim expired and excess rows from the SQLite file once every this many stores
+    TRIM_EVERY = 100
+
+    def __init__(self, threshold: float = 0.97, ttl_seconds: float = 3600, max_entries: int = 1000,
+                 db_path: Optional[str] = None):
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # entry id -> entry, oldest first
+        self._matrices = {}  # platform -> {dimension: (entry ids, normalized embedding matrix)}
+        self._next_id = -1
+        self._lock = threading.Lock()
+        self._db = None
+        self._synced_id = 0  # highest SQLite row id already pulled into memory
+        self._stores = 0
+
+        self.hits = 0
+        self.misses = 0
+
+        if db_path and self.enabled:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS answers ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, platform TEXT NOT NULL, embedding BLOB NOT NULL, "
+                    "response TEXT NOT NULL, sources_used INTEGER NOT NULL, created_at REAL NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Shared answer cache disabled: {e}")
+                self._db = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    @property
+    def persistent(self) -> bool:
+        """True when lookups and stores touch the shared SQLite file"""
+        return self._db is not None
+
+    @staticmethod
+    def _platform_key(platform: Optional[str]) -> str:
+        return platform or ""
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        if not norm:
+            return None
+        return vector / norm
+
+    def lookup(self, embedding: List[float], platform: Optional[str] = None) -> Optional[Dict]:
+        """Return the closest unexpired answer above the threshold, or None"""
+        if not self.enabled or not embedding:
+            return None
+        query = self._normalize(embedding)
+        if query is None:
+            return None
+
+        key = self._platform_key(platform)
+        with self._lock:
+            self._sync()
+            self._expire()
+            ids, matrix = self._matrix_for(key, query.shape[0])
+            if not ids:
+                self.misses += 1
+                return None
+
+            similarities = matrix @ query
+            best = int(np.argmax(similarities))
+            similarity = float(similarities[best])
+            if similarity < self.threshold:
+                self.misses += 1
+                return None
+
+            entry = self._entries[ids[best]]
+            if entry["created_at"] < time.time() - self.ttl_seconds:
+                # Pulled from another worker out of order and already stale
+                self.misses += 1
+                return None
+
+            self.hits += 1
+            return {
+                "response": entry["response"],
+                "sources_used": entry["sources_used"],
+                "similarity": similarity
+            }
+
+    def preload(self) -> int:
+        """Pull unexpired shared answers into memory ahead of the first lookup; returns the count"""
+        if not self.enabled:
+            return 0
+        with self._lock:
+            self._sync()
+            self._expire()
+            return len(self._entries)
+
+    def store(self, embedding: List[float], platform: Optional[str], response: str, sources_used: int):
+        """Remember an answer for future near-duplicate questions"""
+        if not self.enabled or not embedding:
+            return
+        vector = self._normalize(embedding)
+        if vector is None:
+            return
+
+        key = self._platform_key(platform)
+        created_at = time.time()
+        with self._lock:
+            entry_id = None
+            if self._db is not None:
+                entry_id = self._write(key, vector, response, sources_used, created_at)
+            if entry_id is None:
+                entry_id = self._next_id
+                self._next_id -= 1  # local-only ids are negative so they never clash with row ids
+            self._add(entry_id, key, vector, response, sources_used, created_at)
+
+    def _add(self, entry_id: int, key: str, vector: np.ndarray, response: str, sources_used: int, created_at: float):
+        self._entries[entry_id] = {
+            "platform": key,
+            "embedding": vector,
+            "response": response,
+            "sources_used": sources_used,
+            "created_at": created_at
+        }
+        self._matrices.pop(key, None)
+
+        while len(self._entries) > self.max_entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._matrices.pop(evicted["platform"], None)
+
+    def _write(self, key: str, vector: np.ndarray, response: str, sources_used: int, created_at: float) -> Optional[int]:
+        """Insert an answer into the shared SQLite file and return its row id"""
+        try:
+            cursor = self._db.execute(
+                "INSERT INTO answers (platform, embedding, response, sources_used, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, vector.astype(np.float32).tobytes(), response, sources_used, created_at)
+            )
+            self._stores += 1
+            if self._stores % self.TRIM_EVERY == 0:
+                self._db.execute(
+                    "DELETE FROM answers WHERE created_at < ? OR id <= ?",
+                    (created_at - self.ttl_seconds, cursor.lastrowid - self.max_entries)
+                )
+            self._db.commit()
+            return cursor.lastrowid
+        except sqlite3.Error as e:
+            print(f"Error writing shared answer cache: {e}")
+            return None
+
+    def _sync(self):
+        """Pull answers stored by other workers since the last lookup"""
+        if self._db is None:
+            return
+        try:
+            rows = self._db.execute(
+                "SELECT id, platform, embedding, response, sources_used, created_at FROM answers "
+                "WHERE id > ? AND created_at >= ? ORDER BY id",
+                (self._synced_id, time.time() - self.ttl_seconds)
+            ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading shared answer cache: {e}")
+            return
+        for entry_id, key, blob, response, sources_used, created_at in rows:
+            if entry_id not in self._entries:
+                self._add(entry_id, key, np.frombuffer(blob, dtype=np.float32), response, sources_used, created_at)
+        if rows:
+            self._synced_id = rows[-1][0]
+
+    def _expire(self):
+        """Drop entries older than the TTL (entries are kept in insertion order)"""
+        cutoff = time.time() - self.ttl_seconds
+        while self._entries:
+            entry_id, entry = next(iter(self._entries.items()))
+            if entry["created_at"] >= cutoff:
+                break
+            del self._entries[entry_id]
+            self._matrices.pop(entry["platform"], None)
+
+    def _matrix_for(self, key: str, dimension: int):
+        """Stacked embeddings for one platform, rebuilt lazily after changes.
+
+        Only entries of the query's dimension are compared; others were
+        embedded by a different provider.
+        """
+        matrices = self._matrices.setdefault(key, {})
+        cached = matrices.get(dimension)
+        if cached is None:
+            ids = [
+                entry_id for entry_id, entry in self._entries.items()
+                if entry["platform"] == key and entry["embedding"].shape[0] == dimension
+            ]
+            if ids:
+                matrix = np.stack([self._entries[entry_id]["embedding"] for entry_id in ids])
+            else:
+                matrix = np.empty((0, dimension), dtype=np.float32)
+            cached = (ids, matrix)
+            matrices[dimension] = cached
+        return cached
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for measuring generation savings"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "threshold": self.threshold,
+                "ttl_seconds": self.ttl_seconds,
+                "persistent": self._db is not None
+            }
+
+    def clear(self):
+        """Forget every cached answer"""
+        with self._lock:
+            self._entries.clear()
+            self._matrices.clear()
+            if self._db is not None:
+                try:
+                    self._db.execute("DELETE FROM answers")
+                    self._db.commit()
+                except sqlite3.Error as e:
+                    print(f"Error clearing shared answer cache: {e}")
@@ -1,109 +1,469 @@
 # backend/app/chatbot.py
 import os
-import json
-import chromadb
-from typing import List, Dict, Optional
-import openai
+import time
+import asyncio
+import functools
+import threading
+import contextlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple, AsyncIterator, Awaitable, Callable
 from datetime import datetime
 from dotenv import load_dotenv
 
+from app.embedding_cache import EmbeddingCache, normalize_text
+from app.answer_cache import SemanticAnswerCache
+from app.processed_store import ProcessedStore
+from app.conversation_store import create_conversation_store
+from app.singleflight import SingleFlight
+from app import upstream
+from app.embeddings import create_provider
+from app.context_packer import (
+    count_tokens, pack_history, select_sections, CONTEXT_CANDIDATES, HISTORY_MAX_TURNS, PROMPT_TOKEN_BUDGET
+)
+from app.retrieval import create_backend, content_snapshot, content_version, empty_results, fuse_results, LexicalRetriever, RETRIEVAL_MODE
+from app.workers import MULTI_WORKER, CONTENT_RELOAD_INTERVAL, PROCESSED_CONTENT_PATH, file_lock
+from app import metrics
+
 load_dotenv()
 
+# Session used when callers of the Python API do not pass one
+DEFAULT_SESSION = "default"
+FALLBACK_RESPONSE = "I'm having trouble generating a response right now. Please try again in a moment."
+# Used when the model is unavailable but the knowledge base had relevant sections
+DEGRADED_RESPONSE_NOTICE = ("I can't reach my tutoring model right now, so here is what the knowledge base "
+                            "says about this. Please ask again in a moment for a full explanation.")
+# Characters quoted from each section in a degraded response
+DEGRADED_EXCERPT_CHARS = 600
+
+# Maximum number of /chat conversations processed concurrently per worker
+CHAT_MAX_CONCURRENCY = int(os.getenv("CHAT_MAX_CONCURRENCY", "64"))
+# Completions generated concurrently for one batch
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "8"))
+# Threads used to run blocking vector-store queries off the event loop
+VECTOR_QUERY_WORKERS = int(os.getenv("VECTOR_QUERY_WORKERS", "8"))
+# Query embedding cache: in-memory LRU size and optional SQLite file ("" disables the disk tier)
+EMBEDDING_CACHE_SIZE = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+EMBEDDING_CACHE_DB_PATH = os.getenv(
+    "EMBEDDING_CACHE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(os.getenv("CHROMA_DB_PATH", "./data/chromadb"))), "embedding_cache.sqlite3")
+)
+# Semantic answer cache: minimum cosine similarity, entry lifetime and size (0 disables it)
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.97"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "1000"))
+# SQLite file sharing cached answers between workers ("" keeps them per process)
+ANSWER_CACHE_DB_PATH = os.getenv(
+    "ANSWER_CACHE_DB_PATH",
+    os.path.join(os.path.dirname(EMBEDDING_CACHE_DB_PATH or "./data/"), "answer_cache.sqlite3") if MULTI_WORKER else ""
+)
+
+# Tutor instructions; the knowledge base and history are packed in by build_prompt
+SYSTEM_PROMPT_TEMPLATE = """You are CyberMentor, a friendly and knowledgeable cybersecurity tutor designed to help beginners learn cybersecurity concepts.
+
+Your personality:
+- Encouraging and supportive
+- Enthusiastic about cybersecurity
+- Patient with beginners
+- Use analogies and real-world examples
+- Avoid overwhelming technical jargon
+
+Platform context: {platform_context}
+
+Your teaching approach:
+1. Start with a simple, clear explanation
+2. Use analogies when helpful (like comparing buffer overflows to overfilling a cup)
+3. Connect concepts to real-world cybersecurity incidents
+4. Provide practical next steps for learning
+5. Encourage hands-on practice
+
+Available knowledge base:
+{context_text}
+
+Recent conversation context:
+{history_context}
+
+Guidelines:
+- Keep responses under 300 words for better readability
+- Use bullet points for lists or steps
+- Include encouragement and motivation
+- If you don't know something, admit it and suggest how to find out
+- Always relate concepts back to practical cybersecurity skills"""
+
+# Chat format overhead of a system + user message pair
+MESSAGE_OVERHEAD_TOKENS = 9
+
 class CybersecurityChatbot:
     def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-        self.chroma_client = chromadb.PersistentClient(path=os.getenv("CHROMA_DB_PATH", "./data/chromadb"))
-        self.collection_name = "cybersec_content"
+        # Shared, pooled clients; calls go through the deadline/retry/breaker policy in app.upstream
+        self.openai_client = upstream.get_openai_client()
+        self.async_openai_client = upstream.get_async_openai_client()
+        # Query embeddings (EMBEDDING_PROVIDER); None, or why the loaded content cannot be vector-searched with them
+        self.embedder = create_provider()
+        self.embedding_mismatch = None
+        # Vector search backend (RETRIEVAL_BACKEND: chroma or numpy)
+        self.retriever = create_backend()
+        # BM25 index over the same content, loaded lazily on first use
+        self.lexical = None
+        # Content as configured (a store path) and as loaded (the store, or its legacy JSON file),
+        # and its version, polled so every worker picks up new generations
+        self.content_base = None
+        self.content_path = None
+        self.content_version = None
+        self._next_reload_check = 0.0
+        self._reload_lock = threading.Lock()
         
-        # Initialize or get collection
-        try:
-            self.collection = self.chroma_client.get_collection(name=self.collection_name)
-        except:
-            self.collection = self.chroma_client.create_collection(name=self.collection_name)
+        # Per-session, bounded history (CONVERSATION_STORE: memory or sqlite)
+        self.conversations = create_conversation_store()
+        self.embedding_cache = EmbeddingCache(
+            max_entries=EMBEDDING_CACHE_SIZE,
+            db_path=EMBEDDING_CACHE_DB_PATH or None
+        )
+        self.answer_cache = SemanticAnswerCache(
+            threshold=ANSWER_CACHE_THRESHOLD,
+            ttl_seconds=ANSWER_CACHE_TTL,
+            max_entries=ANSWER_CACHE_SIZE,
+            db_path=ANSWER_CACHE_DB_PATH or None
+        )
+        
+        # Identical concurrent requests share one embedding call and one retrieval + completion
+        self.embedding_flight = SingleFlight("embedding")
+        self.generation_flight = SingleFlight("generation")
         
-        self.conversation_history = []
+        # Async pipeline: bound in-flight chats and keep vector queries and SQLite reads off the event loop
+        self._chat_semaphore = asyncio.Semaphore(CHAT_MAX_CONCURRENCY)
+        self._query_executor = ThreadPoolExecutor(
+            max_workers=VECTOR_QUERY_WORKERS,
+            thread_name_prefix="vector-query"
+        )
+        # Cache writes (SQLite commits) run one at a time in the background, never on the event loop
+        self._write_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="cache-writer")
         
     def load_processed_content(self, content_path: str):
-        """Load processed content and add to vector database"""
-        if not os.path.exists(content_path):
-            print(f"Content file not found: {content_path}")
-            return
+        """Load processed content into the retrieval backend.
         
-        with open(content_path, 'r', encoding='utf-8') as f:
-            processed_content = json.load(f)
-        
-        # Add each section to the vector database
-        documents = []
-        embeddings = []
-        metadatas = []
-        ids = []
-        
-        for file_data in processed_content:
-            for i, section in enumerate(file_data["sections"]):
-                if section.get("embedding"):  # Only add sections with embeddings
-                    documents.append(section["content"])
-                    embeddings.append(section["embedding"])
-                    
-                    metadata = {
-                        "title": file_data["title"],
-                        "heading": section["heading"],
-                        "platform": file_data["metadata"]["platform"],
-                        "difficulty": file_data["metadata"]["difficulty"],
-                        "topics": ",".join(file_data["metadata"]["topics"]),
-                        "word_count": section["word_count"],
-                        "file_path": file_data["file_path"]
-                    }
-                    metadatas.append(metadata)
-                    ids.append(f"{file_data['title'].replace(' ', '_')}_{i}")
-        
-        # Add to collection in batches
-        batch_size = 100
-        for i in range(0, len(documents), batch_size):
-            batch_end = min(i + batch_size, len(documents))
-            
-            self.collection.add(
-                documents=documents[i:batch_end],
-                embeddings=embeddings[i:batch_end],
-                metadatas=metadatas[i:batch_end],
-                ids=ids[i:batch_end]
-            )
+        content_path names a processed store; its legacy JSON file is used
+        until the store exists. reload_content keeps checking content_path,
+        so a store created later (e.g. by /admin/process-content) is swapped in.
+        """
+        self.content_base = content_path
+        # Every index reads the same generation, even if a new one is activated meanwhile
+        path, store, version = content_snapshot(content_path)
+        # Workers starting together take turns, so only one syncs Chroma or builds the NumPy index
+        with file_lock(content_path + ".lock"):
+            self.retriever.load(path, store)
+        self.lexical = LexicalRetriever(path, store)
+        self.embedding_mismatch = self._check_embeddings(store)
+        self.content_path = path
+        self.content_version = version
+    
+    def _check_embeddings(self, store: Optional[ProcessedStore]) -> Optional[str]:
+        """Why the vectors of a store generation cannot be compared with our query embeddings, or None"""
+        mismatch = self.embedder.mismatch(store.embedding_info if store is not None else None)
+        if mismatch:
+            print(f"Vector search disabled until the content is re-ingested ({mismatch}); using the lexical index")
+        return mismatch
+    
+    def reload_content(self, wait: bool = False) -> bool:
+        """Swap in newly processed content if its version changed; returns True if reloaded.
+        
+        The new index is loaded next to the old one, which keeps serving
+        queries until the references are swapped. Queries already running
+        finish on the snapshot they started with. With wait=False the call
+        returns right away if another reload is in progress.
+        """
+        if self.content_base is None or not self._reload_lock.acquire(blocking=wait):
+            return False
+        try:
+            # Resolved again each time: the store replaces the legacy JSON file once it exists
+            if content_version(self.content_base) in (None, self.content_version):
+                return False
+            start = time.perf_counter()
+            path, store, version = content_snapshot(self.content_base)
+            # Loaded on the side (for Chroma, into the collection not being queried), then swapped in
+            retriever = self.retriever.standby()
+            with file_lock(self.content_base + ".lock"):
+                retriever.load(path, store)
+            lexical = LexicalRetriever(path, store)
+            lexical.ensure_loaded()
+            embedding_mismatch = self._check_embeddings(store)
+            self.retriever = retriever
+            self.lexical = lexical
+            self.embedding_mismatch = embedding_mismatch
+            self.content_path = path
+            self.content_version = version
+            # Cached answers were generated from the previous content
+            self.answer_cache.clear()
+            print(f"Reloaded content {version} ({time.perf_counter() - start:.2f}s)")
+            return True
+        except Exception as e:
+            print(f"Error reloading content: {e}")
+            return False
+        finally:
+            self._reload_lock.release()
+    
+    def warm_up(self) -> Dict[str, float]:
+        """Do the lazy loading a first chat would otherwise wait for; returns seconds per step.
         
-        print(f"Loaded {len(documents)} sections into vector database")
+        Ends with a lexical search through the normal retrieval path, so a
+        worker that returns from here is serving retrieval.
+        """
+        timings = {}
+        steps = (
+            ("index", self.retriever.warm_up),
+            ("lexical", lambda: self.lexical is not None and self.lexical.ensure_loaded()),
+            ("tokenizer", lambda: count_tokens(SYSTEM_PROMPT_TEMPLATE)),
+            ("embedding_cache", self.embedding_cache.preload),
+            ("answer_cache", self.answer_cache.preload),
+            ("retrieval", lambda: self._retrieve("warm up", None, None, 1, "lexical"))
+        )
+        for name, step in steps:
+            start = time.perf_counter()
+            step()
+            timings[name] = round(time.perf_counter() - start, 3)
+        return timings
+    
+    def _check_for_new_content(self):
+        """Every CONTENT_RELOAD_INTERVAL seconds, reload new content in the background"""
+        if CONTENT_RELOAD_INTERVAL <= 0 or time.monotonic() < self._next_reload_check:
+            return
+        self._next_reload_check = time.monotonic() + CONTENT_RELOAD_INTERVAL
+        asyncio.get_running_loop().run_in_executor(self._query_executor, self.reload_content)
     
     def create_embedding(self, text: str) -> List[float]:
-        """Create embedding for text using OpenAI"""
-        try:
-            response = self.openai_client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text[:8000]
+        """Create embedding for text with the configured provider"""
+        if self.embedding_mismatch:
+            return []
+        if not self.embedder.remote:
+            return self._embed_locally([text])[0]
+        with metrics.span("embedding") as span:
+            cached = self.embedding_cache.get(text, self.embedder.model)
+            span.cache("embedding", cached is not None)
+            if cached is not None:
+                return cached
+            try:
+                embeddings, usage = upstream.call(
+                    "embedding", functools.partial(self.embedder.embed, [text]), upstream.EMBEDDING_DEADLINE
+                )
+                span.tokens(**usage)
+                embedding = embeddings[0]
+                self.embedding_cache.put(text, self.embedder.model, embedding)
+                return embedding
+            except Exception as e:
+                # Retrieval falls back to the lexical index without an embedding
+                print(f"Error creating embedding: {e}")
+                return []
+    
+    async def acreate_embedding(self, text: str) -> List[float]:
+        """Create embedding for text without blocking the event loop.
+        
+        Concurrent requests for the same (normalized) text share one API call.
+        """
+        if self.embedding_mismatch:
+            return []
+        if not self.embedder.remote:
+            return self._embed_locally([text])[0]
+        with metrics.span("embedding") as span:
+            cached = (await self._aget_cached_embeddings([text]))[0]
+            span.cache("embedding", cached is not None)
+            if cached is not None:
+                return cached
+            return await self.embedding_flight.do(
+                self.embedding_cache.make_key(text, self.embedder.model),
+                lambda: self._afetch_embedding(text)
             )
-            return response.data[0].embedding
+    
+    async def _afetch_embedding(self, text: str) -> List[float]:
+        """One embeddings API call, shared by every coalesced caller"""
+        try:
+            with metrics.span("embedding_request") as span:
+                embeddings, usage = await upstream.acall(
+                    "embedding", functools.partial(self.embedder.aembed, [text]),
+                    upstream.EMBEDDING_DEADLINE, hedge_delay=upstream.EMBEDDING_HEDGE_DELAY
+                )
+                span.tokens(**usage)
+            self._cache_embeddings([text], embeddings)
+            return embeddings[0]
         except Exception as e:
             print(f"Error creating embedding: {e}")
             return []
     
-    def search_relevant_content(self, query: str, platform: str = None, n_results: int = 5) -> Dict:
-        """Search for relevant content based on user query"""
-        query_embedding = self.create_embedding(query)
+    async def acreate_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed several texts with a single API call; cached (and repeated) texts are not sent again"""
+        if self.embedding_mismatch:
+            return [[] for _ in texts]
+        if not self.embedder.remote:
+            return self._embed_locally(texts)
+        model = self.embedder.model
+        with metrics.span("embedding") as span:
+            embeddings = await self._aget_cached_embeddings(texts)
+            missing = {}
+            for text, embedding in zip(texts, embeddings):
+                if embedding is None:
+                    missing.setdefault(self.embedding_cache.make_key(text, model), text)
+            span.cache("embedding", not missing)
+            if not missing:
+                return embeddings
+            fetched = dict(zip(missing, await self._afetch_embeddings(list(missing.values()))))
+            return [
+                embedding if embedding is not None else fetched[self.embedding_cache.make_key(text, model)]
+                for text, embedding in zip(texts, embeddings)
+            ]
+    
+    async def _afetch_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """One embeddings API call for all texts; [] for each text if it fails"""
+        try:
+            with metrics.span("embedding_request") as span:
+                embeddings, usage = await upstream.acall(
+                    "embedding", functools.partial(self.embedder.aembed, texts), upstream.EMBEDDING_BATCH_DEADLINE
+                )
+                span.tokens(**usage)
+            self._cache_embeddings(texts, embeddings)
+            return embeddings
+        except Exception as e:
+            print(f"Error creating embeddings: {e}")
+            return [[] for _ in texts]
+    
+    async def _aget_cached_embeddings(self, texts: List[str]) -> List[Optional[List[float]]]:
+        """Cached embedding (or None) per text; only the in-memory tier is read on the event loop"""
+        model = self.embedder.model
+        embeddings = [self.embedding_cache.get_memory(text, model) for text in texts]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
+        if missing:
+            def read_disk():
+                return [self.embedding_cache.get_disk(texts[i], model) for i in missing]
+            stored = await self._run_blocking(read_disk) if self.embedding_cache.persistent else read_disk()
+            for i, embedding in zip(missing, stored):
+                embeddings[i] = embedding
+        return embeddings
+    
+    def _cache_embeddings(self, texts: List[str], embeddings: List[List[float]]):
+        """Keep fetched embeddings in memory right away and write them to disk in the background"""
+        model = self.embedder.model
+        for text, embedding in zip(texts, embeddings):
+            self.embedding_cache.remember(text, model, embedding)
+        if self.embedding_cache.persistent:
+            self._run_in_background(self.embedding_cache.persist, model, list(zip(texts, embeddings)))
+    
+    async def _run_blocking(self, func, *args):
+        """Await blocking work (SQLite reads and commits) on the query executor"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._query_executor, contextvars.copy_context().run, functools.partial(func, *args)
+        )
+    
+    def _run_in_background(self, func, *args):
+        """Hand a blocking write to the cache writer thread without waiting for it"""
+        asyncio.get_running_loop().run_in_executor(self._write_executor, functools.partial(func, *args))
+    
+    def _embed_locally(self, texts: List[str]) -> List[List[float]]:
+        """Embed with a local provider; it is faster than the cache, so neither the cache nor the breaker is used"""
+        with metrics.span("embedding"):
+            try:
+                return self.embedder.embed(texts)[0]
+            except Exception as e:
+                print(f"Error creating embeddings: {e}")
+                return [[] for _ in texts]
+    
+    def search_relevant_content(self, query: str, platform: str = None, n_results: int = 5,
+                                query_embedding: Optional[List[float]] = None, mode: Optional[str] = None) -> Dict:
+        """Search for relevant content based on user query.
         
-        if not query_embedding:
-            return {"documents": [[]], "metadatas": [[]]}
+        mode is "hybrid" (vector + BM25), "vector" or "lexical"; lexical mode
+        skips the embedding call entirely.
+        """
+        mode = mode or RETRIEVAL_MODE
+        if query_embedding is None and mode != "lexical":
+            query_embedding = self.create_embedding(query)
+        with metrics.span("retrieval"):
+            return self._retrieve(query, query_embedding, platform, n_results, mode)
+    
+    async def asearch_relevant_content(self, query: str, platform: str = None, n_results: int = 5,
+                                       query_embedding: Optional[List[float]] = None, mode: Optional[str] = None) -> Dict:
+        """Search for relevant content without blocking the event loop"""
+        mode = mode or RETRIEVAL_MODE
+        if query_embedding is None and mode != "lexical":
+            query_embedding = await self.acreate_embedding(query)
+        loop = asyncio.get_running_loop()
+        with metrics.span("retrieval"):
+            # Run in a copy of this context so spans inside the thread reach the request's timings
+            return await loop.run_in_executor(
+                self._query_executor,
+                contextvars.copy_context().run,
+                functools.partial(self._retrieve, query, query_embedding, platform, n_results, mode)
+            )
+    
+    def _retrieve(self, query: str, query_embedding: Optional[List[float]], platform: str = None,
+                  n_results: int = 5, mode: str = "hybrid") -> Dict:
+        """Run (blocking) vector and/or lexical retrieval and fuse the results"""
+        # Take both indexes once so a concurrent reload cannot mix two content versions
+        retriever, lexical = self.retriever, self.lexical
+        if mode == "lexical" or not query_embedding:
+            if mode != "lexical" and not self.embedding_mismatch:
+                print("No query embedding available, falling back to lexical search")
+            return self._query_lexical(query, platform, n_results, lexical)
         
-        # Build where clause for filtering
-        where_clause = {}
-        if platform:
-            where_clause["platform"] = platform
+        if mode != "hybrid" or lexical is None:
+            return self._query_collection(query_embedding, platform, n_results, retriever)
+        
+        # Over-fetch from both sides so fusion has candidates to re-rank
+        vector_results = self._query_collection(query_embedding, platform, n_results * 2, retriever)
+        lexical_results = self._query_lexical(query, platform, n_results * 2, lexical)
+        return fuse_results(vector_results, lexical_results, n_results)
+    
+    def _retrieve_batch(self, queries: List[str], query_embeddings: List[List[float]], platforms: List[Optional[str]],
+                        n_results: int = 5, mode: str = "hybrid") -> List[Dict]:
+        """_retrieve() for a batch, with one vectorized vector query for every embedded query"""
+        retriever, lexical = self.retriever, self.lexical
+        hybrid = mode == "hybrid" and lexical is not None
+        vector_results = [empty_results() for _ in queries]
+        embedded = [i for i, embedding in enumerate(query_embeddings) if embedding]
+        if mode != "lexical" and embedded:
+            try:
+                with metrics.span("vector_query"):
+                    batch = retriever.query_batch(
+                        [query_embeddings[i] for i in embedded], [platforms[i] for i in embedded],
+                        n_results * 2 if hybrid else n_results
+                    )
+                for i, results in zip(embedded, batch):
+                    vector_results[i] = results
+            except Exception as e:
+                print(f"Error searching content: {e}")
+        
+        results = []
+        for query, query_embedding, platform, vector in zip(queries, query_embeddings, platforms, vector_results):
+            if mode == "lexical" or not query_embedding:
+                results.append(self._query_lexical(query, platform, n_results, lexical))
+            elif not hybrid:
+                results.append(vector)
+            else:
+                results.append(fuse_results(vector, self._query_lexical(query, platform, n_results * 2, lexical), n_results))
+        return results
+    
+    def _query_collection(self, query_embedding: List[float], platform: str = None, n_results: int = 5,
+                          retriever=None) -> Dict:
+        """Run a (blocking) vector query against the retrieval backend"""
+        if not query_embedding:
+            return empty_results()
         
         try:
-            results = self.collection.query(
-                query_embeddings=[query_embedding],
-                n_results=n_results,
-                where=where_clause if where_clause else None
-            )
-            return results
+            with metrics.span("vector_query"):
+                return (retriever or self.retriever).query(query_embedding, platform, n_results)
         except Exception as e:
             print(f"Error searching content: {e}")
-            return {"documents": [[]], "metadatas": [[]]}
+            return empty_results()
+    
+    def _query_lexical(self, query: str, platform: str = None, n_results: int = 5, lexical=None) -> Dict:
+        """Run a BM25 query against the lexical index"""
+        lexical = lexical or self.lexical
+        if lexical is None:
+            return empty_results()
+        try:
+            with metrics.span("lexical_query"):
+                return lexical.query(query, platform, n_results)
+        except Exception as e:
+            print(f"Error searching lexical index: {e}")
+            return empty_results()
     
     def get_platform_context(self, platform: str) -> str:
         """Get platform-specific context"""
@@ -115,76 +475,113 @@ class CybersecurityChatbot:
         }
         return platform_contexts.get(platform, platform_contexts["general"])
     
-    def generate_response(self, query: str, context: Dict, platform: str = None) -> str:
+    def generate_response(self, query: str, context: Dict, platform: str = None, session_id: str = DEFAULT_SESSION,
+                          prompt: Optional[Dict] = None) -> str:
         """Generate a beginner-friendly response using OpenAI"""
-        
-        # Build context from search results
-        context_sections = []
-        if context["documents"] and context["documents"][0]:
-            for doc, metadata in zip(context["documents"][0], context["metadatas"][0]):
-                context_sections.append(f"**{metadata['heading']}** (from {metadata['title']}):\n{doc}")
-        
-        context_text = "\n\n".join(context_sections[:3])  # Limit to top 3 results
-        
-        # Get platform-specific context
-        platform_context = self.get_platform_context(platform)
-        
-        # Build conversation history context
-        history_context = ""
-        if self.conversation_history:
-            recent_history = self.conversation_history[-3:]  # Last 3 exchanges
-            history_context = "\n".join([
-                f"User: {h['user']}\nAssistant: {h['bot'][:200]}..."
-                for h in recent_history
-            ])
-        
-        system_prompt = f"""You are CyberMentor, a friendly and knowledgeable cybersecurity tutor designed to help beginners learn cybersecurity concepts.
-
-Your personality:
-- Encouraging and supportive
-- Enthusiastic about cybersecurity
-- Patient with beginners
-- Use analogies and real-world examples
-- Avoid overwhelming technical jargon
+        if prompt is None:
+            with metrics.span("prompt_assembly"):
+                prompt = self.build_prompt(query, context, platform, session_id)
 
-Platform context: {platform_context}
-
-Your teaching approach:
-1. Start with a simple, clear explanation
-2. Use analogies when helpful (like comparing buffer overflows to overfilling a cup)
-3. Connect concepts to real-world cybersecurity incidents
-4. Provide practical next steps for learning
-5. Encourage hands-on practice
-
-Available knowledge base:
-{context_text}
-
-Recent conversation context:
-{history_context}
-
-Guidelines:
-- Keep responses under 300 words for better readability
-- Use bullet points for lists or steps
-- Include encouragement and motivation
-- If you don't know something, admit it and suggest how to find out
-- Always relate concepts back to practical cybersecurity skills"""
+        try:
+            with metrics.span("llm_completion") as span:
+                response = upstream.call("completion", functools.partial(
+                    self.openai_client.chat.completions.create,
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": prompt["system"]},
+                        {"role": "user", "content": query}
+                    ],
+                    temperature=0.7,
+                    max_tokens=400
+                ), upstream.COMPLETION_DEADLINE)
+                span.tokens(**metrics.usage_tokens(response))
+            
+            return response.choices[0].message.content
+            
+        except upstream.UpstreamError as e:
+            print(f"Error generating response: {e}")
+            return self.degraded_response(prompt)
+        except Exception as e:
+            print(f"Error generating response: {e}")
+            return FALLBACK_RESPONSE
+    
+    async def agenerate_response(self, query: str, context: Dict, platform: str = None, session_id: str = DEFAULT_SESSION,
+                                 prompt: Optional[Dict] = None) -> str:
+        """Generate a beginner-friendly response using the async OpenAI client"""
+        if prompt is None:
+            history = await self._arecent_history(session_id)
+            with metrics.span("prompt_assembly"):
+                prompt = self.build_prompt(query, context, platform, session_id, history)
 
         try:
-            response = self.openai_client.chat.completions.create(
-                model="gpt-4",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": query}
-                ],
-                temperature=0.7,
-                max_tokens=400
-            )
+            with metrics.span("llm_completion") as span:
+                response = await upstream.acall("completion", functools.partial(
+                    self.async_openai_client.chat.completions.create,
+                    model="gpt-4",
+                    messages=[
+                        {"role": "system", "content": prompt["system"]},
+                        {"role": "user", "content": query}
+                    ],
+                    temperature=0.7,
+                    max_tokens=400
+                ), upstream.COMPLETION_DEADLINE)
+                span.tokens(**metrics.usage_tokens(response))
             
             return response.choices[0].message.content
             
+        except upstream.UpstreamError as e:
+            print(f"Error generating response: {e}")
+            return self.degraded_response(prompt)
         except Exception as e:
             print(f"Error generating response: {e}")
-            return "I'm having trouble generating a response right now. Please try again in a moment."
+            return FALLBACK_RESPONSE
+    
+    def degraded_response(self, prompt: Dict) -> str:
+        """Answer from the packed knowledge-base sections when the model is unavailable"""
+        excerpts = []
+        for text, _ in prompt["sections"][:2]:
+            if len(text) > DEGRADED_EXCERPT_CHARS:
+                text = text[:DEGRADED_EXCERPT_CHARS].rsplit(" ", 1)[0] + "..."
+            excerpts.append(text)
+        if not excerpts:
+            return FALLBACK_RESPONSE
+        return DEGRADED_RESPONSE_NOTICE + "\n\n" + "\n\n".join(excerpts)
+    
+    def build_system_prompt(self, context: Dict, platform: str = None, session_id: str = DEFAULT_SESSION) -> str:
+        """Build the tutor system prompt from search results, platform and history"""
+        return self.build_prompt("", context, platform, session_id)["system"]
+    
+    def build_prompt(self, query: str, context: Dict, platform: str = None, session_id: str = DEFAULT_SESSION,
+                     history: Optional[List[Dict]] = None) -> Dict:
+        """Pack history and the most useful sections into PROMPT_TOKEN_BUDGET tokens.
+        
+        Returns the system prompt, the prompt tokens of the whole request
+        (system prompt plus query) and the (text, metadata) sections used.
+        history is the session's recent turns; async callers fetch it with
+        _arecent_history, otherwise it is read from the store here.
+        """
+        platform_context = self.get_platform_context(platform)
+        if history is None:
+            history = self.conversations.recent(session_id, HISTORY_MAX_TURNS)
+        
+        # History from this session only, newest exchanges first until its budget is used
+        history_context = pack_history(history)
+        
+        # Whatever the instructions, history and query leave over goes to the knowledge base
+        fixed_tokens = (count_tokens(SYSTEM_PROMPT_TEMPLATE.format(
+            platform_context=platform_context, context_text="", history_context=history_context
+        )) + count_tokens(query) + MESSAGE_OVERHEAD_TOKENS)
+        sections = select_sections(context, PROMPT_TOKEN_BUDGET - fixed_tokens)
+        context_text = "\n\n".join(text for text, _ in sections)
+        
+        system_prompt = SYSTEM_PROMPT_TEMPLATE.format(
+            platform_context=platform_context, context_text=context_text, history_context=history_context
+        )
+        return {
+            "system": system_prompt,
+            "prompt_tokens": count_tokens(system_prompt) + count_tokens(query) + MESSAGE_OVERHEAD_TOKENS,
+            "sections": sections
+        }
     
     def add_real_world_context(self, topic: str) -> Optional[str]:
         """Add real-world context about recent incidents"""
@@ -205,43 +602,382 @@ Guidelines:
         
         return None
     
-    def chat(self, user_message: str, platform: str = None) -> Dict:
-        """Main chat function"""
+    def chat(self, user_message: str, platform: str = None, fast: bool = False, session_id: str = DEFAULT_SESSION) -> Dict:
+        """Main chat function; fast=True answers from lexical retrieval without embedding the query"""
+        query_embedding = [] if fast else self.create_embedding(user_message)
+        history = self.conversations.recent(session_id, HISTORY_MAX_TURNS)
+        
+        # Reuse the answer to a near-identical question if we have one (answers that
+        # follow up on a conversation belong to that session and are not shared)
+        cached = None if history else self._lookup_answer(query_embedding, platform)
+        if cached:
+            return self._finish_chat(user_message, cached["response"], platform, cached["sources_used"], session_id, cached=True)
+        
         # Search for relevant content
-        relevant_content = self.search_relevant_content(user_message, platform)
+        relevant_content = self.search_relevant_content(
+            user_message, platform, CONTEXT_CANDIDATES, query_embedding=query_embedding, mode="lexical" if fast else None
+        )
         
         # Generate response
-        response = self.generate_response(user_message, relevant_content, platform)
+        with metrics.span("prompt_assembly"):
+            prompt = self.build_prompt(user_message, relevant_content, platform, session_id, history)
+        response = self.generate_response(user_message, relevant_content, platform, session_id, prompt)
+        sources_used = len(prompt["sections"])
+        if not history:
+            self._remember_answer(query_embedding, platform, response, sources_used)
+        
+        return self._finish_chat(user_message, response, platform, sources_used, session_id,
+                                 prompt_tokens=prompt["prompt_tokens"])
+    
+    async def achat(self, user_message: str, platform: str = None, fast: bool = False, session_id: str = DEFAULT_SESSION) -> Dict:
+        """Async chat function used by the API; never blocks the event loop"""
+        self._check_for_new_content()
+        async with self._chat_semaphore:
+            query_embedding = [] if fast else await self.acreate_embedding(user_message)
+            history = await self._arecent_history(session_id)
+            # Follow-ups depend on the session's conversation, so only fresh questions use the answer cache
+            cached = None if history else await self._alookup_answer(query_embedding, platform)
+        if cached:
+            return await self._afinish_chat(user_message, cached["response"], platform, cached["sources_used"],
+                                            session_id, cached=True)
         
-        # Add real-world context if available
+        mode = "lexical" if fast else RETRIEVAL_MODE
+        # Identical questions with the same history against the same content snapshot share one
+        # retrieval + completion
+        response, sources_used, prompt_tokens = await self._generate_once(
+            (normalize_text(user_message), platform or "", mode, self.content_version, pack_history(history)),
+            lambda: self._agenerate_answer(user_message, platform, query_embedding, mode, history),
+            self._chat_semaphore
+        )
+        
+        return await self._afinish_chat(user_message, response, platform, sources_used, session_id,
+                                        prompt_tokens=prompt_tokens)
+    
+    async def _generate_once(self, key: Tuple, factory: Callable[[], Awaitable[Tuple[str, int, int]]],
+                             *semaphores: asyncio.Semaphore) -> Tuple[str, int, int]:
+        """Run factory through generation_flight; the shared task holds semaphores while it runs.
+        
+        Callers wait without a permit, so joiners cannot starve the work they
+        wait for, and the permits belong to the task rather than to whichever
+        caller started it: if that caller is cancelled while others still
+        wait, the work keeps its permits until it finishes.
+        """
+        async def run() -> Tuple[str, int, int]:
+            async with contextlib.AsyncExitStack() as permits:
+                for semaphore in semaphores:
+                    await permits.enter_async_context(semaphore)
+                return await factory()
+        
+        return await self.generation_flight.do(key, run)
+    
+    async def _agenerate_answer(self, user_message: str, platform: Optional[str], query_embedding: List[float],
+                                mode: str, history: List[Dict]) -> Tuple[str, int, int]:
+        """Retrieve context and generate an answer; returns (response, sources used, prompt tokens).
+        
+        Coalesced callers share the result, so the flight key includes the history it is generated with.
+        """
+        relevant_content = await self.asearch_relevant_content(
+            user_message, platform, CONTEXT_CANDIDATES, query_embedding=query_embedding, mode=mode
+        )
+        return await self._agenerate_from_context(user_message, platform, query_embedding, relevant_content, history)
+    
+    async def _agenerate_from_context(self, user_message: str, platform: Optional[str], query_embedding: List[float],
+                                      relevant_content: Dict, history: List[Dict]) -> Tuple[str, int, int]:
+        """Pack the prompt from retrieved context and generate; returns (response, sources used, prompt tokens)"""
+        with metrics.span("prompt_assembly"):
+            prompt = self.build_prompt(user_message, relevant_content, platform, history=history)
+        response = await self.agenerate_response(user_message, relevant_content, platform, prompt=prompt)
+        sources_used = len(prompt["sections"])
+        if not history:
+            self._remember_answer_later(query_embedding, platform, response, sources_used)
+        return response, sources_used, prompt["prompt_tokens"]
+    
+    async def achat_batch(self, items: List[Dict], concurrency: int = BATCH_CONCURRENCY) -> AsyncIterator[Dict]:
+        """Answer a batch of questions, yielding each result as soon as it is ready.
+        
+        items are dicts with an id and a message, plus optional platform,
+        fast and session_id. All questions are embedded with one API call and
+        searched with one vectorized query; completions then run at most
+        concurrency at a time. Results arrive in completion order, each
+        tagged with its item's id; an item that fails yields {"id", "error"}.
+        """
+        self._check_for_new_content()
+        messages = [item["message"] for item in items]
+        platforms = [item.get("platform") for item in items]
+        query_embeddings = [[] for _ in items]
+        embedded = [i for i, item in enumerate(items) if not item.get("fast")]
+        if embedded:
+            for i, embedding in zip(embedded, await self.acreate_embeddings([messages[i] for i in embedded])):
+                query_embeddings[i] = embedding
+        
+        histories = await asyncio.gather(*(
+            self._arecent_history(item.get("session_id") or DEFAULT_SESSION) for item in items
+        ))
+        # Follow-ups depend on their session's conversation, so only fresh questions use the answer cache
+        cached = await asyncio.gather(*(
+            self._alookup_answer([] if history else embedding, platform)
+            for embedding, platform, history in zip(query_embeddings, platforms, histories)
+        ))
+        pending = [i for i in range(len(items)) if not cached[i]]
+        contexts = {}
+        if pending:
+            loop = asyncio.get_running_loop()
+            with metrics.span("retrieval"):
+                results = await loop.run_in_executor(
+                    self._query_executor,
+                    contextvars.copy_context().run,
+                    functools.partial(
+                        self._retrieve_batch, [messages[i] for i in pending], [query_embeddings[i] for i in pending],
+                        [platforms[i] for i in pending], CONTEXT_CANDIDATES, RETRIEVAL_MODE
+                    )
+                )
+            contexts = dict(zip(pending, results))
+        
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        
+        async def answer(i: int) -> Dict:
+            item = items[i]
+            session_id = item.get("session_id") or DEFAULT_SESSION
+            try:
+                if cached[i]:
+                    result = await self._afinish_chat(messages[i], cached[i]["response"], platforms[i],
+                                                      cached[i]["sources_used"], session_id, cached=True)
+                else:
+                    mode = "lexical" if item.get("fast") else RETRIEVAL_MODE
+                    # Repeated questions, in this batch or in concurrent chats, share one completion,
+                    # which holds the batch and chat permits while it runs
+                    response, sources_used, prompt_tokens = await self._generate_once(
+                        (normalize_text(messages[i]), platforms[i] or "", mode, self.content_version,
+                         pack_history(histories[i])),
+                        lambda: self._agenerate_from_context(
+                            messages[i], platforms[i], query_embeddings[i], contexts[i], histories[i]
+                        ),
+                        semaphore, self._chat_semaphore
+                    )
+                    result = await self._afinish_chat(messages[i], response, platforms[i], sources_used, session_id,
+                                                      prompt_tokens=prompt_tokens)
+                return dict(result, id=item["id"])
+            except Exception as e:
+                print(f"Error answering batch item {item['id']}: {e}")
+                return {"id": item["id"], "error": str(e)}
+        
+        tasks = [asyncio.ensure_future(answer(i)) for i in range(len(items))]
+        try:
+            for next_result in asyncio.as_completed(tasks):
+                yield await next_result
+        finally:
+            # The client went away; stop generating answers nobody will read
+            for task in tasks:
+                task.cancel()
+    
+    async def achat_stream(self, user_message: str, platform: str = None, fast: bool = False,
+                           session_id: str = DEFAULT_SESSION) -> AsyncIterator[Dict]:
+        """Stream a chat response as token events, then the real-world context and a final done event"""
+        start = time.perf_counter()
+        chunks = []
+        prompt_tokens = 0
+        self._check_for_new_content()
+        # The chat permit covers embedding, retrieval and opening the upstream stream; it is
+        # returned before the first token, so a slow reader does not hold a slot for the whole stream
+        permit = contextlib.AsyncExitStack()
+        await permit.enter_async_context(self._chat_semaphore)
+        try:
+            query_embedding = [] if fast else await self.acreate_embedding(user_message)
+            history = await self._arecent_history(session_id)
+            # Follow-ups depend on the session's conversation, so only fresh questions use the answer cache
+            cached = None if history else await self._alookup_answer(query_embedding, platform)
+            if cached:
+                await permit.aclose()
+                chunks.append(cached["response"])
+                sources_used = cached["sources_used"]
+                yield {"type": "token", "content": cached["response"]}
+            else:
+                relevant_content = await self.asearch_relevant_content(
+                    user_message, platform, CONTEXT_CANDIDATES, query_embedding=query_embedding,
+                    mode="lexical" if fast else None
+                )
+                with metrics.span("prompt_assembly"):
+                    prompt = self.build_prompt(user_message, relevant_content, platform, session_id, history)
+                sources_used = len(prompt["sections"])
+                prompt_tokens = prompt["prompt_tokens"]
+                
+                try:
+                    with metrics.span("llm_completion") as span:
+                        # The deadline covers opening the stream; each chunk then gets the read timeout
+                        stream = await upstream.acall("completion", functools.partial(
+                            self.async_openai_client.chat.completions.create,
+                            model="gpt-4",
+                            messages=[
+                                {"role": "system", "content": prompt["system"]},
+                                {"role": "user", "content": user_message}
+                            ],
+                            temperature=0.7,
+                            max_tokens=400,
+                            stream=True,
+                            stream_options={"include_usage": True}
+                        ), upstream.COMPLETION_DEADLINE)
+                        await permit.aclose()
+                        async for chunk in stream:
+                            if chunk.usage:
+                                span.tokens(**metrics.usage_tokens(chunk))
+                            if not chunk.choices:
+                                continue
+                            token = chunk.choices[0].delta.content
+                            if token:
+                                if not chunks:
+                                    metrics.record("llm_first_token", time.perf_counter() - span.start)
+                                chunks.append(token)
+                                yield {"type": "token", "content": token}
+                    if not history:
+                        self._remember_answer_later(query_embedding, platform, "".join(chunks), sources_used)
+                except Exception as e:
+                    print(f"Error streaming response: {e}")
+                    await permit.aclose()
+                    if not chunks:
+                        fallback = FALLBACK_RESPONSE
+                        if isinstance(e, upstream.UpstreamError):
+                            fallback = self.degraded_response(prompt)
+                        chunks.append(fallback)
+                        yield {"type": "token", "content": fallback}
+        finally:
+            await permit.aclose()
+        
+        response = "".join(chunks)
         real_world_context = self.add_real_world_context(user_message)
         if real_world_context:
             response += f"\n\n{real_world_context}"
+            yield {"type": "context", "content": f"\n\n{real_world_context}"}
+        
+        # Only record the exchange once the whole stream has been delivered
+        with metrics.span("post_processing"):
+            conversation_entry = await self._arecord_conversation(user_message, response, platform, sources_used,
+                                                                  session_id)
+        done = {
+            "type": "done",
+            "session_id": session_id,
+            "timestamp": conversation_entry["timestamp"],
+            "sources_used": conversation_entry["sources_used"],
+            "prompt_tokens": prompt_tokens,
+            "cached": cached is not None
+        }
+        if metrics.METRICS_ENABLED:
+            # Headers are long gone when streaming, so the stage timings and the time to the end
+            # of the stream travel in the done frame
+            done["server_timing"] = metrics.server_timing(
+                metrics.request_timings() + [("total", time.perf_counter() - start, None)]
+            )
+        yield done
+    
+    def _lookup_answer(self, query_embedding: List[float], platform: Optional[str]) -> Optional[Dict]:
+        """Look up the semantic answer cache (nothing to compare without an embedding)"""
+        if not query_embedding:
+            return None
+        with metrics.span("answer_cache") as span:
+            cached = self.answer_cache.lookup(query_embedding, platform)
+            span.cache("answer", cached is not None)
+        return cached
+    
+    async def _alookup_answer(self, query_embedding: List[float], platform: Optional[str]) -> Optional[Dict]:
+        """_lookup_answer without reading the shared SQLite file on the event loop"""
+        if query_embedding and self.answer_cache.persistent:
+            return await self._run_blocking(self._lookup_answer, query_embedding, platform)
+        return self._lookup_answer(query_embedding, platform)
+    
+    def _remember_answer(self, query_embedding: List[float], platform: Optional[str], response: str, sources_used: int):
+        """Offer a freshly generated answer to the semantic answer cache"""
+        if response and response != FALLBACK_RESPONSE and not response.startswith(DEGRADED_RESPONSE_NOTICE):
+            self.answer_cache.store(query_embedding, platform, response, sources_used)
+    
+    def _remember_answer_later(self, query_embedding: List[float], platform: Optional[str], response: str,
+                               sources_used: int):
+        """_remember_answer for async callers; writes to the shared SQLite file happen on the cache writer thread"""
+        if query_embedding and self.answer_cache.persistent:
+            self._run_in_background(self._remember_answer, query_embedding, platform, response, sources_used)
+        else:
+            self._remember_answer(query_embedding, platform, response, sources_used)
+    
+    def _finish_chat(self, user_message: str, response: str, platform: Optional[str], sources_used: int,
+                     session_id: str = DEFAULT_SESSION, cached: bool = False, prompt_tokens: int = 0) -> Dict:
+        """Decorate a generated response and record it in the conversation history.
         
+        prompt_tokens is the size of the prompt sent to the model (0 for cached answers).
+        """
+        with metrics.span("post_processing"):
+            # Add real-world context if available
+            real_world_context = self.add_real_world_context(user_message)
+            if real_world_context:
+                response += f"\n\n{real_world_context}"
+            
+            conversation_entry = self._record_conversation(user_message, response, platform, sources_used, session_id)
+        
+        return {
+            "session_id": session_id,
+            "response": response,
+            "timestamp": conversation_entry["timestamp"],
+            "sources_used": conversation_entry["sources_used"],
+            "prompt_tokens": prompt_tokens,
+            "cached": cached
+        }
+    
+    async def _afinish_chat(self, user_message: str, response: str, platform: Optional[str], sources_used: int,
+                            session_id: str = DEFAULT_SESSION, cached: bool = False, prompt_tokens: int = 0) -> Dict:
+        """_finish_chat without writing to a file-backed conversation store on the event loop"""
+        if self.conversations.blocking:
+            return await self._run_blocking(self._finish_chat, user_message, response, platform, sources_used,
+                                            session_id, cached, prompt_tokens)
+        return self._finish_chat(user_message, response, platform, sources_used, session_id, cached, prompt_tokens)
+    
+    def _record_conversation(self, user_message: str, response: str, platform: Optional[str], sources_used: int,
+                             session_id: str = DEFAULT_SESSION) -> Dict:
+        """Store a completed exchange in the session's conversation history"""
         # Store conversation
         conversation_entry = {
             "user": user_message,
             "bot": response,
             "timestamp": datetime.now().isoformat(),
             "platform": platform,
-            "sources_used": len(relevant_content["documents"][0]) if relevant_content["documents"] else 0
+            "sources_used": sources_used
         }
         
-        self.conversation_history.append(conversation_entry)
-        
-        return {
-            "response": response,
-            "timestamp": conversation_entry["timestamp"],
-            "sources_used": conversation_entry["sources_used"]
-        }
+        return self.conversations.append(session_id, conversation_entry)
+    
+    async def _arecord_conversation(self, user_message: str, response: str, platform: Optional[str],
+                                    sources_used: int, session_id: str = DEFAULT_SESSION) -> Dict:
+        """_record_conversation, off the event loop for a file-backed store"""
+        if self.conversations.blocking:
+            return await self._run_blocking(self._record_conversation, user_message, response, platform,
+                                            sources_used, session_id)
+        return self._record_conversation(user_message, response, platform, sources_used, session_id)
+    
+    async def _arecent_history(self, session_id: str) -> List[Dict]:
+        """The session's recent turns for build_prompt, off the event loop for a file-backed store"""
+        if self.conversations.blocking:
+            return await self._run_blocking(self.conversations.recent, session_id, HISTORY_MAX_TURNS)
+        return self.conversations.recent(session_id, HISTORY_MAX_TURNS)
+    
+    def get_conversation_history(self, session_id: str = DEFAULT_SESSION, cursor: Optional[int] = None,
+                                 limit: int = 50) -> Dict:
+        """Get one page of a session's conversation history"""
+        entries, next_cursor = self.conversations.page(session_id, cursor, limit)
+        return {"session_id": session_id, "entries": entries, "next_cursor": next_cursor}
+    
+    def clear_conversation_history(self, session_id: str = DEFAULT_SESSION):
+        """Clear a session's conversation history"""
+        self.conversations.clear(session_id)
     
-    def get_conversation_history(self) -> List[Dict]:
-        """Get conversation history"""
-        return self.conversation_history
+    async def aget_conversation_history(self, session_id: str = DEFAULT_SESSION, cursor: Optional[int] = None,
+                                        limit: int = 50) -> Dict:
+        """get_conversation_history for the API; never blocks the event loop"""
+        if self.conversations.blocking:
+            return await self._run_blocking(self.get_conversation_history, session_id, cursor, limit)
+        return self.get_conversation_history(session_id, cursor, limit)
     
-    def clear_conversation_history(self):
-        """Clear conversation history"""
-        self.conversation_history = []
+    async def aclear_conversation_history(self, session_id: str = DEFAULT_SESSION):
+        """clear_conversation_history for the API; never blocks the event loop"""
+        if self.conversations.blocking:
+            await self._run_blocking(self.clear_conversation_history, session_id)
+        else:
+            self.clear_conversation_history(session_id)
 
 # Initialize chatbot (singleton pattern for MVP)
 chatbot_instance = None
@@ -252,8 +988,7 @@ def get_chatbot():
     if chatbot_instance is None:
         chatbot_instance = CybersecurityChatbot()
         
-        # Load processed content
-        content_path = os.getenv("CONTENT_PATH", "./content/processed") + "/ctf_primer_processed.json"
-        chatbot_instance.load_processed_content(content_path)
+        # Load processed content (the legacy JSON output until a store exists; see app.processed_store)
+        chatbot_instance.load_processed_content(PROCESSED_CONTENT_PATH)
     
     return chatbot_instance
\ No newline at end of file
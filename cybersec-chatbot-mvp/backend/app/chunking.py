@@ -0,0 +1,194 @@
+# backend/app/chunking.py
+"""Split AsciiDoc documents into token-bounded chunks.
+
+The document is split on headings (``==``, ``===``, ...) first. Each heading
+section is then cut into blocks: paragraphs separated by blank lines, and
+delimited listings (``----``, ``....``, fenced code), which are never broken
+up unless they alone exceed the maximum chunk size. Blocks are packed into
+chunks of about CHUNK_TARGET_TOKENS, never more than CHUNK_MAX_TOKENS, and
+each chunk repeats the last CHUNK_OVERLAP_TOKENS or so of the chunk before
+it. A heading section too small to stand on its own is folded into the
+previous chunk of the same file when it fits.
+
+Every chunk keeps its heading and the breadcrumbs of headings above it.
+Token counts are computed once per block, so a file is chunked in a single
+linear pass.
+"""
+import os
+import re
+from typing import List, Dict, Tuple
+
+from app.context_packer import count_tokens
+
+# Chunk sizes in tokens: packing stops at the target and never exceeds the maximum
+CHUNK_TARGET_TOKENS = int(os.getenv("CHUNK_TARGET_TOKENS", "350"))
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", "512"))
+# Heading sections smaller than this are merged into the previous chunk when possible
+CHUNK_MIN_TOKENS = int(os.getenv("CHUNK_MIN_TOKENS", "60"))
+# Approximate number of tokens repeated from the end of the previous chunk
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", "40"))
+
+HEADING_RE = re.compile(r'^\s*(==+)\s+(.*)')
+FENCE_RE = re.compile(r'^(-{4,}|\.{4,}|`{3,}.*)\s*$')
+
+
+def chunking_settings() -> Dict:
+    """Settings that change the chunks; stored in the manifest to detect changes"""
+    return {
+        "target": CHUNK_TARGET_TOKENS,
+        "max": CHUNK_MAX_TOKENS,
+        "min": CHUNK_MIN_TOKENS,
+        "overlap": CHUNK_OVERLAP_TOKENS
+    }
+
+
+def _fence_closes(opening: str, line: str) -> bool:
+    if opening.startswith("`"):
+        return line.strip().startswith("```")
+    return line.strip() == opening.strip()
+
+
+def split_headings(content: str) -> List[Tuple[List[str], List[List[str]]]]:
+    """(breadcrumbs, blocks) per heading section; a block is a list of lines.
+
+    Text before the first ``==`` heading (the document title and preamble)
+    belongs to no section and is skipped. Headings inside listings are text.
+    """
+    sections = []
+    stack = []  # (level, heading)
+    blocks = None
+    block = []
+    fence = None
+
+    def end_block():
+        if block and blocks is not None:
+            blocks.append(list(block))
+        block.clear()
+
+    for line in content.split('\n'):
+        if fence is not None:
+            block.append(line)
+            if _fence_closes(fence, line):
+                fence = None
+                end_block()
+            continue
+
+        heading_match = HEADING_RE.match(line)
+        if heading_match:
+            end_block()
+            level = len(heading_match.group(1))
+            while stack and stack[-1][0] >= level:
+                stack.pop()
+            stack.append((level, heading_match.group(2).strip()))
+            blocks = []
+            sections.append(([heading for _, heading in stack], blocks))
+        elif FENCE_RE.match(line):
+            end_block()
+            fence = line
+            block.append(line)
+        elif not line.strip():
+            end_block()
+        else:
+            block.append(line)
+    end_block()
+    return sections
+
+
+def _split_oversized(text: str, max_tokens: int) -> List[str]:
+    """Cut a block larger than max_tokens at line, then word, boundaries"""
+    pieces = []
+    current = []
+    current_tokens = 0
+    for line in text.split('\n'):
+        units = [line]
+        line_tokens = count_tokens(line) + 1
+        if line_tokens > max_tokens:
+            # A single huge line: fall back to fixed runs of words
+            words = line.split()
+            step = max(1, len(words) * max_tokens // line_tokens)
+            units = [" ".join(words[i:i + step]) for i in range(0, len(words), step)]
+        for unit in units:
+            unit_tokens = count_tokens(unit) + 1
+            if current and current_tokens + unit_tokens > max_tokens:
+                pieces.append("\n".join(current))
+                current = []
+                current_tokens = 0
+            current.append(unit)
+            current_tokens += unit_tokens
+    if current:
+        pieces.append("\n".join(current))
+    return pieces
+
+
+def _overlap_tail(text: str) -> str:
+    """The last CHUNK_OVERLAP_TOKENS or so of text, on a word boundary"""
+    if CHUNK_OVERLAP_TOKENS <= 0:
+        return ""
+    # About three words for every four tokens
+    window = CHUNK_OVERLAP_TOKENS * 8
+    words = text[-window:].split()
+    if len(text) > window:
+        words = words[1:]  # Probably cut in the middle
+    return " ".join(words[-max(1, CHUNK_OVERLAP_TOKENS * 3 // 4):])
+
+
+def pack_blocks(blocks: List[str]) -> List[str]:
+    """Pack blocks into chunks of about CHUNK_TARGET_TOKENS with overlap"""
+    chunks = []
+    current = []
+    current_tokens = 0
+    has_new = False  # Only overlap text so far; not worth a chunk of its own
+
+    def emit():
+        nonlocal current, current_tokens, has_new
+        text = "\n\n".join(current)
+        chunks.append(text)
+        tail = _overlap_tail(text)
+        current = [tail] if tail else []
+        current_tokens = count_tokens(tail) if tail else 0
+        has_new = False
+
+    for block in blocks:
+        tokens = count_tokens(block)
+        pieces = [(block, tokens)]
+        if tokens > CHUNK_MAX_TOKENS - CHUNK_OVERLAP_TOKENS:
+            pieces = [(piece, count_tokens(piece))
+                      for piece in _split_oversized(block, CHUNK_MAX_TOKENS - CHUNK_OVERLAP_TOKENS)]
+        for piece, piece_tokens in pieces:
+            if has_new and current_tokens + piece_tokens > CHUNK_MAX_TOKENS:
+                emit()
+            current.append(piece)
+            current_tokens += piece_tokens
+            has_new = True
+            if current_tokens >= CHUNK_TARGET_TOKENS:
+                emit()
+    if has_new:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+def chunk_document(content: str) -> List[Dict]:
+    """Chunk an AsciiDoc document into sections with heading, breadcrumbs and content"""
+    chunks = []
+    for breadcrumbs, blocks in split_headings(content):
+        texts = pack_blocks(["\n".join(lines) for lines in blocks])
+        if not texts:
+            continue
+        heading = breadcrumbs[-1]
+        if len(texts) == 1 and chunks:
+            # Fold a small section into the previous chunk instead of spending an index slot on it
+            previous = chunks[-1]
+            if count_tokens(texts[0]) < CHUNK_MIN_TOKENS:
+                merged = f"{previous['content']}\n\n{heading}\n{texts[0]}"
+                if count_tokens(merged) <= CHUNK_MAX_TOKENS:
+                    previous["content"] = merged
+                    previous["word_count"] = len(merged.split())
+                    continue
+        for text in texts:
+            chunks.append({
+                "heading": heading,
+                "breadcrumbs": breadcrumbs,
+                "content": text,
+                "word_count": len(text.split())
+            })
+    return chunks
@@ -0,0 +1,157 @@
+# backend/app/context_packer.py
+"""Fit retrieved sections and conversation history into a prompt token budget.
+
+Sections are picked greedily by maximal marginal relevance (MMR): each step
+takes the candidate with the best mix of retrieval relevance and
+dissimilarity to the sections already picked, so five near-identical chunks
+do not crowd out everything else. Near-duplicates are dropped outright. The
+last section that does not fit whole is cut to the remaining budget.
+
+Tokens are counted with tiktoken when it is installed and its encoding can
+be loaded, otherwise estimated at about four characters per token.
+"""
+import os
+import threading
+from typing import List, Dict, Tuple
+
+from app.lexical import tokenize
+
+# Token budget for the whole prompt (instructions, knowledge base, history and the question)
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "3000"))
+# Part of the prompt budget reserved for conversation history, and the cap per assistant reply
+HISTORY_TOKEN_BUDGET = int(os.getenv("HISTORY_TOKEN_BUDGET", "600"))
+HISTORY_TURN_TOKENS = int(os.getenv("HISTORY_TURN_TOKENS", "150"))
+# Most recent exchanges considered for the history
+HISTORY_MAX_TURNS = int(os.getenv("HISTORY_MAX_TURNS", "6"))
+# Retrieval results offered to the packer
+CONTEXT_CANDIDATES = int(os.getenv("CONTEXT_CANDIDATES", "8"))
+# MMR trade-off: 1.0 ranks by relevance only, lower values favour diversity
+MMR_LAMBDA = float(os.getenv("MMR_LAMBDA", "0.7"))
+# Word-set Jaccard similarity above which a section counts as a duplicate
+NEAR_DUPLICATE_THRESHOLD = float(os.getenv("NEAR_DUPLICATE_THRESHOLD", "0.9"))
+# Sections shorter than this are not worth including once cut down
+MIN_SECTION_TOKENS = 40
+TOKENIZER_ENCODING = "cl100k_base"
+
+_encoding = None
+_encoding_loaded = False
+_encoding_lock = threading.Lock()
+
+
+def _get_encoding():
+    global _encoding, _encoding_loaded
+    if not _encoding_loaded:
+        with _encoding_lock:
+            if not _encoding_loaded:
+                try:
+                    import tiktoken
+                    _encoding = tiktoken.get_encoding(TOKENIZER_ENCODING)
+                except Exception as e:
+                    print(f"tiktoken unavailable, estimating token counts: {e}")
+                _encoding_loaded = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    """Number of tokens in text"""
+    if not text:
+        return 0
+    encoding = _get_encoding()
+    if encoding is None:
+        return len(text) // 4 + 1
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to at most max_tokens tokens"""
+    if max_tokens <= 0:
+        return ""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text[:max_tokens * 4]
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= max_tokens:
+        return text
+    return encoding.decode(tokens[:max_tokens])
+
+
+def _relevance(context: Dict) -> List[float]:
+    """Relevance in [0, 1] for each result, from scores, distances or rank"""
+    count = len(context["documents"][0])
+    scores = (context.get("scores") or [[]])[0]
+    if scores and all(score is not None for score in scores):
+        top = max(scores) or 1.0
+        return [max(score, 0.0) / top for score in scores]
+    distances = (context.get("distances") or [[]])[0]
+    if distances and all(distance is not None for distance in distances):
+        # Squared L2 between unit vectors, so 1 - d/2 is the cosine similarity
+        return [max(0.0, 1.0 - distance / 2.0) for distance in distances]
+    return [1.0 / (1 + rank) for rank in range(count)]
+
+
+def _similarity(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def select_sections(context: Dict, budget: int) -> List[Tuple[str, Dict]]:
+    """Pick (text, metadata) sections by MMR until budget tokens are used"""
+    if not context["documents"] or not context["documents"][0]:
+        return []
+    candidates = []
+    for doc, metadata, relevance in zip(context["documents"][0], context["metadatas"][0], _relevance(context)):
+        header = f"**{metadata.get('breadcrumbs') or metadata['heading']}** (from {metadata['title']}):\n"
+        candidates.append({
+            "header": header,
+            "doc": doc,
+            "metadata": metadata,
+            "relevance": relevance,
+            "words": set(tokenize(doc)),
+            "tokens": count_tokens(header + doc)
+        })
+
+    selected = []
+    remaining = budget
+    while candidates and remaining >= MIN_SECTION_TOKENS:
+        best, best_score = None, None
+        for candidate in candidates:
+            redundancy = max((_similarity(candidate["words"], chosen["words"]) for chosen in selected), default=0.0)
+            if redundancy >= NEAR_DUPLICATE_THRESHOLD:
+                candidate["duplicate"] = True
+                continue
+            score = MMR_LAMBDA * candidate["relevance"] - (1 - MMR_LAMBDA) * redundancy
+            if best_score is None or score > best_score:
+                best, best_score = candidate, score
+        candidates = [candidate for candidate in candidates if not candidate.get("duplicate")]
+        if best is None:
+            break
+        candidates.remove(best)
+
+        text = best["header"] + best["doc"]
+        if best["tokens"] > remaining:
+            # Cut the section to what is left; nothing after it would fit anyway
+            header_tokens = count_tokens(best["header"])
+            text = best["header"] + truncate_tokens(best["doc"], remaining - header_tokens) + "..."
+            selected.append(dict(best, text=text))
+            break
+        selected.append(dict(best, text=text))
+        remaining -= best["tokens"]
+    return [(chosen["text"], chosen["metadata"]) for chosen in selected]
+
+
+def pack_history(history: List[Dict], budget: int = HISTORY_TOKEN_BUDGET) -> str:
+    """Format the most recent exchanges that fit in budget tokens (oldest first)"""
+    turns = []
+    remaining = budget
+    for entry in reversed(history):
+        bot = entry["bot"]
+        if count_tokens(bot) > HISTORY_TURN_TOKENS:
+            bot = truncate_tokens(bot, HISTORY_TURN_TOKENS) + "..."
+        turn = f"User: {entry['user']}\nAssistant: {bot}"
+        tokens = count_tokens(turn)
+        if tokens > remaining:
+            break
+        turns.append(turn)
+        remaining -= tokens
+    return "\n".join(reversed(turns))
@@ -0,0 +1,282 @@
+# backend/app/conversation_store.py
+"""Per-session conversation history.
+
+Each session keeps at most ``max_turns`` exchanges and is dropped after
+``idle_ttl`` seconds without activity. Every stored turn gets a per-session
+sequence number that doubles as the pagination cursor for /history.
+
+The in-memory store also enforces a global memory budget by evicting the
+least recently used sessions. The SQLite store survives restarts and can be
+shared by several worker processes.
+"""
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict, deque
+from typing import List, Dict, Optional, Tuple
+
+from app.workers import MULTI_WORKER
+
+# Turns kept per session
+CONVERSATION_MAX_TURNS = int(os.getenv("CONVERSATION_MAX_TURNS", "50"))
+# Seconds of inactivity after which a session is forgotten
+CONVERSATION_IDLE_TTL = float(os.getenv("CONVERSATION_IDLE_TTL", str(6 * 3600)))
+# Approximate memory budget for the in-memory store, in megabytes
+CONVERSATION_MEMORY_BUDGET_MB = float(os.getenv("CONVERSATION_MEMORY_BUDGET_MB", "64"))
+# "memory" or "sqlite"; several workers need the shared sqlite store
+CONVERSATION_STORE = os.getenv("CONVERSATION_STORE", "sqlite" if MULTI_WORKER else "memory")
+CONVERSATION_DB_PATH = os.getenv("CONVERSATION_DB_PATH", "./data/conversations.sqlite3")
+
+# Rough per-turn overhead (dict, keys, timestamp) on top of the message text
+TURN_OVERHEAD_BYTES = 256
+
+
+def _turn_size(entry: Dict) -> int:
+    return len(entry["user"]) + len(entry["bot"]) + TURN_OVERHEAD_BYTES
+
+
+class ConversationStore:
+    """Interface shared by the conversation store implementations"""
+
+    # True if calls do file I/O; async callers then run them off the event loop
+    blocking = False
+
+    def append(self, session_id: str, entry: Dict) -> Dict:
+        """Store a turn and return it with its sequence number"""
+        raise NotImplementedError
+
+    def recent(self, session_id: str, n: int) -> List[Dict]:
+        """The last n turns of a session, oldest first"""
+        raise NotImplementedError
+
+    def page(self, session_id: str, cursor: Optional[int] = None, limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        """Turns after cursor (oldest first) and the cursor for the next page"""
+        raise NotImplementedError
+
+    def clear(self, session_id: str):
+        """Forget one session"""
+        raise NotImplementedError
+
+    def stats(self) -> Dict:
+        raise NotImplementedError
+
+
+class InMemoryConversationStore(ConversationStore):
+    """Bounded in-process store: turn cap, idle TTL and global memory budget"""
+
+    def __init__(self, max_turns: int = CONVERSATION_MAX_TURNS, idle_ttl: float = CONVERSATION_IDLE_TTL,
+                 memory_budget_bytes: int = int(CONVERSATION_MEMORY_BUDGET_MB * 1024 * 1024)):
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.memory_budget_bytes = memory_budget_bytes
+        self._sessions = OrderedDict()  # session id -> session, least recently used first
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def _touch(self, session_id: str, create: bool = False) -> Optional[Dict]:
+        session = self._sessions.get(session_id)
+        if session is None:
+            if not create:
+                return None
+            session = {"turns": deque(), "bytes": 0, "next_seq": 1, "last_seen": 0.0}
+            self._sessions[session_id] = session
+        session["last_seen"] = time.monotonic()
+        self._sessions.move_to_end(session_id)
+        return session
+
+    def _drop(self, session_id: str):
+        session = self._sessions.pop(session_id)
+        self._bytes -= session["bytes"]
+
+    def _evict(self, keep: str):
+        """Expire idle sessions, then evict LRU sessions until within budget"""
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            session_id, session = next(iter(self._sessions.items()))
+            if session["last_seen"] >= cutoff or session_id == keep:
+                break
+            self._drop(session_id)
+
+        while self._bytes > self.memory_budget_bytes:
+            session_id = next(iter(self._sessions))
+            if session_id != keep:
+                self._drop(session_id)
+                continue
+            # Only the active session is left: trim its oldest turns instead
+            session = self._sessions[keep]
+            if len(session["turns"]) <= 1:
+                break
+            removed = session["turns"].popleft()
+            session["bytes"] -= _turn_size(removed)
+            self._bytes -= _turn_size(removed)
+
+    def append(self, session_id: str, entry: Dict) -> Dict:
+        with self._lock:
+            session = self._touch(session_id, create=True)
+            entry = dict(entry, seq=session["next_seq"])
+            session["next_seq"] += 1
+            session["turns"].append(entry)
+            size = _turn_size(entry)
+            session["bytes"] += size
+            self._bytes += size
+
+            while len(session["turns"]) > self.max_turns:
+                removed = session["turns"].popleft()
+                session["bytes"] -= _turn_size(removed)
+                self._bytes -= _turn_size(removed)
+
+            self._evict(keep=session_id)
+            return entry
+
+    def recent(self, session_id: str, n: int) -> List[Dict]:
+        with self._lock:
+            session = self._touch(session_id)
+            if session is None or n <= 0:
+                return []
+            turns = session["turns"]
+            return [turns[i] for i in range(max(0, len(turns) - n), len(turns))]
+
+    def page(self, session_id: str, cursor: Optional[int] = None, limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        with self._lock:
+            session = self._touch(session_id)
+            if session is None:
+                return [], None
+            after = [entry for entry in session["turns"] if cursor is None or entry["seq"] > cursor]
+            entries = after[:limit]
+            next_cursor = entries[-1]["seq"] if len(after) > limit else None
+            return entries, next_cursor
+
+    def clear(self, session_id: str):
+        with self._lock:
+            if session_id in self._sessions:
+                self._drop(session_id)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self._sessions),
+                "bytes": self._bytes,
+                "memory_budget_bytes": self.memory_budget_bytes,
+                "max_turns": self.max_turns
+            }
+
+
+class SQLiteConversationStore(ConversationStore):
+    """Conversation history in a SQLite file, shared between worker processes"""
+
+    blocking = True
+
+    # Expire idle sessions once every this many appends
+    EXPIRE_EVERY = 100
+
+    def __init__(self, db_path: str = CONVERSATION_DB_PATH, max_turns: int = CONVERSATION_MAX_TURNS,
+                 idle_ttl: float = CONVERSATION_IDLE_TTL):
+        self.db_path = db_path
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self._appends = 0
+
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS turns ("
+            "session_id TEXT NOT NULL, seq INTEGER NOT NULL, user TEXT NOT NULL, bot TEXT NOT NULL, "
+            "timestamp TEXT NOT NULL, platform TEXT, sources_used INTEGER NOT NULL, created_at REAL NOT NULL, "
+            "PRIMARY KEY (session_id, seq))"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS turns_created_at ON turns (created_at)")
+        self._db.commit()
+
+    @staticmethod
+    def _entry(row: sqlite3.Row) -> Dict:
+        return {
+            "user": row["user"],
+            "bot": row["bot"],
+            "timestamp": row["timestamp"],
+            "platform": row["platform"],
+            "sources_used": row["sources_used"],
+            "seq": row["seq"]
+        }
+
+    def append(self, session_id: str, entry: Dict) -> Dict:
+        now = time.time()
+        with self._lock:
+            # BEGIN IMMEDIATE serializes sequence allocation across processes
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._db.execute(
+                    "SELECT COALESCE(MAX(seq), 0) + 1 FROM turns WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                seq = row[0]
+                self._db.execute(
+                    "INSERT INTO turns (session_id, seq, user, bot, timestamp, platform, sources_used, created_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (session_id, seq, entry["user"], entry["bot"], entry["timestamp"],
+                     entry["platform"], entry["sources_used"], now)
+                )
+                self._db.execute(
+                    "DELETE FROM turns WHERE session_id = ? AND seq <= ?", (session_id, seq - self.max_turns)
+                )
+                self._appends += 1
+                if self._appends % self.EXPIRE_EVERY == 0:
+                    self._db.execute(
+                        "DELETE FROM turns WHERE session_id IN ("
+                        "SELECT session_id FROM turns GROUP BY session_id HAVING MAX(created_at) < ?)",
+                        (now - self.idle_ttl,)
+                    )
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+        return dict(entry, seq=seq)
+
+    def recent(self, session_id: str, n: int) -> List[Dict]:
+        if n <= 0:
+            return []
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM turns WHERE session_id = ? AND created_at >= ? ORDER BY seq DESC LIMIT ?",
+                (session_id, time.time() - self.idle_ttl, n)
+            ).fetchall()
+        return [self._entry(row) for row in reversed(rows)]
+
+    def page(self, session_id: str, cursor: Optional[int] = None, limit: int = 50) -> Tuple[List[Dict], Optional[int]]:
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT * FROM turns WHERE session_id = ? AND seq > ? ORDER BY seq LIMIT ?",
+                (session_id, cursor or 0, limit + 1)
+            ).fetchall()
+        entries = [self._entry(row) for row in rows[:limit]]
+        next_cursor = entries[-1]["seq"] if len(rows) > limit else None
+        return entries, next_cursor
+
+    def clear(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM turns WHERE session_id = ?", (session_id,))
+            self._db.commit()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            sessions, turns = self._db.execute(
+                "SELECT COUNT(DISTINCT session_id), COUNT(*) FROM turns"
+            ).fetchone()
+        return {
+            "backend": "sqlite",
+            "sessions": sessions,
+            "turns": turns,
+            "max_turns": self.max_turns
+        }
+
+
+def create_conversation_store(name: str = CONVERSATION_STORE) -> ConversationStore:
+    """Instantiate the conversation store selected by name"""
+    if name == "memory":
+        return InMemoryConversationStore()
+    if name == "sqlite":
+        return SQLiteConversationStore()
+    raise ValueError(f"Unknown conversation store: {name}")
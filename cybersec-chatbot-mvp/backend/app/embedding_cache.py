@@ -0,0 +1,174 @@
+# backend/app/embedding_cache.py
+import os
+import array
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional, Tuple
+
+
+def normalize_text(text: str) -> str:
+    """Normalize a query so trivially different spellings share a cache entry"""
+    return " ".join(text.split()).lower()
+
+
+class EmbeddingCache:
+    """Two-tier cache for query embeddings.
+
+    The first tier is an in-memory LRU bounded by ``max_entries``. The optional
+    second tier is a SQLite file that survives restarts; entries found there are
+    promoted back into memory. Async callers look up the memory tier on the
+    event loop and leave ``get_disk``/``persist`` to a worker thread.
+    """
+
+    def __init__(self, max_entries: int = 2048, db_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        # SQLite is used under its own lock so a slow commit never holds up memory-tier lookups
+        self._db_lock = threading.Lock()
+        self._db = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            try:
+                os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+                self._db = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+                self._db.execute("PRAGMA journal_mode=WAL")
+                self._db.execute(
+                    "CREATE TABLE IF NOT EXISTS embeddings ("
+                    "key TEXT PRIMARY KEY, model TEXT NOT NULL, embedding BLOB NOT NULL)"
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Embedding cache disk tier disabled: {e}")
+                self._db = None
+
+    @staticmethod
+    def make_key(text: str, model: str) -> str:
+        """Cache key for a (normalized text, model) pair"""
+        return hashlib.sha256(f"{model}\n{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+    @property
+    def persistent(self) -> bool:
+        return self._db is not None
+
+    def get(self, text: str, model: str) -> Optional[List[float]]:
+        """Return the cached embedding or None"""
+        embedding = self.get_memory(text, model)
+        if embedding is None:
+            embedding = self.get_disk(text, model)
+        return embedding
+
+    def get_memory(self, text: str, model: str) -> Optional[List[float]]:
+        """Look up the in-memory tier only (a miss is not counted); never blocks on I/O"""
+        key = self.make_key(text, model)
+        with self._lock:
+            embedding = self._memory.get(key)
+            if embedding is not None:
+                self._memory.move_to_end(key)
+                self.hits += 1
+            return embedding
+
+    def get_disk(self, text: str, model: str) -> Optional[List[float]]:
+        """Look up the SQLite tier after a memory miss; hits are promoted back into memory"""
+        key = self.make_key(text, model)
+        row = None
+        if self._db is not None:
+            with self._db_lock:
+                try:
+                    row = self._db.execute(
+                        "SELECT embedding FROM embeddings WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    print(f"Error reading embedding cache: {e}")
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            embedding = array.array("f", row[0]).tolist()
+            self._remember(key, embedding)
+            self.hits += 1
+            self.disk_hits += 1
+            return embedding
+
+    def put(self, text: str, model: str, embedding: List[float]):
+        """Store an embedding in both tiers"""
+        self.remember(text, model, embedding)
+        self.persist(model, [(text, embedding)])
+
+    def remember(self, text: str, model: str, embedding: List[float]):
+        """Store an embedding in the in-memory tier only"""
+        if not embedding:
+            return
+        with self._lock:
+            self._remember(self.make_key(text, model), embedding)
+
+    def persist(self, model: str, entries: List[Tuple[str, List[float]]]):
+        """Write (text, embedding) pairs to the SQLite tier in one transaction"""
+        rows = [
+            (self.make_key(text, model), model, array.array("f", embedding).tobytes())
+            for text, embedding in entries if embedding
+        ]
+        if self._db is None or not rows:
+            return
+        with self._db_lock:
+            try:
+                self._db.executemany(
+                    "INSERT OR REPLACE INTO embeddings (key, model, embedding) VALUES (?, ?, ?)", rows
+                )
+                self._db.commit()
+            except sqlite3.Error as e:
+                print(f"Error writing embedding cache: {e}")
+
+    def preload(self) -> int:
+        """Fill the memory tier with the most recently written disk entries; returns the count"""
+        if self._db is None or self.max_entries <= 0:
+            return 0
+        try:
+            with self._db_lock:
+                rows = self._db.execute(
+                    "SELECT key, embedding FROM embeddings ORDER BY rowid DESC LIMIT ?", (self.max_entries,)
+                ).fetchall()
+        except sqlite3.Error as e:
+            print(f"Error reading embedding cache: {e}")
+            return 0
+        with self._lock:
+            for key, blob in reversed(rows):
+                if key not in self._memory:
+                    self._remember(key, array.array("f", blob).tolist())
+        return len(rows)
+
+    def _remember(self, key: str, embedding: List[float]):
+        self._memory[key] = embedding
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self) -> Dict:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "max_entries": self.max_entries,
+                "persistent": self._db is not None
+            }
+
+    def clear(self):
+        """Drop every cached embedding from both tiers"""
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM embeddings")
+                self._db.commit()
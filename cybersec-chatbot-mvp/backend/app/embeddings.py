@@ -0,0 +1,181 @@
+# backend/app/embeddings.py
+"""Embedding providers shared by the chatbot and the content processor.
+
+EMBEDDING_PROVIDER selects one:
+
+- "openai": the embeddings API (EMBEDDING_MODEL, text-embedding-ada-002 by
+  default).
+- "local": hashed character n-grams, computed on the CPU with NumPy. It needs
+  no network and no model download, and a query takes well under a
+  millisecond. Its vectors match spellings, not meanings: closer to a fuzzy
+  keyword match than to a neural embedding. Hybrid retrieval makes up for
+  part of that.
+
+A provider embeds a batch of texts in one request. Retries, deadlines and the
+circuit breaker stay with the callers: app.upstream for queries,
+ContentProcessor for ingestion. The processed store records the ``info()`` of
+the provider that built it. The chatbot does not run vector search when the
+content was embedded by a different provider, model or dimension.
+"""
+import os
+from typing import List, Dict, Optional, Tuple
+
+import numpy as np
+
+from app import metrics, upstream
+from app.lexical import tokenize
+
+# "openai" or "local"
+EMBEDDING_PROVIDER = os.getenv("EMBEDDING_PROVIDER", "openai").lower()
+# Model used by the openai provider
+EMBEDDING_MODEL = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
+# Characters of each text that are embedded
+EMBEDDING_MAX_CHARS = 8000
+# Local provider: vector size and the character n-gram lengths hashed into it
+LOCAL_EMBEDDING_DIM = int(os.getenv("LOCAL_EMBEDDING_DIM", "1024"))
+LOCAL_EMBEDDING_NGRAMS = tuple(int(n) for n in os.getenv("LOCAL_EMBEDDING_NGRAMS", "3,4,5").split(","))
+
+OPENAI_EMBEDDING_DIMENSIONS = {
+    "text-embedding-ada-002": 1536,
+    "text-embedding-3-small": 1536,
+    "text-embedding-3-large": 3072
+}
+# Words too common to say anything about a section; dropped before hashing
+STOPWORDS = frozenset(
+    "a an and are as at be but by can do does for from how i if in into is it its me my of on or so that the "
+    "their then there these this to was what when where which who why will with you your".split()
+)
+# Odd 64-bit multiplier for multiplicative hashing of n-gram codes
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+NO_USAGE = {"prompt": 0, "completion": 0}
+
+
+class EmbeddingProvider:
+    """Interface for turning a batch of texts into vectors"""
+
+    name = "base"
+    # Embedding costs a network round trip: worth caching, coalescing, retrying and hedging
+    remote = True
+
+    def __init__(self, model: str, dimension: Optional[int] = None):
+        self.model = model
+        self.dimension = dimension
+
+    def embed(self, texts: List[str], timeout=None) -> Tuple[List[List[float]], Dict[str, int]]:
+        """Embed texts in one request; returns (vectors, token usage)"""
+        raise NotImplementedError
+
+    async def aembed(self, texts: List[str], timeout=None) -> Tuple[List[List[float]], Dict[str, int]]:
+        return self.embed(texts, timeout)
+
+    def info(self) -> Dict:
+        """What the processed store records about the embeddings it holds"""
+        return {"provider": self.name, "model": self.model, "dimension": self.dimension}
+
+    def mismatch(self, info: Optional[Dict]) -> Optional[str]:
+        """Why vectors described by info cannot be compared with ours, or None if they can.
+
+        Content written before providers were recorded only has its dimension checked.
+        """
+        if not info:
+            return None
+        if info.get("provider") and (info["provider"], info.get("model")) != (self.name, self.model):
+            return f"content was embedded with {info.get('provider')}/{info.get('model')}, queries use {self.name}/{self.model}"
+        if self.dimension and info.get("dimension") and info["dimension"] != self.dimension:
+            return f"content has {info['dimension']}-dimensional embeddings, queries have {self.dimension}"
+        return None
+
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """The OpenAI embeddings API, on the shared connection pool"""
+
+    name = "openai"
+
+    def __init__(self, model: str = EMBEDDING_MODEL):
+        super().__init__(model, OPENAI_EMBEDDING_DIMENSIONS.get(model))
+
+    def _request(self, texts: List[str], timeout) -> Dict:
+        request = {"model": self.model, "input": [text[:EMBEDDING_MAX_CHARS] for text in texts]}
+        if timeout is not None:
+            request["timeout"] = timeout
+        return request
+
+    @staticmethod
+    def _vectors(response) -> Tuple[List[List[float]], Dict[str, int]]:
+        return [item.embedding for item in sorted(response.data, key=lambda item: item.index)], metrics.usage_tokens(response)
+
+    def embed(self, texts: List[str], timeout=None) -> Tuple[List[List[float]], Dict[str, int]]:
+        return self._vectors(upstream.get_openai_client().embeddings.create(**self._request(texts, timeout)))
+
+    async def aembed(self, texts: List[str], timeout=None) -> Tuple[List[List[float]], Dict[str, int]]:
+        return self._vectors(await upstream.get_async_openai_client().embeddings.create(**self._request(texts, timeout)))
+
+
+class LocalEmbeddingProvider(EmbeddingProvider):
+    """Signed feature hashing of character n-grams, vectorized over the whole batch.
+
+    Text is lowercased, tokenized like the BM25 index and stripped of stop
+    words. Every n-gram of the remaining words (with the spaces around them)
+    is hashed into one of ``dimension`` buckets with a random sign. Counts are
+    damped with log1p and the rows are L2-normalized. The encoding is
+    deterministic, so vectors written at ingestion match the ones computed
+    for queries in any process.
+    """
+
+    name = "local"
+    remote = False
+
+    def __init__(self, dimension: int = LOCAL_EMBEDDING_DIM, ngrams: Tuple[int, ...] = LOCAL_EMBEDDING_NGRAMS):
+        super().__init__(f"char-ngram-{'-'.join(str(n) for n in ngrams)}", dimension)
+        self.ngrams = ngrams
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dimension) float32 matrix of unit-length rows"""
+        dimension = self.dimension
+        docs = [
+            " " + " ".join(token for token in tokenize(text[:EMBEDDING_MAX_CHARS]) if token not in STOPWORDS) + " "
+            for text in texts
+        ]
+        # Documents joined by newlines, which tokenize never keeps, so n-grams spanning two are easy to drop
+        data = np.frombuffer("\n".join(docs).encode("utf-8"), dtype=np.uint8)
+        newline = data == ord("\n")
+        rows = np.cumsum(newline)
+        newlines_before = np.concatenate(([0], rows))
+        codes = data.astype(np.uint64)
+
+        counts = np.zeros(len(texts) * dimension, dtype=np.float64)
+        for n in self.ngrams:
+            windows = len(data) - n + 1
+            if windows <= 0:
+                continue
+            # Base-257 code of each n-gram; distinct for every n-gram of every length up to 7
+            code = codes[:windows].copy()
+            for offset in range(1, n):
+                code = code * np.uint64(257) + codes[offset:offset + windows]
+            within_document = newlines_before[n:n + windows] == newlines_before[:windows]
+            hashed = code[within_document] * HASH_MULTIPLIER
+            buckets = ((hashed >> np.uint64(32)) % np.uint64(dimension)).astype(np.int64)
+            signs = 1.0 - 2.0 * ((hashed >> np.uint64(31)) & np.uint64(1)).astype(np.float64)
+            counts += np.bincount(rows[:windows][within_document] * dimension + buckets,
+                                  weights=signs, minlength=len(counts))
+
+        matrix = counts.reshape(len(texts), dimension)
+        matrix = (np.sign(matrix) * np.log1p(np.abs(matrix))).astype(np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return matrix / norms
+
+    def embed(self, texts: List[str], timeout=None) -> Tuple[List[List[float]], Dict[str, int]]:
+        if not texts:
+            return [], NO_USAGE
+        return self.encode(texts).tolist(), NO_USAGE
+
+
+PROVIDERS = {"openai": OpenAIEmbeddingProvider, "local": LocalEmbeddingProvider}
+
+
+def create_provider(name: str = EMBEDDING_PROVIDER) -> EmbeddingProvider:
+    """Create the embedding provider selected by name (EMBEDDING_PROVIDER by default)"""
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown embedding provider: {name} (expected one of {', '.join(PROVIDERS)})")
+    return PROVIDERS[name]()
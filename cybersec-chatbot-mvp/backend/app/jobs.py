@@ -0,0 +1,182 @@
+# backend/app/jobs.py
+"""Background jobs for long-running admin work such as content ingestion.
+
+Jobs run one at a time on a background thread of the worker that accepted
+them. Each job's state is a small JSON file under INGESTION_JOBS_DIR. Any
+worker can report the status, whichever process the request reaches.
+"""
+import os
+import json
+import time
+import uuid
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Callable
+
+# Directory holding one status file per job
+INGESTION_JOBS_DIR = os.getenv("INGESTION_JOBS_DIR", "./data/jobs")
+# Finished jobs kept on disk
+INGESTION_JOBS_KEEP = int(os.getenv("INGESTION_JOBS_KEEP", "50"))
+# Minimum seconds between progress writes while a job is running
+PROGRESS_WRITE_INTERVAL = 0.5
+# Errors kept in a job's status (the total is always counted)
+MAX_JOB_ERRORS = 20
+
+FINISHED_STATUSES = ("succeeded", "failed")
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        pass
+    return True
+
+
+class JobManager:
+    """Run callables in the background and persist their status and progress"""
+
+    def __init__(self, jobs_dir: str = INGESTION_JOBS_DIR, keep: int = INGESTION_JOBS_KEEP):
+        self.jobs_dir = jobs_dir
+        self.keep = keep
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="job")
+        self._lock = threading.Lock()
+        os.makedirs(jobs_dir, exist_ok=True)
+
+    def _path(self, job_id: str) -> str:
+        return os.path.join(self.jobs_dir, f"{job_id}.json")
+
+    def _write(self, job: Dict):
+        tmp_path = f"{self._path(job['id'])}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(job, f, indent=2)
+        os.replace(tmp_path, self._path(job["id"]))
+
+    def submit(self, kind: str, target: Callable[["JobContext"], Dict], params: Optional[Dict] = None) -> Dict:
+        """Queue target(context) and return the new job's status.
+
+        The dict returned by target becomes the job's ``result``; an exception
+        marks the job as failed.
+        """
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "status": "queued",
+            "params": params or {},
+            "pid": os.getpid(),
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "started_at": None,
+            "finished_at": None,
+            "elapsed_seconds": None,
+            "progress": {},
+            "throughput": {},
+            "error_count": 0,
+            "errors": [],
+            "result": None
+        }
+        self._write(job)
+        queued = dict(job)
+        self._executor.submit(self._run, job, target)
+        return queued
+
+    def _run(self, job: Dict, target: Callable[["JobContext"], Dict]):
+        context = JobContext(self, job)
+        context.start()
+        try:
+            result = target(context)
+            context.finish("succeeded", result=result)
+        except Exception as e:
+            print(f"Job {job['id']} failed: {e}")
+            context.error(str(e))
+            context.finish("failed")
+        self._prune()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Current status of a job, or None if it is unknown"""
+        if not all(c in "0123456789abcdef" for c in job_id):
+            return None
+        try:
+            with open(self._path(job_id), "r", encoding="utf-8") as f:
+                job = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if job["status"] not in FINISHED_STATUSES and not _pid_alive(job["pid"]):
+            # The worker running the job exited before it finished
+            job["status"] = "failed"
+            job["errors"].append({"error": "worker process exited before the job finished"})
+        return job
+
+    def list(self, limit: int = 20) -> List[Dict]:
+        """Most recently created jobs first"""
+        job_ids = [name[:-len(".json")] for name in os.listdir(self.jobs_dir) if name.endswith(".json")]
+        job_ids.sort(key=lambda job_id: os.path.getmtime(self._path(job_id)), reverse=True)
+        jobs = [self.get(job_id) for job_id in job_ids[:limit]]
+        return [job for job in jobs if job is not None]
+
+    def _prune(self):
+        """Delete the oldest finished job files beyond self.keep"""
+        with self._lock:
+            try:
+                names = [name for name in os.listdir(self.jobs_dir) if name.endswith(".json")]
+                names.sort(key=lambda name: os.path.getmtime(os.path.join(self.jobs_dir, name)))
+                for name in names[:max(0, len(names) - self.keep)]:
+                    job = self.get(name[:-len(".json")])
+                    if job is None or job["status"] in FINISHED_STATUSES:
+                        os.remove(os.path.join(self.jobs_dir, name))
+            except OSError as e:
+                print(f"Error pruning job files: {e}")
+
+
+class JobContext:
+    """Handle passed to a running job for reporting progress and errors"""
+
+    def __init__(self, manager: JobManager, job: Dict):
+        self._manager = manager
+        self.job = job
+        self._started = None
+        self._last_write = 0.0
+
+    @property
+    def id(self) -> str:
+        return self.job["id"]
+
+    def start(self):
+        self._started = time.perf_counter()
+        self.job["status"] = "running"
+        self.job["started_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._save()
+
+    def update(self, progress: Dict):
+        """Merge progress counters; written to disk at most every PROGRESS_WRITE_INTERVAL seconds"""
+        self.job["progress"].update(progress)
+        if time.perf_counter() - self._last_write >= PROGRESS_WRITE_INTERVAL:
+            self._save()
+
+    def error(self, message: str, **details):
+        self.job["error_count"] += 1
+        if len(self.job["errors"]) < MAX_JOB_ERRORS:
+            self.job["errors"].append(dict(details, error=message))
+        self._save()
+
+    def finish(self, status: str, result: Optional[Dict] = None):
+        self.job["status"] = status
+        self.job["result"] = result
+        self.job["finished_at"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._save()
+
+    def _save(self):
+        elapsed = time.perf_counter() - self._started if self._started else 0.0
+        progress = self.job["progress"]
+        self.job["elapsed_seconds"] = round(elapsed, 2)
+        if elapsed > 0:
+            self.job["throughput"] = {
+                "files_per_sec": round(progress.get("files_done", 0) / elapsed, 2),
+                "sections_per_sec": round(progress.get("sections_embedded", 0) / elapsed, 2)
+            }
+        self._last_write = time.perf_counter()
+        try:
+            self._manager._write(self.job)
+        except OSError as e:
+            print(f"Error writing status of job {self.id}: {e}")
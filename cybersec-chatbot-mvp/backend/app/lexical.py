@@ -0,0 +1,137 @@
+# backend/app/lexical.py
+"""Compact BM25 inverted index over section headings and content.
+
+The index is built once at processing time and stored as a single ``.npz``
+file of flat arrays (vocabulary, postings offsets, document ids, term
+frequencies, document lengths). Queries only touch the postings of the query
+terms, so exact tool or term lookups ("binwalk", "RSA e=3") are answered
+without an embedding call.
+"""
+import re
+from collections import Counter
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[=._+-][a-z0-9]+)*")
+SPLIT_RE = re.compile(r"[=._+-]")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens; compounds like "e=3" also yield their parts"""
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        tokens.append(token)
+        if SPLIT_RE.search(token):
+            tokens.extend(part for part in SPLIT_RE.split(token) if part)
+    return tokens
+
+
+class BM25Builder:
+    """Accumulate documents one at a time and produce a BM25Index"""
+
+    def __init__(self):
+        self._postings = {}  # term -> list of (doc, tf)
+        self._doc_lengths = []
+
+    def add(self, text: str) -> int:
+        """Add a document and return its row number"""
+        doc = len(self._doc_lengths)
+        counts = Counter(tokenize(text))
+        for term, tf in counts.items():
+            self._postings.setdefault(term, []).append((doc, tf))
+        self._doc_lengths.append(sum(counts.values()))
+        return doc
+
+    def build(self, k1: float = 1.2, b: float = 0.75) -> "BM25Index":
+        terms = sorted(self._postings)
+        offsets = np.zeros(len(terms) + 1, dtype=np.int64)
+        for i, term in enumerate(terms):
+            offsets[i + 1] = offsets[i] + len(self._postings[term])
+        docs = np.empty(offsets[-1], dtype=np.int32)
+        tfs = np.empty(offsets[-1], dtype=np.float32)
+        for i, term in enumerate(terms):
+            postings = self._postings[term]
+            docs[offsets[i]:offsets[i + 1]] = [doc for doc, _ in postings]
+            tfs[offsets[i]:offsets[i + 1]] = [tf for _, tf in postings]
+        return BM25Index(terms, offsets, docs, tfs, np.asarray(self._doc_lengths, dtype=np.float32), k1, b)
+
+
+class BM25Index:
+    """Okapi BM25 over flat postings arrays"""
+
+    def __init__(self, terms: List[str], offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray,
+                 doc_lengths: np.ndarray, k1: float = 1.2, b: float = 0.75):
+        self.terms = terms
+        self.term_ids = {term: i for i, term in enumerate(terms)}
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.doc_count = len(doc_lengths)
+        self.avg_length = float(doc_lengths.mean()) if self.doc_count else 0.0
+        # Per-document length normalization is query independent
+        if self.doc_count:
+            self._length_norm = k1 * (1 - b + b * doc_lengths / max(self.avg_length, 1e-9))
+        else:
+            self._length_norm = np.empty(0, dtype=np.float32)
+
+    def save(self, path: str):
+        np.savez(
+            path,
+            terms=np.frombuffer("\n".join(self.terms).encode("utf-8"), dtype=np.uint8),
+            offsets=self.offsets,
+            docs=self.docs,
+            tfs=self.tfs,
+            doc_lengths=self.doc_lengths,
+            params=np.asarray([self.k1, self.b], dtype=np.float64)
+        )
+
+    @classmethod
+    def load(cls, path: str) -> "BM25Index":
+        with np.load(path) as data:
+            raw_terms = data["terms"].tobytes().decode("utf-8")
+            k1, b = data["params"].tolist()
+            return cls(
+                raw_terms.split("\n") if raw_terms else [],
+                data["offsets"],
+                data["docs"],
+                data["tfs"],
+                data["doc_lengths"],
+                k1,
+                b
+            )
+
+    def search(self, query: str, n_results: int = 5, allowed: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (rows, scores) of the best matching documents.
+
+        ``allowed`` is an optional boolean mask of rows that may be returned.
+        """
+        term_ids = {self.term_ids[term] for term in tokenize(query) if term in self.term_ids}
+        if not term_ids or n_results <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        matched_docs = []
+        matched_scores = []
+        for term_id in term_ids:
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.docs[start:end]
+            tfs = self.tfs[start:end]
+            idf = np.log(1.0 + (self.doc_count - len(docs) + 0.5) / (len(docs) + 0.5))
+            matched_docs.append(docs)
+            matched_scores.append(idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs]))
+
+        # Sum per-term contributions for every document that matched any term
+        rows, inverse = np.unique(np.concatenate(matched_docs), return_inverse=True)
+        values = np.bincount(inverse, weights=np.concatenate(matched_scores)).astype(np.float32)
+        if allowed is not None:
+            keep = allowed[rows]
+            rows, values = rows[keep], values[keep]
+        if not len(rows):
+            return rows, values
+        k = min(n_results, len(rows))
+        top = np.argpartition(-values, k - 1)[:k]
+        top = top[np.argsort(-values[top], kind="stable")]
+        return rows[top], values[top]
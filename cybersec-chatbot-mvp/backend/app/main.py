@@ -4,15 +4,55 @@ import os
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from fastapi import FastAPI, HTTPException, Depends
-from pydantic import BaseModel
-from typing import Optional, List
+import json
+import time
+import uuid
+import asyncio
+import threading
+import contextlib
+from fastapi import FastAPI, HTTPException, Depends, Query, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from pydantic import BaseModel, Field
+from typing import Optional, List, Dict
 import uvicorn
 
-from app.chatbot import get_chatbot
+# The chatbot (and with it the OpenAI client) is imported by the warm-up, after the server is listening
+from app.workers import WORKER_COUNT, CTF_PRIMER_PATH, PROCESSED_CONTENT_PATH, file_lock
+from app.jobs import JobManager
+from app.startup import StartupState
+from app import metrics
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="CyberMentor API", version="1.0.0")
+# Questions accepted in one /chat/batch request (the embeddings API takes up to 2048 inputs per call)
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "256"))
+
+startup_state = StartupState()
+
+async def warm_up():
+    """Load the chatbot, index and caches and open upstream connections, then mark the worker ready"""
+    loop = asyncio.get_running_loop()
+    try:
+        chatbot_wrapper = await loop.run_in_executor(None, get_chatbot_dep)
+        startup_state.mark("chatbot_loaded")
+        timings = await loop.run_in_executor(None, chatbot_wrapper.chatbot.warm_up)
+        startup_state.mark("warmed_up")
+        print(f"Warm-up steps: {timings}")
+        from app import upstream
+        # Opened on this event loop, whose requests will reuse the connections
+        await upstream.awarm_up()
+        startup_state.mark("upstream_connected")
+        startup_state.set_ready()
+    except Exception as e:
+        startup_state.set_failed(e)
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup_state.mark("serving")
+    task = asyncio.create_task(warm_up())
+    yield
+    task.cancel()
+
+app = FastAPI(title="CyberMentor API", version="1.0.0", lifespan=lifespan)
 
 # Add CORS middleware
 app.add_middleware(
@@ -29,43 +69,121 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing"],
 )
 
+if metrics.METRICS_ENABLED:
+    @app.middleware("http")
+    async def timing_middleware(request: Request, call_next):
+        """Time each request and report its pipeline stages in a Server-Timing header"""
+        timings = metrics.start_request()
+        start = time.perf_counter()
+        response = await call_next(request)
+        elapsed = time.perf_counter() - start
+        route = request.scope.get("route")
+        metrics.HTTP_SECONDS.observe(elapsed, request.method, route.path if route else "unmatched",
+                                     str(response.status_code))
+        # Only in the header: a streamed body is still being produced here, and its done frame reports its own total
+        response.headers["Server-Timing"] = metrics.server_timing(timings + [("total", elapsed, None)])
+        return response
+
 # Pydantic models for request/response
 class ChatRequest(BaseModel):
     message: str
     platform: Optional[str] = None
+    # Answer from lexical (BM25) retrieval only, skipping the embedding call
+    fast: bool = False
+    # Conversation to continue; a new one is started (and returned) when omitted
+    session_id: Optional[str] = Field(default=None, max_length=128)
 
 class ChatResponse(BaseModel):
+    session_id: str
     response: str
     timestamp: str
     sources_used: int
+    prompt_tokens: int = 0
+    cached: bool = False
+
+class BatchChatItem(BaseModel):
+    # Caller's id for this question, echoed back with its result
+    id: str = Field(..., max_length=128)
+    message: str
+    platform: Optional[str] = None
+    fast: bool = False
+    # Each question without a session_id gets a new conversation
+    session_id: Optional[str] = Field(default=None, max_length=128)
+
+class BatchChatRequest(BaseModel):
+    items: List[BatchChatItem] = Field(..., min_length=1, max_length=BATCH_MAX_ITEMS)
 
 class ConversationEntry(BaseModel):
+    seq: int
     user: str
     bot: str
     timestamp: str
     platform: Optional[str]
     sources_used: int
 
+class HistoryPage(BaseModel):
+    session_id: str
+    entries: List[ConversationEntry]
+    # Pass as ``cursor`` to fetch the next page; null when there are no more entries
+    next_cursor: Optional[int] = None
+
 # Dependency wrapper for chatbot
 class ChatbotWrapper:
     def __init__(self):
+        from app.chatbot import get_chatbot
         self.chatbot = get_chatbot()
 
-    def chat(self, message, platform):
-        return self.chatbot.chat(message, platform)
+    async def chat(self, message, platform, fast=False, session_id=None):
+        return await self.chatbot.achat(message, platform, fast=fast, session_id=session_id)
 
-    def get_conversation_history(self):
-        return self.chatbot.get_conversation_history()
+    def chat_stream(self, message, platform, fast=False, session_id=None):
+        return self.chatbot.achat_stream(message, platform, fast=fast, session_id=session_id)
 
-    def clear_conversation_history(self):
-        return self.chatbot.clear_conversation_history()
+    def chat_batch(self, items):
+        return self.chatbot.achat_batch(items)
+
+    async def get_conversation_history(self, session_id, cursor=None, limit=50):
+        return await self.chatbot.aget_conversation_history(session_id, cursor, limit)
+
+    async def clear_conversation_history(self, session_id):
+        return await self.chatbot.aclear_conversation_history(session_id)
+
+    def reload_content(self, wait=False):
+        return self.chatbot.reload_content(wait=wait)
+
+    def get_worker_info(self):
+        return {
+            "pid": os.getpid(),
+            "workers": WORKER_COUNT,
+            "retrieval_backend": self.chatbot.retriever.name,
+            "embedding_provider": self.chatbot.embedder.info(),
+            # Why vector search is off (content embedded by another provider), or null
+            "embedding_mismatch": self.chatbot.embedding_mismatch,
+            "content_version": self.chatbot.content_version
+        }
+
+    def get_cache_stats(self):
+        return {
+            "conversations": self.chatbot.conversations.stats(),
+            "embedding_cache": self.chatbot.embedding_cache.stats(),
+            "answer_cache": self.chatbot.answer_cache.stats(),
+            "single_flight": {
+                "embedding": self.chatbot.embedding_flight.stats(),
+                "generation": self.chatbot.generation_flight.stats()
+            }
+        }
+
+_chatbot_lock = threading.Lock()
 
 def get_chatbot_dep():
-    # Singleton pattern: store instance on function attribute
+    # Singleton pattern: store instance on function attribute; requests during warm-up wait for it
     if not hasattr(get_chatbot_dep, "instance"):
-        get_chatbot_dep.instance = ChatbotWrapper()
+        with _chatbot_lock:
+            if not hasattr(get_chatbot_dep, "instance"):
+                get_chatbot_dep.instance = ChatbotWrapper()
     return get_chatbot_dep.instance
 
 @app.get("/")
@@ -82,37 +200,124 @@ async def chat_endpoint(
     try:
         if not request.message.strip():
             raise HTTPException(status_code=400, detail="Message cannot be empty")
-        result = chatbot_wrapper.chat(request.message, request.platform)
+        session_id = request.session_id or uuid.uuid4().hex
+        result = await chatbot_wrapper.chat(request.message, request.platform, fast=request.fast, session_id=session_id)
         return ChatResponse(
+            session_id=result["session_id"],
             response=result["response"],
             timestamp=result["timestamp"],
-            sources_used=result["sources_used"]
+            sources_used=result["sources_used"],
+            prompt_tokens=result["prompt_tokens"],
+            cached=result["cached"]
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
-@app.get("/history", response_model=List[ConversationEntry])
+def _sse_event(event: Dict) -> str:
+    """Format an event dict as a server-sent-events frame"""
+    return f"data: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(
+    request: ChatRequest,
+    chatbot_wrapper: ChatbotWrapper = Depends(get_chatbot_dep)
+):
+    """Streaming chat endpoint (server-sent events).
+
+    Emits ``token`` frames as the completion arrives, an optional ``context``
+    frame with the real-world footer and a final ``done`` frame carrying the
+    session id, timestamp and number of sources used.
+    """
+    if not request.message.strip():
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    session_id = request.session_id or uuid.uuid4().hex
+
+    async def event_stream():
+        try:
+            async for event in chatbot_wrapper.chat_stream(request.message, request.platform,
+                                                           fast=request.fast, session_id=session_id):
+                yield _sse_event(event)
+        except Exception as e:
+            yield _sse_event({"type": "error", "detail": f"Error processing chat: {str(e)}"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(
+    request: BatchChatRequest,
+    chatbot_wrapper: ChatbotWrapper = Depends(get_chatbot_dep)
+):
+    """Batch chat endpoint (newline-delimited JSON).
+
+    Answers every item and writes one JSON line per item as soon as it is
+    done, in completion order rather than request order. Each line carries
+    the item's ``id`` and the fields of a ``/chat`` response, or an ``error``.
+    """
+    ids = [item.id for item in request.items]
+    if len(set(ids)) != len(ids):
+        raise HTTPException(status_code=400, detail="Item ids must be unique")
+    if any(not item.message.strip() for item in request.items):
+        raise HTTPException(status_code=400, detail="Message cannot be empty")
+    items = [dict(item.model_dump(), session_id=item.session_id or uuid.uuid4().hex) for item in request.items]
+
+    async def result_stream():
+        answered = set()
+        try:
+            async for result in chatbot_wrapper.chat_batch(items):
+                answered.add(result["id"])
+                yield json.dumps(result, ensure_ascii=False) + "\n"
+        except Exception as e:
+            for item_id in ids:
+                if item_id not in answered:
+                    yield json.dumps({"id": item_id, "error": f"Error processing chat: {str(e)}"}) + "\n"
+
+    return StreamingResponse(
+        result_stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.get("/history", response_model=HistoryPage)
 async def get_history(
+    session_id: str = Query(..., max_length=128),
+    cursor: Optional[int] = None,
+    limit: int = Query(50, ge=1, le=200),
     chatbot_wrapper: ChatbotWrapper = Depends(get_chatbot_dep)
 ):
-    """Get conversation history"""
+    """Get one page of a session's conversation history (oldest first)"""
     try:
-        history = chatbot_wrapper.get_conversation_history()
-        return [ConversationEntry(**entry) for entry in history]
+        page = await chatbot_wrapper.get_conversation_history(session_id, cursor, limit)
+        return HistoryPage(
+            session_id=page["session_id"],
+            entries=[ConversationEntry(**entry) for entry in page["entries"]],
+            next_cursor=page["next_cursor"]
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting history: {str(e)}")
 
 @app.delete("/history")
 async def clear_history(
+    session_id: str = Query(..., max_length=128),
     chatbot_wrapper: ChatbotWrapper = Depends(get_chatbot_dep)
 ):
-    """Clear conversation history"""
+    """Clear one session's conversation history"""
     try:
-        chatbot_wrapper.clear_conversation_history()
+        await chatbot_wrapper.clear_conversation_history(session_id)
         return {"message": "Conversation history cleared"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing history: {str(e)}")
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metrics for this worker process"""
+    if not metrics.METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled (METRICS_ENABLED=0)")
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/platforms")
 async def get_platforms():
     """Get supported platforms"""
@@ -126,35 +331,110 @@ async def get_platforms():
     }
 
 @app.get("/health")
-async def health_check(
-    chatbot_wrapper: ChatbotWrapper = Depends(get_chatbot_dep)
-):
-    """Health check for monitoring"""
-    return {
+async def health_check():
+    """Liveness check for monitoring; answers during warm-up too (see /ready)"""
+    chatbot_wrapper = getattr(get_chatbot_dep, "instance", None)
+    health = {
         "status": "healthy",
         "chatbot_initialized": chatbot_wrapper is not None,
+        "ready": startup_state.ready,
         "version": "1.0.0"
     }
+    if chatbot_wrapper is not None:
+        from app import upstream
+        health.update({
+            "worker": chatbot_wrapper.get_worker_info(),
+            # Counts rows of the SQLite conversation store; keep that off the event loop
+            "caches": await asyncio.get_running_loop().run_in_executor(None, chatbot_wrapper.get_cache_stats),
+            "upstream": upstream.breaker_stats()
+        })
+    return health
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness check: 200 once this worker has warmed up and is serving retrieval, 503 until then"""
+    state = startup_state.snapshot()
+    state["pid"] = os.getpid()
+    return JSONResponse(state, status_code=200 if state["ready"] else 503)
 
-from content_processor import ContentProcessor
-@app.post("/admin/process-content")
-async def process_content():
-    """Admin endpoint to process and embed new content."""
-    try:
+
+# The job writes where every worker's reload poll reads (both follow CONTENT_PATH)
+PROCESSED_OUTPUT_PATH = PROCESSED_CONTENT_PATH
+
+def get_job_manager():
+    # Singleton pattern: store instance on function attribute
+    if not hasattr(get_job_manager, "instance"):
+        get_job_manager.instance = JobManager()
+    return get_job_manager.instance
+
+def run_content_ingestion(job, chatbot_wrapper: ChatbotWrapper, full: bool = False) -> Dict:
+    """Process, embed and save content, then hot-swap the live index (runs in the job thread)"""
+    # Jobs started by different workers take turns on the same output
+    job.update({"stage": "waiting"})
+    # Only admin jobs need the ingestion pipeline, so it is not imported at startup
+    from content_processor import ContentProcessor
+    with file_lock(PROCESSED_OUTPUT_PATH + ".ingest.lock"):
         processor = ContentProcessor()
-        ctf_primer_path = "./content/raw/ctf-primer"
-        output_path = "./content/processed/ctf_primer_processed.json"
-        if not os.path.exists(ctf_primer_path):
-            return {"error": f"CTF primer path not found: {ctf_primer_path}"}
-        processed_content = processor.process_ctf_primer_directory(ctf_primer_path)
-        processor.save_processed_content(processed_content, output_path)
-        return {
-            "message": f"Processed {len(processed_content)} files",
-            "output_path": output_path
-        }
+        # Files are written to the new store generation as they are embedded
+        result = processor.ingest_directory(
+            CTF_PRIMER_PATH, PROCESSED_OUTPUT_PATH, full=full, progress=job.update
+        )
+        for error in result["errors"]:
+            job.error(error["error"], file_path=error["file_path"])
+    # Other workers pick up the new generation within CONTENT_RELOAD_INTERVAL seconds
+    job.update({"stage": "reloading"})
+    reloaded = chatbot_wrapper.reload_content(wait=True)
+    job.update({"stage": "done"})
+    return {
+        "files": result["files"],
+        "output_path": PROCESSED_OUTPUT_PATH,
+        "reloaded": reloaded,
+        "stats": result["stats"],
+        "tombstones": len(result["tombstones"])
+    }
+
+@app.post("/admin/process-content", status_code=202)
+async def process_content(
+    full: bool = False,
+    chatbot_wrapper: ChatbotWrapper = Depends(get_chatbot_dep),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """Admin endpoint to process and embed new content in the background.
+
+    Only new or changed sections are embedded unless ``full=true``. Returns a
+    job id right away; poll ``/admin/jobs/{job_id}`` for progress. The live
+    index is swapped once the job succeeds.
+    """
+    if not os.path.exists(CTF_PRIMER_PATH):
+        raise HTTPException(status_code=404, detail=f"CTF primer path not found: {CTF_PRIMER_PATH}")
+    try:
+        job = jobs.submit(
+            "process-content",
+            lambda context: run_content_ingestion(context, chatbot_wrapper, full=full),
+            params={"full": full}
+        )
+        return {"job_id": job["id"], "status": job["status"], "status_url": f"/admin/jobs/{job['id']}"}
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing content: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Error starting content processing: {str(e)}")
+
+@app.get("/admin/jobs")
+async def list_jobs(
+    limit: int = Query(20, ge=1, le=100),
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """Recent background jobs, newest first"""
+    return {"jobs": jobs.list(limit)}
+
+@app.get("/admin/jobs/{job_id}")
+async def get_job(
+    job_id: str,
+    jobs: JobManager = Depends(get_job_manager)
+):
+    """Status, progress, throughput and errors of a background job"""
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job not found: {job_id}")
+    return job
 
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
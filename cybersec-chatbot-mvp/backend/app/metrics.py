@@ -0,0 +1,237 @@
+# backend/app/metrics.py
+"""Timing spans and Prometheus metrics without extra dependencies.
+
+Pipeline stages are timed with ``span(name)``. Each finished span is
+observed in the ``cybermentor_stage_seconds`` histogram and appended to the
+current request's timings, which main.py sends back as a ``Server-Timing``
+header. ``render()`` produces the Prometheus text format for /metrics.
+
+Metrics are kept per process. With several workers, every scrape reports
+the worker that answered it.
+
+Set METRICS_ENABLED=0 to turn all of this off. ``span()`` then returns a
+shared no-op object.
+"""
+import os
+import time
+import bisect
+import threading
+from contextvars import ContextVar
+from typing import List, Dict, Optional, Sequence
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1").lower() not in ("0", "false", "no")
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_registry = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0, *labels: str):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+                for labels, value in sorted(self._values.items())]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value: float, *labels: str):
+        with self._lock:
+            self._values[labels] = value
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, labels)} {value}"
+                for labels, value in sorted(self._values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help_text, label_names)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                # Per-bucket counts (the last one is +Inf), sum, count
+                series = self._values[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][bisect.bisect_left(self.buckets, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+    def _samples(self) -> List[str]:
+        lines = []
+        for labels, (counts, total, count) in sorted(self._values.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                le = 'le="+Inf"' if bound == float("inf") else f'le="{bound}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, labels)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, labels)} {count}")
+        return lines
+
+
+# Chat pipeline
+STAGE_SECONDS = Histogram("cybermentor_stage_seconds", "Time spent in each chat pipeline stage", ["stage"])
+LLM_TOKENS = Counter("cybermentor_tokens_total", "Tokens reported by the OpenAI API", ["stage", "kind"])
+CACHE_LOOKUPS = Counter("cybermentor_cache_lookups_total", "Cache lookups by cache and result", ["cache", "result"])
+COALESCED = Counter("cybermentor_coalesced_requests_total", "Calls that joined an identical in-flight call", ["call"])
+UPSTREAM_CALLS = Counter("cybermentor_upstream_calls_total", "OpenAI calls by call and outcome", ["call", "result"])
+HTTP_SECONDS = Histogram("cybermentor_http_request_seconds", "Time until the response headers are sent",
+                         ["method", "route", "status"])
+
+# Ingestion
+INGEST_FILE_SECONDS = Histogram("cybermentor_ingest_file_seconds", "Time to parse one content file")
+INGEST_BATCH_SECONDS = Histogram("cybermentor_ingest_embedding_batch_seconds", "Time to embed one batch of sections")
+INGEST_SECTIONS = Counter("cybermentor_ingest_sections_total", "Sections sent for embedding by result", ["result"])
+STARTUP_SECONDS = Gauge("cybermentor_startup_seconds", "Seconds from process start to the end of each startup stage",
+                        ["stage"])
+INGEST_SECTIONS_PER_SECOND = Gauge("cybermentor_ingest_sections_per_second", "Embedding throughput of the last ingestion run")
+
+_request_timings: ContextVar[Optional[List]] = ContextVar("request_timings", default=None)
+
+
+class Span:
+    """Times one stage; also records cache hits and token counts for it"""
+
+    __slots__ = ("name", "start", "description")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+        self.description = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        record(self.name, time.perf_counter() - self.start, self.description)
+        return False
+
+    def cache(self, cache: str, hit: bool):
+        CACHE_LOOKUPS.inc(1, cache, "hit" if hit else "miss")
+        self.description = f"{cache} {'hit' if hit else 'miss'}"
+
+    def tokens(self, prompt: int = 0, completion: int = 0):
+        if prompt:
+            LLM_TOKENS.inc(prompt, self.name, "prompt")
+        if completion:
+            LLM_TOKENS.inc(completion, self.name, "completion")
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def cache(self, cache: str, hit: bool):
+        pass
+
+    def tokens(self, prompt: int = 0, completion: int = 0):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def span(name: str):
+    """Context manager timing the named stage"""
+    if not METRICS_ENABLED:
+        return _NOOP_SPAN
+    return Span(name)
+
+
+def record(name: str, seconds: float, description: Optional[str] = None):
+    """Record an already measured stage duration"""
+    if not METRICS_ENABLED:
+        return
+    STAGE_SECONDS.observe(seconds, name)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings.append((name, seconds, description))
+
+
+def start_request() -> List:
+    """Collect stage timings for the current request (and tasks/threads started from it)"""
+    timings = []
+    _request_timings.set(timings)
+    return timings
+
+
+def request_timings() -> List:
+    """Stage timings recorded so far for the current request"""
+    return list(_request_timings.get() or [])
+
+
+def server_timing(timings: Optional[List] = None) -> str:
+    """Format timings as a Server-Timing header value"""
+    if timings is None:
+        timings = request_timings()
+    entries = []
+    for name, seconds, description in timings:
+        entry = f"{name};dur={seconds * 1000:.1f}"
+        if description:
+            entry += f';desc="{description}"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+def usage_tokens(response) -> Dict[str, int]:
+    """Prompt/completion token counts from an OpenAI response or final stream chunk"""
+    usage = getattr(response, "usage", None)
+    return {
+        "prompt": getattr(usage, "prompt_tokens", 0) or 0,
+        "completion": getattr(usage, "completion_tokens", 0) or 0
+    }
+
+
+def render() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
@@ -0,0 +1,295 @@
+# backend/app/processed_store.py
+"""Compact on-disk format for processed content.
+
+A store is a directory holding one or more generations plus a ``CURRENT``
+file naming the active one::
+
+    ctf_primer_processed/
+        CURRENT
+        20240101T120000-1a2b3c4d/
+            meta.json        format version, dtype, dimension, row count, fingerprint,
+                             embedding provider and model
+            files.jsonl      one line per source file (title, file_path, metadata)
+            sections.jsonl   one line per section (text, hashes, embedding row)
+            embeddings.bin   contiguous little-endian float32/float16 matrix
+            bm25.npz         lexical index, one document per section line
+
+New generations are written next to the old one and activated by atomically
+replacing ``CURRENT``, so readers never see a half-written store. The
+embedding matrix is memory-mapped rather than parsed.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+from typing import List, Dict, Iterator, Optional, Tuple
+
+import numpy as np
+
+from app.sections import assign_section_ids, has_embedding
+from app.lexical import BM25Builder
+
+FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+SUPPORTED_DTYPES = ("float32", "float16")
+# Generations kept on disk besides the active one (readers may still have them mapped)
+KEEP_GENERATIONS = 1
+
+
+def store_exists(store_path: str) -> bool:
+    """True if store_path holds an activated store"""
+    return os.path.isfile(os.path.join(store_path, CURRENT_FILE))
+
+
+def current_generation(store_path: str) -> str:
+    """Name of the active generation (changes whenever a new one is activated)"""
+    with open(os.path.join(store_path, CURRENT_FILE), "r", encoding="utf-8") as f:
+        return f.read().strip()
+
+
+def store_embedding(store_path: str) -> Optional[Dict]:
+    """Provider, model and dimension of the store's embeddings (only the dimension for older stores)"""
+    if not store_exists(store_path):
+        return None
+    return ProcessedStore(store_path).embedding_info
+
+
+class ProcessedStoreWriter:
+    """Stream processed files into a new store generation.
+
+    Use as a context manager; the generation is activated on a clean exit and
+    discarded if an exception escapes.
+    """
+
+    def __init__(self, store_path: str, dtype: str = "float32", embedding: Optional[Dict] = None):
+        if dtype not in SUPPORTED_DTYPES:
+            raise ValueError(f"Unsupported embedding dtype: {dtype}")
+        self.store_path = store_path
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.generation = f"{time.strftime('%Y%m%dT%H%M%S')}-{os.urandom(4).hex()}"
+        self.generation_path = os.path.join(store_path, self.generation)
+        # Provider and model of the embeddings, recorded so queries from another provider are refused
+        self.embedding = embedding
+        self.dim = None
+        self.file_count = 0
+        self.section_count = 0
+        self.row_count = 0
+        self.meta = None
+        self._digest = hashlib.sha256()
+        self._lexical = BM25Builder()
+
+        os.makedirs(self.generation_path)
+        self._files = open(os.path.join(self.generation_path, "files.jsonl"), "w", encoding="utf-8")
+        self._sections = open(os.path.join(self.generation_path, "sections.jsonl"), "w", encoding="utf-8")
+        self._embeddings = open(os.path.join(self.generation_path, "embeddings.bin"), "wb")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.abort()
+        return False
+
+    def _write_line(self, handle, record: Dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        self._digest.update(line.encode("utf-8"))
+        handle.write(line)
+
+    def add_file(self, content_data: Dict):
+        """Append one processed file and its sections"""
+        file_index = self.file_count
+        self._write_line(self._files, {
+            "title": content_data["title"],
+            "file_path": content_data["file_path"],
+            "metadata": content_data["metadata"]
+        })
+        self.file_count += 1
+
+        for section in content_data["sections"]:
+            row = -1
+            if has_embedding(section):
+                vector = np.asarray(section["embedding"], dtype=self.dtype)
+                if self.dim is None:
+                    self.dim = int(vector.shape[0])
+                elif vector.shape[0] != self.dim:
+                    raise ValueError(f"Embedding dimension {vector.shape[0]} does not match {self.dim}")
+                data = vector.tobytes()
+                self._digest.update(data)
+                self._embeddings.write(data)
+                row = self.row_count
+                self.row_count += 1
+
+            record = {key: value for key, value in section.items() if key != "embedding"}
+            record["file"] = file_index
+            record["row"] = row
+            self._write_line(self._sections, record)
+            self._lexical.add(f"{section['heading']}\n{section['content']}")
+            self.section_count += 1
+
+    def commit(self):
+        """Finish the generation and make it the active one"""
+        for handle in (self._files, self._sections, self._embeddings):
+            handle.flush()
+            os.fsync(handle.fileno())
+            handle.close()
+        self._lexical.build().save(os.path.join(self.generation_path, "bm25.npz"))
+
+        meta = {
+            "version": FORMAT_VERSION,
+            "generation": self.generation,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "dtype": self.dtype.name,
+            "dim": self.dim or 0,
+            "rows": self.row_count,
+            "files": self.file_count,
+            "sections": self.section_count,
+            "fingerprint": self._digest.hexdigest(),
+            "embedding": dict(self.embedding, dimension=self.dim or 0) if self.embedding else None
+        }
+        with open(os.path.join(self.generation_path, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump(meta, f, indent=2)
+
+        current_tmp = os.path.join(self.store_path, f"{CURRENT_FILE}.tmp")
+        with open(current_tmp, "w", encoding="utf-8") as f:
+            f.write(self.generation)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(current_tmp, os.path.join(self.store_path, CURRENT_FILE))
+
+        self._prune()
+        self.meta = meta
+        return meta
+
+    def abort(self):
+        """Discard the partially written generation"""
+        for handle in (self._files, self._sections, self._embeddings):
+            handle.close()
+        shutil.rmtree(self.generation_path, ignore_errors=True)
+
+    def _prune(self):
+        """Remove old generations beyond KEEP_GENERATIONS"""
+        generations = sorted(
+            name for name in os.listdir(self.store_path)
+            if name != self.generation and os.path.isfile(os.path.join(self.store_path, name, "meta.json"))
+        )
+        for name in generations[:max(0, len(generations) - KEEP_GENERATIONS)]:
+            shutil.rmtree(os.path.join(self.store_path, name), ignore_errors=True)
+
+
+class ProcessedStore:
+    """Read-only view of the active generation of a store"""
+
+    def __init__(self, store_path: str):
+        self.store_path = store_path
+        self.generation = current_generation(store_path)
+        self.generation_path = os.path.join(store_path, self.generation)
+        with open(os.path.join(self.generation_path, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if self.meta.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported processed store version: {self.meta.get('version')}")
+        self._embeddings = None
+        self._files = None
+
+    @property
+    def fingerprint(self) -> str:
+        return self.meta["fingerprint"]
+
+    @property
+    def embedding_info(self) -> Dict:
+        """Provider, model and dimension of the embeddings (only the dimension for older stores)"""
+        return self.meta.get("embedding") or {"dimension": self.meta["dim"]}
+
+    @property
+    def embeddings(self) -> np.ndarray:
+        """Memory-mapped (rows, dim) embedding matrix"""
+        if self._embeddings is None:
+            rows, dim = self.meta["rows"], self.meta["dim"]
+            if rows == 0:
+                self._embeddings = np.empty((0, dim), dtype=self.meta["dtype"])
+            else:
+                self._embeddings = np.memmap(
+                    os.path.join(self.generation_path, "embeddings.bin"),
+                    dtype=np.dtype(self.meta["dtype"]).newbyteorder("<"),
+                    mode="r",
+                    shape=(rows, dim)
+                )
+        return self._embeddings
+
+    @property
+    def files(self) -> List[Dict]:
+        """File records (title, file_path, metadata), small enough to keep in memory"""
+        if self._files is None:
+            with open(os.path.join(self.generation_path, "files.jsonl"), "r", encoding="utf-8") as f:
+                self._files = [json.loads(line) for line in f]
+        return self._files
+
+    @property
+    def lexical_index_path(self) -> str:
+        """BM25 index rows follow the order of sections.jsonl"""
+        return os.path.join(self.generation_path, "bm25.npz")
+
+    def iter_sections(self) -> Iterator[Tuple[Dict, Dict]]:
+        """Stream (file record, section record) pairs without loading everything"""
+        files = self.files
+        with open(os.path.join(self.generation_path, "sections.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                section = json.loads(line)
+                yield files[section["file"]], section
+
+    def embedding(self, section: Dict) -> Optional[np.ndarray]:
+        """Embedding row of a section record, or None if it has none"""
+        if section["row"] < 0:
+            return None
+        return self.embeddings[section["row"]]
+
+    def load_content(self) -> List[Dict]:
+        """Rebuild the list-of-files structure produced by ContentProcessor.
+
+        Embeddings are memory-mapped rows rather than Python lists.
+        """
+        content = [dict(file_record, sections=[]) for file_record in self.files]
+        for _, section in self.iter_sections():
+            row = section.pop("row")
+            file_index = section.pop("file")
+            if row >= 0:
+                section["embedding"] = self.embeddings[row]
+            content[file_index]["sections"].append(section)
+        return content
+
+
+def save_processed_store(processed_content: List[Dict], store_path: str, dtype: str = "float32",
+                         embedding: Optional[Dict] = None) -> Dict:
+    """Write processed content as a new store generation"""
+    with ProcessedStoreWriter(store_path, dtype=dtype, embedding=embedding) as writer:
+        for content_data in processed_content:
+            writer.add_file(content_data)
+    return writer.meta
+
+
+def convert_json(json_path: str, store_path: Optional[str] = None, dtype: str = "float32") -> str:
+    """Convert a legacy ctf_primer_processed.json file into a store"""
+    store_path = store_path or os.path.splitext(json_path)[0]
+    with open(json_path, "r", encoding="utf-8") as f:
+        processed_content = json.load(f)
+    for content_data in processed_content:
+        assign_section_ids(content_data)
+    save_processed_store(processed_content, store_path, dtype=dtype)
+    return store_path
+
+
+if __name__ == "__main__":
+    # python -m app.processed_store <processed.json> [store_path] [float32|float16]
+    if len(sys.argv) < 2:
+        print("Usage: python -m app.processed_store <processed.json> [store_path] [float32|float16]")
+        sys.exit(1)
+    store = convert_json(
+        sys.argv[1],
+        sys.argv[2] if len(sys.argv) > 2 else None,
+        sys.argv[3] if len(sys.argv) > 3 else "float32"
+    )
+    print(f"Converted {sys.argv[1]} to {store}")
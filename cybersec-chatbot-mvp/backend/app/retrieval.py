@@ -0,0 +1,616 @@
+# backend/app/retrieval.py
+"""Pluggable vector retrieval backends used by CybersecurityChatbot.
+
+Every backend loads processed content (a processed store or legacy JSON file)
+and answers queries with a Chroma-shaped result dict::
+
+    {"ids": [[...]], "documents": [[...]], "metadatas": [[...]], "distances": [[...]]}
+
+Distances are squared L2 distances between unit vectors, as Chroma reports them.
+The backend is chosen with RETRIEVAL_BACKEND ("chroma" or "numpy"). A Chroma
+PersistentClient must not be shared between processes, so with several
+workers the default is the NumPy index, whose matrix every worker maps
+read-only from the same file.
+"""
+import os
+import json
+import time
+import hashlib
+import threading
+from typing import List, Dict, Optional, Iterator, Tuple, Callable
+
+import numpy as np
+
+from app.sections import assign_section_ids, has_embedding
+from app.processed_store import ProcessedStore, store_exists, current_generation
+from app.lexical import BM25Builder, BM25Index
+from app.workers import MULTI_WORKER
+
+RETRIEVAL_BACKEND = os.getenv("RETRIEVAL_BACKEND", "numpy" if MULTI_WORKER else "chroma")
+# Set to "int8" to quantize the NumPy index (4x less memory)
+NUMPY_INDEX_QUANTIZATION = os.getenv("NUMPY_INDEX_QUANTIZATION", "")
+# Rows converted at a time when scoring a quantized index
+QUANTIZED_SCORE_CHUNK = 65536
+# Default retrieval mode: "hybrid" (vector + BM25), "vector" or "lexical"
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid")
+# Reciprocal-rank-fusion constant; larger values flatten the rank weighting
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+
+def empty_results() -> Dict:
+    return {"ids": [[]], "documents": [[]], "metadatas": [[]], "distances": [[]]}
+
+
+def section_metadata(file_record: Dict, section: Dict) -> Dict:
+    """Metadata stored alongside a section in every backend"""
+    return {
+        "title": file_record["title"],
+        "heading": section["heading"],
+        # Chroma metadata values must be scalars
+        "breadcrumbs": " > ".join(section.get("breadcrumbs") or [section["heading"]]),
+        "platform": file_record["metadata"]["platform"],
+        "difficulty": file_record["metadata"]["difficulty"],
+        "topics": ",".join(file_record["metadata"]["topics"]),
+        "word_count": section["word_count"],
+        "file_path": file_record["file_path"],
+        "content_hash": section["content_hash"]
+    }
+
+
+def file_fingerprint(path: str) -> str:
+    """SHA-256 of a file, read in chunks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def resolve_content_path(content_path: str) -> str:
+    """Where the content named by content_path is right now.
+
+    The processed store at content_path once its first generation has been
+    activated, otherwise the legacy JSON file content_path + ".json" if there
+    is one. Resolved again on every check, so a store written after startup
+    replaces the JSON file.
+    """
+    if store_exists(content_path) or content_path.endswith(".json"):
+        return content_path
+    json_path = f"{content_path}.json"
+    return json_path if os.path.exists(json_path) else content_path
+
+
+def content_version(content_path: str) -> Optional[str]:
+    """Cheap token that changes whenever the content at content_path is replaced"""
+    content_path = resolve_content_path(content_path)
+    if store_exists(content_path):
+        return f"store:{current_generation(content_path)}"
+    if os.path.exists(content_path):
+        stat = os.stat(content_path)
+        return f"json:{stat.st_mtime_ns}:{stat.st_size}"
+    return None
+
+
+def content_snapshot(content_path: str) -> Tuple[str, Optional[ProcessedStore], Optional[str]]:
+    """Pin the current generation of the content: (resolved path, store, version).
+
+    store is None for legacy JSON or missing content. Pass it to every
+    index loaded for one version so they all read the same generation.
+    """
+    content_path = resolve_content_path(content_path)
+    if store_exists(content_path):
+        store = ProcessedStore(content_path)
+        return content_path, store, f"store:{store.generation}"
+    return content_path, None, content_version(content_path)
+
+
+def open_content(content_path: str, embedded_only: bool = True, store: Optional[ProcessedStore] = None) -> Optional[
+        Tuple[str, Callable[[], Iterator[Tuple[Dict, Dict, np.ndarray]]], Optional[ProcessedStore]]]:
+    """Open processed content for loading.
+
+    Returns (fingerprint, iter_sections, store) where iter_sections() streams
+    (file record, section, embedding) for every section that has an
+    embedding (or every section, with embedded_only=False), or None if
+    nothing exists at content_path. store is the generation that was opened
+    (None for legacy JSON); use it, not content_path, for anything else that
+    belongs to the same snapshot. Pass store to read a generation pinned
+    earlier instead of the current one.
+    """
+    if store is None and store_exists(content_path):
+        store = ProcessedStore(content_path)
+    if store is not None:
+
+        def iter_sections():
+            for file_record, section in store.iter_sections():
+                if section["row"] >= 0 or not embedded_only:
+                    yield file_record, section, store.embedding(section)
+
+        return store.fingerprint, iter_sections, store
+
+    if os.path.exists(content_path):
+        def iter_sections():
+            with open(content_path, 'r', encoding='utf-8') as f:
+                processed_content = json.load(f)
+            for file_data in processed_content:
+                assign_section_ids(file_data)
+                for section in file_data["sections"]:
+                    if has_embedding(section) or not embedded_only:  # Only add sections with embeddings
+                        yield file_data, section, section.get("embedding")
+
+        return file_fingerprint(content_path), iter_sections, None
+
+    return None
+
+
+class RetrievalBackend:
+    """Interface for the vector search behind search_relevant_content"""
+
+    name = "base"
+
+    def load(self, content_path: str, store: Optional[ProcessedStore] = None):
+        """Make the processed content at content_path (the pinned store generation, if given) searchable"""
+        raise NotImplementedError
+
+    def standby(self) -> "RetrievalBackend":
+        """Backend to load new content into while this one keeps serving queries"""
+        return create_backend(self.name)
+
+    def query(self, query_embedding: List[float], platform: Optional[str] = None, n_results: int = 5) -> Dict:
+        """Return the n_results nearest sections, optionally filtered by platform"""
+        raise NotImplementedError
+
+    def query_batch(self, query_embeddings: List[List[float]], platforms: List[Optional[str]],
+                    n_results: int = 5) -> List[Dict]:
+        """query() for several embeddings at once; one result dict per query"""
+        return [self.query(embedding, platform, n_results) for embedding, platform in zip(query_embeddings, platforms)]
+
+    def count(self) -> int:
+        """Number of searchable sections"""
+        raise NotImplementedError
+
+    def warm_up(self):
+        """Run one query so the first real one does not pay for lazy loading"""
+
+
+class ChromaBackend(RetrievalBackend):
+    """Chroma persistent collection, synced incrementally from processed content.
+
+    Two collections (collection_name and collection_name + "_b") take turns:
+    a reload syncs the one that is not being queried and then swaps, so
+    queries never see a half-applied delta.
+    """
+
+    name = "chroma"
+
+    def __init__(self, db_path: Optional[str] = None, collection_name: str = "cybersec_content",
+                 client=None, exclude: Optional[str] = None):
+        if client is None:
+            import chromadb
+            client = chromadb.PersistentClient(path=db_path or os.getenv("CHROMA_DB_PATH", "./data/chromadb"))
+        self.chroma_client = client
+        self.base_name = collection_name
+        # Collections this backend may load into; exclude is the one still serving queries
+        self.collection_names = [name for name in (collection_name, f"{collection_name}_b") if name != exclude]
+        self.collection_name = self.collection_names[0]
+        self.collection = self._collection(self.collection_name)
+
+    def _collection(self, name: str):
+        # Initialize or get collection
+        try:
+            return self.chroma_client.get_collection(name=name)
+        except:
+            return self.chroma_client.create_collection(name=name)
+
+    def _use(self, name: str):
+        self.collection_name = name
+        self.collection = self._collection(name)
+
+    def standby(self) -> "ChromaBackend":
+        # Same client (one per process and path), the other collection
+        return ChromaBackend(client=self.chroma_client, collection_name=self.base_name,
+                             exclude=self.collection_name)
+
+    def load(self, content_path: str, store: Optional[ProcessedStore] = None):
+        """Sync processed content into one of the collections.
+
+        Idempotent: a collection whose recorded content fingerprint matches is
+        used as it is. Otherwise only new or changed sections are upserted and
+        ids that are no longer present are deleted.
+        """
+        start = time.perf_counter()
+        opened = open_content(content_path, store=store)
+        if opened is None:
+            print(f"Content file not found: {content_path}")
+            return
+        fingerprint, iter_sections, store = opened
+
+        embedding = store.embedding_info if store is not None else {}
+        embedding_key = f"{embedding['provider']}:{embedding['model']}:{embedding['dimension']}" if embedding.get("provider") else ""
+        for name in self.collection_names:
+            collection = self._collection(name)
+            metadata = collection.metadata or {}
+            if (metadata.get("content_fingerprint") == fingerprint and metadata.get("embedding", "") == embedding_key
+                    and collection.count() > 0):
+                self._use(name)
+                print(f"Vector database already up to date ({name}, {time.perf_counter() - start:.2f}s)")
+                return
+
+        collection_metadata = self.collection.metadata or {}
+        if collection_metadata.get("embedding", "") != embedding_key and self.collection.count() > 0:
+            # Unchanged sections have new vectors, possibly of another dimension; start over
+            print(f"Embeddings changed ({collection_metadata.get('embedding') or 'unrecorded'} -> {embedding_key}), "
+                  f"recreating collection {self.collection_name}")
+            self.chroma_client.delete_collection(self.collection_name)
+            self.collection = self.chroma_client.create_collection(name=self.collection_name)
+            collection_metadata = {}
+
+        existing = self.collection.get(include=["metadatas"])
+        existing_hashes = {
+            section_id: (metadata or {}).get("content_hash")
+            for section_id, metadata in zip(existing["ids"], existing["metadatas"])
+        }
+
+        # First pass: work out the delta from ids and hashes only
+        wanted = {section["id"]: section["content_hash"] for _, section, _ in iter_sections()}
+        changed = {
+            section_id for section_id, content_hash in wanted.items()
+            if existing_hashes.get(section_id) != content_hash
+        }
+        stale = [section_id for section_id in existing_hashes if section_id not in wanted]
+
+        batch_size = 100
+        for i in range(0, len(stale), batch_size):
+            self.collection.delete(ids=stale[i:i + batch_size])
+
+        # Second pass: stream the changed sections into the collection in batches
+        batch = {"ids": [], "documents": [], "embeddings": [], "metadatas": []}
+
+        def flush():
+            if batch["ids"]:
+                self.collection.upsert(**batch)
+                for values in batch.values():
+                    values.clear()
+
+        if changed:
+            for file_record, section, embedding in iter_sections():
+                if section["id"] not in changed:
+                    continue
+                batch["ids"].append(section["id"])
+                batch["documents"].append(section["content"])
+                batch["embeddings"].append(np.asarray(embedding, dtype=np.float32))
+                batch["metadatas"].append(section_metadata(file_record, section))
+                if len(batch["ids"]) >= batch_size:
+                    flush()
+            flush()
+
+        self.collection.modify(metadata=dict(collection_metadata, content_fingerprint=fingerprint,
+                                             embedding=embedding_key))
+        print(f"Synced vector database ({self.collection_name}): {len(changed)} upserted, {len(stale)} deleted, "
+              f"{len(wanted) - len(changed)} unchanged ({time.perf_counter() - start:.2f}s)")
+
+    def query(self, query_embedding: List[float], platform: Optional[str] = None, n_results: int = 5) -> Dict:
+        """Run a (blocking) vector query against the Chroma collection"""
+        # Build where clause for filtering
+        where_clause = {}
+        if platform:
+            where_clause["platform"] = platform
+
+        return self.collection.query(
+            query_embeddings=[query_embedding],
+            n_results=n_results,
+            where=where_clause if where_clause else None
+        )
+
+    def query_batch(self, query_embeddings: List[List[float]], platforms: List[Optional[str]],
+                    n_results: int = 5) -> List[Dict]:
+        """One Chroma query per platform, each carrying all of that platform's embeddings"""
+        results = [None] * len(query_embeddings)
+        groups = {}
+        for i, platform in enumerate(platforms):
+            groups.setdefault(platform, []).append(i)
+        for platform, indexes in groups.items():
+            batch = self.collection.query(
+                query_embeddings=[query_embeddings[i] for i in indexes],
+                n_results=n_results,
+                where={"platform": platform} if platform else None
+            )
+            for column, i in enumerate(indexes):
+                results[i] = {key: [batch[key][column]] for key in ("ids", "documents", "metadatas", "distances")}
+        return results
+
+    def count(self) -> int:
+        return self.collection.count()
+
+    def warm_up(self):
+        # Chroma loads the vector index of a collection on its first query
+        if not self.count():
+            return
+        sample = self.collection.peek(1)["embeddings"]
+        if sample is not None and len(sample):
+            self.query(list(sample[0]), None, 1)
+
+
+class NumpyBackend(RetrievalBackend):
+    """Exact in-process search over one normalized embedding matrix.
+
+    Rows are grouped by platform so a platform filter is a contiguous slice of
+    the matrix. For a processed store the matrix is built once per store
+    generation, saved next to it and memory-mapped on later loads.
+    """
+
+    name = "numpy"
+
+    def __init__(self, quantization: str = NUMPY_INDEX_QUANTIZATION):
+        if quantization not in ("", "int8"):
+            raise ValueError(f"Unsupported quantization: {quantization}")
+        self.quantization = quantization
+        self.vectors = np.empty((0, 0), dtype=np.float32)
+        self.scales = None
+        self.platform_ranges = {}
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self.fingerprint = None
+
+    def load(self, content_path: str, store: Optional[ProcessedStore] = None):
+        start = time.perf_counter()
+        opened = open_content(content_path, store=store)
+        if opened is None:
+            print(f"Content file not found: {content_path}")
+            return
+        fingerprint, iter_sections, store = opened
+
+        records = []
+        for file_record, section, _ in iter_sections():
+            records.append((section["id"], section["content"], section_metadata(file_record, section)))
+        # Group rows by platform; a stable sort keeps the original order within a platform
+        order = sorted(range(len(records)), key=lambda i: records[i][2]["platform"])
+
+        index_dir = None
+        if store is not None:
+            # The generation whose rows were just read, even if CURRENT has moved on since
+            index_dir = os.path.join(store.generation_path, f"numpy_index{'_' + self.quantization if self.quantization else ''}")
+        if index_dir and os.path.exists(os.path.join(index_dir, "vectors.npy")):
+            self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+            if self.quantization:
+                self.scales = np.load(os.path.join(index_dir, "scales.npy"))
+        else:
+            embeddings = [None] * len(records)
+            for i, (_, _, embedding) in enumerate(iter_sections()):
+                embeddings[i] = embedding
+            self._build([embeddings[i] for i in order])
+            if index_dir:
+                self._save(index_dir)
+                self.vectors = np.load(os.path.join(index_dir, "vectors.npy"), mmap_mode="r")
+
+        self.ids = [records[i][0] for i in order]
+        self.documents = [records[i][1] for i in order]
+        self.metadatas = [records[i][2] for i in order]
+        self.platform_ranges = {}
+        for row, metadata in enumerate(self.metadatas):
+            first, _ = self.platform_ranges.get(metadata["platform"], (row, row))
+            self.platform_ranges[metadata["platform"]] = (first, row + 1)
+        self.fingerprint = fingerprint
+        print(f"Loaded {len(self.ids)} sections into NumPy index "
+              f"({self.quantization or 'float32'}, {time.perf_counter() - start:.2f}s)")
+
+    def _build(self, embeddings: List):
+        """Normalize (and optionally quantize) the embedding rows"""
+        if not embeddings:
+            self.vectors = np.empty((0, 0), dtype=np.float32)
+            self.scales = np.empty(0, dtype=np.float32) if self.quantization else None
+            return
+        matrix = np.asarray(np.stack([np.asarray(e, dtype=np.float32) for e in embeddings]), dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        if self.quantization == "int8":
+            # Symmetric per-row quantization: row ~= int8 values * scale
+            scales = np.abs(matrix).max(axis=1) / 127.0
+            scales[scales == 0] = 1.0
+            self.vectors = np.round(matrix / scales[:, None]).astype(np.int8)
+            self.scales = scales.astype(np.float32)
+        else:
+            self.vectors = matrix
+
+    def _save(self, index_dir: str):
+        os.makedirs(index_dir, exist_ok=True)
+        names = {"vectors.npy": self.vectors}
+        if self.quantization:
+            names["scales.npy"] = self.scales
+        for name, array in names.items():
+            tmp_path = os.path.join(index_dir, f"{name}.{os.getpid()}.tmp.npy")
+            np.save(tmp_path, array)
+            os.replace(tmp_path, os.path.join(index_dir, name))
+
+    def _scores(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        """Cosine similarity of the query (a vector, or one query per column) against rows [start, end)"""
+        if not self.quantization:
+            return self.vectors[start:end] @ query
+        scores = np.empty((end - start,) + query.shape[1:], dtype=np.float32)
+        for chunk_start in range(start, end, QUANTIZED_SCORE_CHUNK):
+            chunk_end = min(end, chunk_start + QUANTIZED_SCORE_CHUNK)
+            scores[chunk_start - start:chunk_end - start] = (
+                self.vectors[chunk_start:chunk_end].astype(np.float32) @ query
+            )
+        scales = self.scales[start:end]
+        return scores * (scales[:, None] if scores.ndim == 2 else scales)
+
+    def _range(self, platform: Optional[str]) -> Tuple[int, int]:
+        if platform:
+            return self.platform_ranges.get(platform, (0, 0))
+        return 0, len(self.ids)
+
+    def _check_dimension(self, dimension: int):
+        if dimension != self.vectors.shape[1]:
+            raise ValueError(f"Query dimension {dimension} does not match index dimension {self.vectors.shape[1]}")
+
+    def _top(self, scores: np.ndarray, start: int, n_results: int) -> Dict:
+        """Result dict for the n_results best scores of rows starting at start"""
+        k = min(n_results, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        rows = top + start
+
+        return {
+            "ids": [[self.ids[row] for row in rows]],
+            "documents": [[self.documents[row] for row in rows]],
+            "metadatas": [[self.metadatas[row] for row in rows]],
+            "distances": [[float(2.0 - 2.0 * scores[i]) for i in top]]
+        }
+
+    def query(self, query_embedding: List[float], platform: Optional[str] = None, n_results: int = 5) -> Dict:
+        start, end = self._range(platform)
+        if end <= start or n_results <= 0:
+            return empty_results()
+
+        query = np.asarray(query_embedding, dtype=np.float32)
+        self._check_dimension(query.shape[0])
+        norm = np.linalg.norm(query)
+        if norm:
+            query = query / norm
+        return self._top(self._scores(query, start, end), start, n_results)
+
+    def query_batch(self, query_embeddings: List[List[float]], platforms: List[Optional[str]],
+                    n_results: int = 5) -> List[Dict]:
+        """Score all queries for a platform with one matrix product instead of one per query"""
+        results = [empty_results() for _ in query_embeddings]
+        groups = {}
+        for i, platform in enumerate(platforms):
+            groups.setdefault(platform or None, []).append(i)
+        for platform, indexes in groups.items():
+            start, end = self._range(platform)
+            if end <= start or n_results <= 0:
+                continue
+            queries = np.asarray([query_embeddings[i] for i in indexes], dtype=np.float32)
+            self._check_dimension(queries.shape[1])
+            norms = np.linalg.norm(queries, axis=1, keepdims=True)
+            norms[norms == 0] = 1.0
+            # (rows, queries): column j holds the scores of query indexes[j]
+            scores = self._scores(np.ascontiguousarray((queries / norms).T), start, end)
+            for column, i in enumerate(indexes):
+                results[i] = self._top(scores[:, column], start, n_results)
+        return results
+
+    def count(self) -> int:
+        return len(self.ids)
+
+    def warm_up(self):
+        # Scores every row, which reads the memory-mapped matrix into the page cache
+        if self.ids:
+            self.query(np.ones(self.vectors.shape[1], dtype=np.float32), None, 1)
+
+
+class LexicalRetriever:
+    """BM25 search over every processed section (including ones without embeddings).
+
+    The index and section records are loaded lazily on first use from the
+    store's prebuilt bm25.npz, or built in memory for legacy JSON content.
+    Pass store to pin the generation read then, rather than whichever is
+    current when the index is first used.
+    """
+
+    def __init__(self, content_path: str, store: Optional[ProcessedStore] = None):
+        self.content_path = content_path
+        self.store = store
+        self.index = None
+        self.ids = []
+        self.documents = []
+        self.metadatas = []
+        self._platform_codes = None
+        self._platforms = {}
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self.index is not None
+
+    def ensure_loaded(self) -> bool:
+        """Load the index if needed; returns False if there is no content"""
+        if self.index is not None:
+            return True
+        with self._lock:
+            if self.index is not None:
+                return True
+            opened = open_content(self.content_path, embedded_only=False, store=self.store)
+            if opened is None:
+                return False
+            _, iter_sections, store = opened
+
+            start = time.perf_counter()
+            builder = None
+            index_path = store.lexical_index_path if store is not None else None
+            if not index_path or not os.path.exists(index_path):
+                builder = BM25Builder()
+
+            ids, documents, metadatas, codes = [], [], [], []
+            for file_record, section, _ in iter_sections():
+                ids.append(section["id"])
+                documents.append(section["content"])
+                metadata = section_metadata(file_record, section)
+                metadatas.append(metadata)
+                codes.append(self._platforms.setdefault(metadata["platform"], len(self._platforms)))
+                if builder is not None:
+                    builder.add(f"{section['heading']}\n{section['content']}")
+
+            self.ids, self.documents, self.metadatas = ids, documents, metadatas
+            self._platform_codes = np.asarray(codes, dtype=np.int32)
+            self.index = builder.build() if builder is not None else BM25Index.load(index_path)
+            print(f"Loaded lexical index over {len(ids)} sections ({time.perf_counter() - start:.2f}s)")
+            return True
+
+    def query(self, query_text: str, platform: Optional[str] = None, n_results: int = 5) -> Dict:
+        if not self.ensure_loaded():
+            return empty_results()
+        allowed = None
+        if platform:
+            code = self._platforms.get(platform)
+            if code is None:
+                return empty_results()
+            allowed = self._platform_codes == code
+        rows, scores = self.index.search(query_text, n_results, allowed)
+        rows = rows.tolist()
+        return {
+            "ids": [[self.ids[row] for row in rows]],
+            "documents": [[self.documents[row] for row in rows]],
+            "metadatas": [[self.metadatas[row] for row in rows]],
+            "distances": [[None for _ in rows]],
+            "scores": [scores.tolist()]
+        }
+
+
+def fuse_results(vector_results: Dict, lexical_results: Dict, n_results: int = 5) -> Dict:
+    """Reciprocal rank fusion of vector and lexical results (Chroma-shaped)"""
+    fused = {}
+    for results in (vector_results, lexical_results):
+        if not results.get("ids") or not results["ids"][0]:
+            continue
+        distances = (results.get("distances") or [[]])[0] or [None] * len(results["ids"][0])
+        for rank, (section_id, document, metadata, distance) in enumerate(zip(
+                results["ids"][0], results["documents"][0], results["metadatas"][0], distances)):
+            entry = fused.setdefault(section_id, {
+                "document": document, "metadata": metadata, "distance": None, "score": 0.0
+            })
+            entry["score"] += 1.0 / (RRF_K + rank + 1)
+            if distance is not None:
+                entry["distance"] = distance
+
+    ranked = sorted(fused.items(), key=lambda item: item[1]["score"], reverse=True)[:n_results]
+    return {
+        "ids": [[section_id for section_id, _ in ranked]],
+        "documents": [[entry["document"] for _, entry in ranked]],
+        "metadatas": [[entry["metadata"] for _, entry in ranked]],
+        "distances": [[entry["distance"] for _, entry in ranked]],
+        "scores": [[entry["score"] for _, entry in ranked]]
+    }
+
+
+def create_backend(name: str = RETRIEVAL_BACKEND) -> RetrievalBackend:
+    """Instantiate the retrieval backend selected by name"""
+    if name == "chroma":
+        if MULTI_WORKER:
+            print("Warning: the Chroma backend is not safe with several workers; use RETRIEVAL_BACKEND=numpy")
+        return ChromaBackend()
+    if name == "numpy":
+        return NumpyBackend()
+    raise ValueError(f"Unknown retrieval backend: {name}")
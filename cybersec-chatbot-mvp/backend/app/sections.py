@@ -0,0 +1,46 @@
+# backend/app/sections.py
+import os
+import hashlib
+from pathlib import PurePath
+from typing import Dict, Optional
+
+
+def section_content_hash(section: Dict) -> str:
+    """Hash of a section's heading and text"""
+    return hashlib.sha256(f"{section['heading']}\n{section['content']}".encode("utf-8")).hexdigest()
+
+
+def source_path(file_path: str, root: Optional[str] = None) -> str:
+    """file_path relative to root (or normalized) with POSIX separators.
+
+    Section ids and the ingestion manifest are keyed on this, so
+    "./content/raw/x.adoc" and "content/raw/x.adoc" name the same file.
+    """
+    path = os.path.relpath(file_path, root) if root else os.path.normpath(file_path)
+    return PurePath(path).as_posix()
+
+
+def assign_section_ids(content_data: Dict):
+    """Give every section of a processed file a content hash and a stable id.
+
+    The id only changes when the section itself changes, so an edited
+    section shows up as one removed id plus one new id. Files are identified
+    by their source_path, not by how the primer directory was spelled.
+    """
+    path = content_data.get("source_path") or source_path(content_data["file_path"])
+    file_key = hashlib.sha1(path.encode("utf-8")).hexdigest()[:12]
+    seen = {}
+    for section in content_data["sections"]:
+        if "content_hash" not in section:
+            section["content_hash"] = section_content_hash(section)
+        section_id = f"{file_key}_{section['content_hash'][:16]}"
+        # Identical sections within one file still need distinct ids
+        occurrence = seen.get(section_id, 0)
+        seen[section_id] = occurrence + 1
+        section["id"] = section_id if occurrence == 0 else f"{section_id}_{occurrence}"
+
+
+def has_embedding(section: Dict) -> bool:
+    """True if a section carries a non-empty embedding (list or array)"""
+    embedding = section.get("embedding")
+    return embedding is not None and len(embedding) > 0
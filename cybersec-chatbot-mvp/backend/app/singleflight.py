@@ -0,0 +1,65 @@
+# backend/app/singleflight.py
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from app import metrics
+
+
+class SingleFlight:
+    """Coalesce concurrent identical async calls into one.
+
+    The first caller for a key starts the call as a task. Callers that arrive
+    while it is running await the same task and get its result or exception.
+    A caller that is cancelled only stops waiting; the shared task is
+    cancelled once nobody is waiting for it any more. Results are not kept
+    after the call finishes.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls = {}  # key -> [task, number of waiting callers]
+        self.leaders = 0
+        self.joined = 0
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of factory(), sharing it with concurrent callers of the same key"""
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(factory())
+            call = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _, key=key, call=call: self._forget(key, call))
+            self.leaders += 1
+        else:
+            self.joined += 1
+            if metrics.METRICS_ENABLED:
+                metrics.COALESCED.inc(1, self.name)
+
+        task = call[0]
+        call[1] += 1
+        try:
+            return await asyncio.shield(task)
+        finally:
+            call[1] -= 1
+            if call[1] == 0 and not task.done():
+                # Every caller went away; stop the upstream work too
+                task.cancel()
+
+    def in_flight(self, key: Hashable) -> bool:
+        """True if a call for key is running, so do() would join it rather than start one"""
+        return key in self._calls
+
+    def _forget(self, key: Hashable, call: list):
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        task = call[0]
+        if not task.cancelled():
+            task.exception()  # Retrieved by the waiters; avoid "exception was never retrieved"
+
+    def stats(self) -> Dict:
+        calls = self.leaders + self.joined
+        return {
+            "in_flight": len(self._calls),
+            "leaders": self.leaders,
+            "joined": self.joined,
+            "coalesced_rate": round(self.joined / calls, 4) if calls else 0.0
+        }
@@ -0,0 +1,73 @@
+# backend/app/startup.py
+"""Worker startup progress and readiness.
+
+main.py warms the worker up in the background after boot: it loads the
+chatbot, index and caches, then opens upstream connections. Each finished
+stage is recorded here with the seconds since the process started, and
+``/ready`` answers from this state. Until warm-up ends, ``/ready`` returns
+503 while ``/health`` still reports the process as alive.
+"""
+import os
+import time
+import threading
+from typing import Dict, Optional
+
+from app import metrics
+
+# Import time of this module, used when the process start time cannot be read
+IMPORT_TIME = time.time()
+
+
+def process_start_time() -> float:
+    """Wall-clock time at which this process started"""
+    try:
+        with open("/proc/self/stat") as f:
+            # Field 22 (starttime, in clock ticks after boot); the command name may contain spaces
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime") as f:
+            uptime = float(f.read().split()[0])
+        return time.time() - uptime + start_ticks / os.sysconf("SC_CLK_TCK")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return IMPORT_TIME
+
+
+class StartupState:
+    """Stage timings and readiness of this worker"""
+
+    def __init__(self):
+        self.started_at = process_start_time()
+        self.stages = {}  # stage -> seconds since process start
+        self.ready = False
+        self.error = None
+        self._lock = threading.Lock()
+        self.mark("imported")
+
+    def mark(self, stage: str, elapsed: Optional[float] = None):
+        """Record that a stage finished now (or elapsed seconds after process start)"""
+        if elapsed is None:
+            elapsed = time.time() - self.started_at
+        with self._lock:
+            self.stages[stage] = round(elapsed, 3)
+        if metrics.METRICS_ENABLED:
+            metrics.STARTUP_SECONDS.set(elapsed, stage)
+
+    def set_ready(self):
+        self.mark("ready")
+        with self._lock:
+            self.ready = True
+        print(f"Worker {os.getpid()} ready {self.stages['ready']:.2f}s after start: {self.stages}")
+
+    def set_failed(self, error: Exception):
+        with self._lock:
+            self.error = str(error)
+        print(f"Worker {os.getpid()} warm-up failed: {error}")
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "ready": self.ready,
+                "status": "ready" if self.ready else ("failed" if self.error else "starting"),
+                "time_to_ready": self.stages.get("ready"),
+                "stages": dict(self.stages),
+                "error": self.error
+            }
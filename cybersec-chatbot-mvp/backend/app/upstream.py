@@ -0,0 +1,312 @@
+# backend/app/upstream.py
+"""Shared OpenAI clients and the policy for calls to the API.
+
+The chatbot and the content processor use the clients returned by
+``get_openai_client`` and ``get_async_openai_client``. Each process has one
+sync and one async connection pool, with keep-alive, and HTTP/2 when the h2
+package is installed. The clients never retry on their own.
+
+Calls made through ``call``/``acall`` get:
+
+- a deadline covering all attempts, so a slow upstream costs at most that
+  long instead of the client's default timeout;
+- jittered exponential backoff on rate limits and transient errors, for as
+  long as the deadline allows;
+- a circuit breaker per kind of call. After BREAKER_FAILURE_THRESHOLD
+  failures in a row it rejects calls right away. After
+  BREAKER_RESET_SECONDS it lets one trial call through;
+- optional hedging (async only): if the first request has not answered
+  after a delay, an identical second one is sent and the first answer wins.
+
+A call that fails or is rejected raises ``UpstreamError``, and the caller
+switches to its cheaper fallback.
+"""
+import os
+import time
+import random
+import asyncio
+import threading
+import importlib.util
+from typing import Any, Awaitable, Callable, Dict
+
+import openai
+
+from app import metrics
+
+# Connection pool shared by every client in the process
+UPSTREAM_MAX_CONNECTIONS = int(os.getenv("UPSTREAM_MAX_CONNECTIONS", "100"))
+UPSTREAM_KEEPALIVE_CONNECTIONS = int(os.getenv("UPSTREAM_KEEPALIVE_CONNECTIONS", "20"))
+UPSTREAM_KEEPALIVE_EXPIRY = float(os.getenv("UPSTREAM_KEEPALIVE_EXPIRY", "30"))
+# "auto" enables HTTP/2 when the h2 package is installed
+UPSTREAM_HTTP2 = os.getenv("UPSTREAM_HTTP2", "auto").lower()
+# Connect and read timeouts of a single request (calls with a deadline use the smaller of the two)
+UPSTREAM_CONNECT_TIMEOUT = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT", "3"))
+UPSTREAM_READ_TIMEOUT = float(os.getenv("UPSTREAM_READ_TIMEOUT", "60"))
+# Deadlines, in seconds, for a query embedding and a chat completion including retries
+EMBEDDING_DEADLINE = float(os.getenv("EMBEDDING_DEADLINE", "4"))
+COMPLETION_DEADLINE = float(os.getenv("COMPLETION_DEADLINE", "30"))
+# Deadline for embedding a whole batch of queries in one request
+EMBEDDING_BATCH_DEADLINE = float(os.getenv("EMBEDDING_BATCH_DEADLINE", "10"))
+# Retries within the deadline, and the first backoff delay (doubled per attempt, with jitter)
+UPSTREAM_MAX_RETRIES = int(os.getenv("UPSTREAM_MAX_RETRIES", "2"))
+UPSTREAM_BACKOFF = float(os.getenv("UPSTREAM_BACKOFF", "0.2"))
+# Send a second embedding request if the first has not answered after this many seconds (0 disables)
+EMBEDDING_HEDGE_DELAY = float(os.getenv("EMBEDDING_HEDGE_DELAY", "0.5"))
+# Circuit breaker: consecutive failures that open it, and seconds before a trial call
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+# Connections opened to the API by warm_up before the first request (0 disables)
+UPSTREAM_WARM_CONNECTIONS = int(os.getenv("UPSTREAM_WARM_CONNECTIONS", "2"))
+# Do not start an attempt with less time than this left
+MIN_ATTEMPT_SECONDS = 0.05
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    openai.InternalServerError
+)
+
+
+class UpstreamError(Exception):
+    """An upstream call failed within its deadline or was rejected by the breaker"""
+
+
+class CircuitOpenError(UpstreamError):
+    pass
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker (closed -> open -> half-open -> closed)"""
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_seconds: float = BREAKER_RESET_SECONDS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._trial = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """True if a call may go ahead; in half-open state only one trial at a time"""
+        with self._lock:
+            if self.state == "open" and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = "half_open"
+            if self.state == "closed" or (self.state == "half_open" and not self._trial):
+                self._trial = self.state == "half_open"
+                return True
+            self.rejected += 1
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != "closed":
+                print(f"Circuit breaker {self.name} closed")
+            self.state = "closed"
+            self.failures = 0
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.state == "half_open" or self.failures >= self.failure_threshold:
+                if self.state != "open":
+                    print(f"Circuit breaker {self.name} opened after {self.failures} failures")
+                self.state = "open"
+                self.opened_at = time.monotonic()
+
+    def release(self):
+        """End a call that neither succeeded nor failed upstream (e.g. a bad request)"""
+        with self._lock:
+            self._trial = False
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {"state": self.state, "consecutive_failures": self.failures, "rejected": self.rejected}
+
+
+BREAKERS = {
+    "embedding": CircuitBreaker("embedding"),
+    "completion": CircuitBreaker("completion")
+}
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _http2_enabled() -> bool:
+    if UPSTREAM_HTTP2 == "auto":
+        return importlib.util.find_spec("h2") is not None
+    return UPSTREAM_HTTP2 in ("1", "true", "yes")
+
+
+def _client_options() -> Dict:
+    # The client library's own httpx Limits type
+    limits = type(openai.DEFAULT_CONNECTION_LIMITS)(
+        max_connections=UPSTREAM_MAX_CONNECTIONS,
+        max_keepalive_connections=UPSTREAM_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=UPSTREAM_KEEPALIVE_EXPIRY
+    )
+    return {
+        "limits": limits,
+        "http2": _http2_enabled(),
+        "timeout": openai.Timeout(UPSTREAM_READ_TIMEOUT, connect=UPSTREAM_CONNECT_TIMEOUT)
+    }
+
+
+def get_openai_client() -> openai.OpenAI:
+    """Process-wide sync client on the shared connection pool"""
+    with _clients_lock:
+        if "sync" not in _clients:
+            _clients["sync"] = openai.OpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=0,
+                http_client=openai.DefaultHttpxClient(**_client_options())
+            )
+        return _clients["sync"]
+
+
+def get_async_openai_client() -> openai.AsyncOpenAI:
+    """Process-wide async client on the shared connection pool"""
+    with _clients_lock:
+        if "async" not in _clients:
+            _clients["async"] = openai.AsyncOpenAI(
+                api_key=os.getenv("OPENAI_API_KEY"),
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(**_client_options())
+            )
+        return _clients["async"]
+
+
+def _count(name: str, result: str):
+    if metrics.METRICS_ENABLED:
+        metrics.UPSTREAM_CALLS.inc(1, name, result)
+
+
+def _backoff(attempt: int) -> float:
+    return UPSTREAM_BACKOFF * (2 ** attempt) * (0.5 + random.random())
+
+
+def _timeout(remaining: float) -> openai.Timeout:
+    return openai.Timeout(min(remaining, UPSTREAM_READ_TIMEOUT), connect=min(remaining, UPSTREAM_CONNECT_TIMEOUT))
+
+
+def _admit(name: str) -> CircuitBreaker:
+    breaker = BREAKERS[name]
+    if not breaker.allow():
+        _count(name, "rejected")
+        raise CircuitOpenError(f"{name} circuit breaker is open")
+    return breaker
+
+
+def call(name: str, request: Callable[..., Any], deadline: float) -> Any:
+    """Run request(timeout=...) with retries within deadline seconds, guarded by the named breaker"""
+    breaker = _admit(name)
+    end = time.monotonic() + deadline
+    error = None
+    for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+        try:
+            result = request(timeout=_timeout(end - time.monotonic()))
+        except RETRYABLE_ERRORS as e:
+            error = e
+            delay = _backoff(attempt)
+            if attempt == UPSTREAM_MAX_RETRIES or time.monotonic() + delay > end - MIN_ATTEMPT_SECONDS:
+                break
+            _count(name, "retry")
+            time.sleep(delay)
+        except BaseException:
+            # Not an upstream failure (bad request, interrupted caller); do not count it
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+            _count(name, "ok")
+            return result
+    breaker.record_failure()
+    _count(name, "error")
+    raise UpstreamError(f"{name} failed: {error}") from error
+
+
+async def _hedged(name: str, request: Callable[..., Awaitable[Any]], remaining: float,
+                  hedge_delay: float) -> Any:
+    """Await request, starting a duplicate if it is slower than hedge_delay; the first success wins"""
+    first = asyncio.ensure_future(request(timeout=_timeout(remaining)))
+    if hedge_delay <= 0 or hedge_delay >= remaining:
+        return await first
+    tasks = {first}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+        if not done:
+            _count(name, "hedged")
+            tasks.add(asyncio.ensure_future(request(timeout=_timeout(remaining - hedge_delay))))
+        error = None
+        while tasks:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+async def acall(name: str, request: Callable[..., Awaitable[Any]], deadline: float,
+                hedge_delay: float = 0.0) -> Any:
+    """Async call(); with hedge_delay > 0 slow attempts are hedged with a second request"""
+    breaker = _admit(name)
+    loop = asyncio.get_running_loop()
+    end = loop.time() + deadline
+    error = None
+    for attempt in range(UPSTREAM_MAX_RETRIES + 1):
+        remaining = end - loop.time()
+        try:
+            result = await asyncio.wait_for(_hedged(name, request, remaining, hedge_delay), remaining)
+        except (asyncio.TimeoutError,) + RETRYABLE_ERRORS as e:
+            error = e
+            delay = _backoff(attempt)
+            if attempt == UPSTREAM_MAX_RETRIES or loop.time() + delay > end - MIN_ATTEMPT_SECONDS:
+                break
+            _count(name, "retry")
+            await asyncio.sleep(delay)
+        except BaseException:
+            # Not an upstream failure (bad request, cancelled caller); do not count it
+            breaker.release()
+            raise
+        else:
+            breaker.record_success()
+            _count(name, "ok")
+            return result
+    breaker.record_failure()
+    _count(name, "error")
+    raise UpstreamError(f"{name} failed: {error or 'deadline exceeded'}") from error
+
+
+async def awarm_up(connections: int = UPSTREAM_WARM_CONNECTIONS) -> int:
+    """Open pooled connections (DNS, TCP and TLS) to the API; returns how many requests succeeded.
+
+    Sends cheap model-list requests on the async client. Failures are only
+    logged and do not count against the breakers.
+    """
+    client = get_async_openai_client()
+
+    async def ping() -> bool:
+        try:
+            await client.models.list(timeout=_timeout(UPSTREAM_CONNECT_TIMEOUT))
+            return True
+        except Exception as e:
+            print(f"Upstream warm-up request failed: {e}")
+            return False
+
+    results = await asyncio.gather(*(ping() for _ in range(connections)))
+    return sum(results)
+
+
+def breaker_stats() -> Dict:
+    return {name: breaker.stats() for name, breaker in BREAKERS.items()}
@@ -0,0 +1,47 @@
+# backend/app/workers.py
+"""Settings shared by every uvicorn worker process.
+
+Set WEB_CONCURRENCY to the number of workers; uvicorn reads the same
+variable. With more than one worker the defaults switch to state that
+processes can share:
+- the NumPy index, which each worker memory-maps read-only instead of
+  opening its own Chroma client;
+- SQLite files for conversations and the answer cache.
+
+Each worker polls the content for a new generation, so a reload in one
+worker reaches all of them.
+"""
+import os
+import contextlib
+
+try:
+    import fcntl
+except ImportError:  # Windows: no cross-process locking, run a single worker
+    fcntl = None
+
+# Number of uvicorn worker processes serving the API
+WORKER_COUNT = max(1, int(os.getenv("WEB_CONCURRENCY", "1")))
+MULTI_WORKER = WORKER_COUNT > 1
+# Seconds between checks for newly processed content (0 disables reloading)
+CONTENT_RELOAD_INTERVAL = float(os.getenv("CONTENT_RELOAD_INTERVAL", "5"))
+# Processed content every worker serves and /admin/process-content writes: a store, or its legacy
+# JSON file (same path + ".json") until the first store generation exists
+CONTENT_PATH = os.getenv("CONTENT_PATH", "./content/processed")
+PROCESSED_CONTENT_PATH = os.path.join(CONTENT_PATH, "ctf_primer_processed")
+# Raw CTF primer checkout ingested into PROCESSED_CONTENT_PATH (content/raw next to content/processed)
+CTF_PRIMER_PATH = os.path.join(os.path.dirname(os.path.normpath(CONTENT_PATH)), "raw", "ctf-primer")
+
+
+@contextlib.contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on path, shared by every process on this host"""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "a") as handle:
+        fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_UN)
@@ -1,21 +1,76 @@
 # backend/content_processor.py
 
 import os
+import sys
 import json
 import re
-from typing import List, Dict, Optional
+import time
+import random
+import itertools
+import functools
+import multiprocessing
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, as_completed
+from typing import List, Dict, Optional, Callable, Iterator, Tuple
 from pathlib import Path
-import openai
+import numpy as np
 from dotenv import load_dotenv
 
+from app.sections import assign_section_ids, has_embedding, source_path
+from app.chunking import chunk_document, chunking_settings
+from app.processed_store import (
+    ProcessedStore, ProcessedStoreWriter, save_processed_store, store_embedding, store_exists
+)
+from app.upstream import RETRYABLE_ERRORS
+from app.embeddings import EmbeddingProvider, create_provider
+from app import metrics
+
 load_dotenv()
 
+# Embedding batches are bounded by an approximate token budget and an input count
+EMBEDDING_BATCH_TOKENS = int(os.getenv("EMBEDDING_BATCH_TOKENS", "20000"))
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+# Number of embedding batches in flight at once
+EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", "4"))
+# Retries (with exponential backoff and jitter) for rate limits and transient errors
+EMBEDDING_MAX_RETRIES = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+# Precision of embeddings in the processed store (float32 or float16)
+PROCESSED_EMBEDDING_DTYPE = os.getenv("PROCESSED_EMBEDDING_DTYPE", "float32")
+# Processes parsing files in parallel; smaller runs are parsed in this process
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+PARSE_POOL_MIN_FILES = int(os.getenv("PARSE_POOL_MIN_FILES", "50"))
+# Files parsed ahead of the embedding stage, per parse worker
+PARSE_PREFETCH = 4
+# Sections waiting for embeddings before they are embedded and written out; bounds ingestion memory
+INGEST_WINDOW_SECTIONS = int(os.getenv("INGEST_WINDOW_SECTIONS", "1024"))
+
+TOPIC_KEYWORDS = {
+    "web_security": ["sql injection", "xss", "csrf", "web", "http", "cookie"],
+    "cryptography": ["encryption", "cipher", "crypto", "hash", "rsa", "aes"],
+    "reverse_engineering": ["assembly", "disassembly", "binary", "executable"],
+    "forensics": ["steganography", "file analysis", "metadata", "recovery"],
+    "pwn": ["buffer overflow", "stack", "heap", "memory", "exploit"],
+    "networking": ["tcp", "udp", "packet", "wireshark", "network"]
+}
+# One pass over the text finds every topic keyword
+TOPIC_RE = re.compile("|".join(
+    re.escape(keyword) for keyword in sorted({k for keywords in TOPIC_KEYWORDS.values() for k in keywords}, key=len, reverse=True)
+))
+KEYWORD_TOPICS = {}
+for _topic, _keywords in TOPIC_KEYWORDS.items():
+    for _keyword in _keywords:
+        KEYWORD_TOPICS.setdefault(_keyword, []).append(_topic)
+
+
 class ContentProcessor:
-    def __init__(self):
-        self.openai_client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+    @functools.cached_property
+    def embedder(self) -> EmbeddingProvider:
+        # EMBEDDING_PROVIDER; the OpenAI client is only created on the first request, so parse
+        # workers never need an API key. Providers do not retry on their own; _embed_with_retry does.
+        return create_provider()
         
-    def process_markdown_file(self, file_path: str) -> Dict:
-        """Process a single markdown file"""
+    def process_markdown_file(self, file_path: str, root: Optional[str] = None) -> Dict:
+        """Process a single markdown file (root is the primer directory it was found in)"""
         with open(file_path, 'r', encoding='utf-8') as f:
             content = f.read()
         
@@ -29,47 +84,27 @@ class ContentProcessor:
         # Extract metadata
         metadata = self.extract_metadata(content, file_path)
         
-        return {
+        content_data = {
             "title": title,
             "file_path": file_path,
+            "source_path": source_path(file_path, root),
             "sections": sections,
-            "metadata": metadata,
-            "full_content": content
+            "metadata": metadata
         }
+        self.assign_section_ids(content_data)
+        return content_data
+    
+    @staticmethod
+    def assign_section_ids(content_data: Dict):
+        """Give every section a content hash and an id that is stable across runs"""
+        assign_section_ids(content_data)
 
     def split_into_sections(self, content: str) -> List[Dict]:
         """
-        Split AsciiDoc content into sections using headings (==, ===, etc.).
+        Split AsciiDoc content into token-bounded chunks (see app.chunking).
         """
-        import re
-        sections = []
-        current_section = ""
-        current_heading = None
-        lines = content.split('\n')
-        for line in lines:
-            heading_match = re.match(r'^\s*(==+)\s+(.*)', line)
-            if heading_match:
-                # Save previous section if it exists
-                print(f"Found heading: {heading_match.group(2)}")
-                if current_section and current_heading:
-                    if current_section.strip():  # Only add non-empty sections
-                        sections.append({
-                            "heading": current_heading,
-                            "content": current_section.strip(),
-                            "word_count": len(current_section.split())
-                        })
-                current_heading = heading_match.group(2).strip()
-                current_section = ""
-            else:
-                current_section += line + '\n'
-        # Add the last section
-        if current_section and current_heading and current_section.strip():
-            sections.append({
-                "heading": current_heading,
-                "content": current_section.strip(),
-                "word_count": len(current_section.split())
-            })
-        return sections
+        return chunk_document(content)
+    
     def extract_metadata(self, content: str, file_path: str) -> Dict:
         """Extract metadata from content"""
         metadata = {
@@ -80,22 +115,13 @@ class ContentProcessor:
         }
         
         # Extract topics based on content
-        topics_found = []
-        topic_keywords = {
-            "web_security": ["sql injection", "xss", "csrf", "web", "http", "cookie"],
-            "cryptography": ["encryption", "cipher", "crypto", "hash", "rsa", "aes"],
-            "reverse_engineering": ["assembly", "disassembly", "binary", "executable"],
-            "forensics": ["steganography", "file analysis", "metadata", "recovery"],
-            "pwn": ["buffer overflow", "stack", "heap", "memory", "exploit"],
-            "networking": ["tcp", "udp", "packet", "wireshark", "network"]
-        }
+        topics_found = set()
+        for match in TOPIC_RE.finditer(content.lower()):
+            topics_found.update(KEYWORD_TOPICS[match.group(0)])
+            if len(topics_found) == len(TOPIC_KEYWORDS):
+                break
         
-        content_lower = content.lower()
-        for topic, keywords in topic_keywords.items():
-            if any(keyword in content_lower for keyword in keywords):
-                topics_found.append(topic)
-        
-        metadata["topics"] = topics_found
+        metadata["topics"] = [topic for topic in TOPIC_KEYWORDS if topic in topics_found]
         
         # Extract examples (look for code blocks or specific patterns)
         examples = re.findall(r'```[\s\S]*?```', content)
@@ -104,53 +130,446 @@ class ContentProcessor:
         return metadata
     
     def create_embedding(self, text: str) -> List[float]:
-        """Create embedding for text using OpenAI"""
+        """Create embedding for text with the configured provider"""
         try:
-            response = self.openai_client.embeddings.create(
-                model="text-embedding-ada-002",
-                input=text[:8000]  # Limit to avoid token limit
-            )
-            return response.data[0].embedding
+            return self._embed_with_retry([text])[0]
         except Exception as e:
             print(f"Error creating embedding: {e}")
             return []
     
-    def process_ctf_primer_directory(self, primer_path: str) -> List[Dict]:
-        """Process all markdown files in CTF primer directory"""
-        processed_content = []
+    def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        """Embed a list of texts in one request, backing off on rate limits"""
+        for attempt in range(EMBEDDING_MAX_RETRIES + 1):
+            try:
+                start = time.perf_counter()
+                embeddings, usage = self.embedder.embed(texts)
+                if metrics.METRICS_ENABLED:
+                    metrics.INGEST_BATCH_SECONDS.observe(time.perf_counter() - start)
+                    metrics.LLM_TOKENS.inc(usage["prompt"], "ingest_embedding", "prompt")
+                return embeddings
+            except RETRYABLE_ERRORS as e:
+                if attempt == EMBEDDING_MAX_RETRIES:
+                    raise
+                delay = min(60.0, 2 ** attempt) * (0.5 + random.random())
+                print(f"Embedding request failed ({type(e).__name__}), retrying in {delay:.1f}s")
+                time.sleep(delay)
+    
+    @staticmethod
+    def estimate_tokens(text: str) -> int:
+        """Rough token estimate (about four characters per token)"""
+        return len(text[:8000]) // 4 + 1
+    
+    def make_embedding_batches(self, texts: List[str]) -> List[List[int]]:
+        """Pack text indexes into batches bounded by token budget and batch size"""
+        batches = []
+        current = []
+        current_tokens = 0
+        for i, text in enumerate(texts):
+            tokens = self.estimate_tokens(text)
+            if current and (current_tokens + tokens > EMBEDDING_BATCH_TOKENS or len(current) >= EMBEDDING_BATCH_SIZE):
+                batches.append(current)
+                current = []
+                current_tokens = 0
+            current.append(i)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+    
+    def create_embeddings(self, texts: List[str], on_batch: Optional[Callable[[int, int], None]] = None) -> List[List[float]]:
+        """Embed many texts using concurrent, token-bounded batches.
+        
+        A batch that fails is retried one text at a time so a single bad input
+        only leaves its own embedding empty. on_batch(done, failed) is called
+        after every finished batch.
+        """
+        embeddings = [[] for _ in texts]
+        if not texts:
+            return embeddings
+        
+        batches = self.make_embedding_batches(texts)
+        failed = 0
+        done = 0
+        start = time.perf_counter()
+        
+        with ThreadPoolExecutor(max_workers=EMBEDDING_WORKERS) as executor:
+            futures = {
+                executor.submit(self._embed_with_retry, [texts[i] for i in batch]): batch
+                for batch in batches
+            }
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    for i, embedding in zip(batch, future.result()):
+                        embeddings[i] = embedding
+                except Exception as e:
+                    print(f"Embedding batch of {len(batch)} failed ({e}), retrying individually")
+                    for i in batch:
+                        try:
+                            embeddings[i] = self._embed_with_retry([texts[i]])[0]
+                        except Exception as item_error:
+                            failed += 1
+                            print(f"Error creating embedding for text {i}: {item_error}")
+                done += len(batch)
+                if on_batch:
+                    on_batch(done, failed)
         
-        # Walk through directory structure
+        elapsed = time.perf_counter() - start
+        rate = len(texts) / elapsed if elapsed > 0 else float("inf")
+        if metrics.METRICS_ENABLED:
+            metrics.INGEST_SECTIONS.inc(len(texts) - failed, "embedded")
+            metrics.INGEST_SECTIONS.inc(failed, "failed")
+            metrics.INGEST_SECTIONS_PER_SECOND.set(round(rate, 2) if elapsed > 0 else 0.0)
+        print(f"Embedded {len(texts) - failed}/{len(texts)} texts in {len(batches)} batches "
+              f"({elapsed:.1f}s, {rate:.1f} sections/sec)")
+        if failed:
+            print(f"WARNING: {failed} sections have no embedding and will not be searchable")
+        return embeddings
+    
+    def iter_content_files(self, primer_path: str):
+        """Yield every .adoc file below primer_path"""
         for root, dirs, files in os.walk(primer_path):
             for file in files:
                 if file.endswith('.adoc'):
-                    file_path = os.path.join(root, file)
-                    print(f"Processing: {file_path}")
-                    
-                    try:
-                        content_data = self.process_markdown_file(file_path)
-                        
-                        # Create embeddings for each section
-                        for section in content_data["sections"]:
-                            embedding = self.create_embedding(section["content"])
-                            section["embedding"] = embedding
-                        
-                        processed_content.append(content_data)
-                        
-                    except Exception as e:
-                        print(f"Error processing {file_path}: {e}")
-                        continue
-        
-        return processed_content
+                    yield os.path.join(root, file)
     
-    def save_processed_content(self, processed_content: List[Dict], output_path: str):
-        """Save processed content to JSON file"""
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    def parse_files(self, file_paths: List[str],
+                    root: Optional[str] = None) -> Iterator[Tuple[str, Optional[Dict], Optional[str], float]]:
+        """Parse files, yielding (file_path, content_data, error, seconds) in order.
+        
+        Large runs fan out over PARSE_WORKERS processes. Only a few files per
+        worker are parsed ahead of the consumer, so parsed content never piles
+        up when embedding is the bottleneck.
+        """
+        if PARSE_WORKERS <= 1 or len(file_paths) < PARSE_POOL_MIN_FILES:
+            for file_path in file_paths:
+                yield (file_path,) + parse_file(file_path, root)
+            return
+        
+        # Forking a process that runs server threads is unsafe; start clean workers instead
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        with ProcessPoolExecutor(max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context(start_method)) as executor:
+            remaining = iter(file_paths)
+            pending = deque(
+                (file_path, executor.submit(parse_file, file_path, root))
+                for file_path in itertools.islice(remaining, PARSE_WORKERS * PARSE_PREFETCH)
+            )
+            while pending:
+                file_path, future = pending.popleft()
+                next_path = next(remaining, None)
+                if next_path is not None:
+                    pending.append((next_path, executor.submit(parse_file, next_path, root)))
+                yield (file_path,) + future.result()
+    
+    def iter_processed_files(self, file_paths: List[str], previous: Optional["PreviousContent"] = None,
+                             stats: Optional[Dict] = None, errors: Optional[List[Dict]] = None,
+                             report: Optional[Callable[[Dict], None]] = None,
+                             root: Optional[str] = None) -> Iterator[Dict]:
+        """Parse and embed files, yielding each file's content_data with embeddings.
+        
+        Sections whose content hash is in previous reuse its embedding. The
+        rest are embedded in windows of INGEST_WINDOW_SECTIONS, and a window's
+        files are yielded (and can be written and dropped) before the next
+        window is parsed, so memory does not grow with the corpus.
+        """
+        stats = stats if stats is not None else {}
+        errors = errors if errors is not None else []
+        report = report or (lambda update: None)
+        progress = {"files_done": 0, "sections_to_embed": 0, "sections_embedded": 0, "sections_failed": 0}
+        window = []
+        to_embed = []
+        
+        def embed_window():
+            embedded, failed = progress["sections_embedded"], progress["sections_failed"]
+            self.embed_sections(to_embed, on_batch=lambda done, batch_failed: report({
+                "sections_embedded": embedded + done - batch_failed,
+                "sections_failed": failed + batch_failed
+            }))
+            missing = sum(1 for section in to_embed if not has_embedding(section))
+            progress["sections_embedded"] += len(to_embed) - missing
+            progress["sections_failed"] += missing
+            stats["sections_embedded"] = stats.get("sections_embedded", 0) + len(to_embed)
+            to_embed.clear()
+        
+        for file_path, content_data, error, seconds in self.parse_files(file_paths, root):
+            progress["files_done"] += 1
+            if error is not None:
+                print(f"Error processing {file_path}: {error}")
+                errors.append({"file_path": file_path, "error": error})
+                report({"files_done": progress["files_done"], "errors": len(errors)})
+                continue
+            
+            if metrics.METRICS_ENABLED:
+                metrics.INGEST_FILE_SECONDS.observe(seconds)
+            if seconds > stats.get("slowest_file_seconds", 0.0):
+                stats["slowest_file"], stats["slowest_file_seconds"] = file_path, round(seconds, 3)
+            stats["files_parsed"] = stats.get("files_parsed", 0) + 1
+            
+            for section in content_data["sections"]:
+                # Carry embeddings forward for sections whose content did not change
+                embedding = previous.embedding(section["content_hash"]) if previous else None
+                if embedding is not None:
+                    section["embedding"] = embedding
+                    stats["sections_reused"] = stats.get("sections_reused", 0) + 1
+                else:
+                    to_embed.append(section)
+            window.append(content_data)
+            progress["sections_to_embed"] += len(content_data["sections"]) - sum(
+                1 for section in content_data["sections"] if has_embedding(section)
+            )
+            report({"files_done": progress["files_done"], "sections_to_embed": progress["sections_to_embed"]})
+            
+            if len(to_embed) >= INGEST_WINDOW_SECTIONS:
+                embed_window()
+                yield from window
+                window = []
+        
+        embed_window()
+        yield from window
+    
+    def process_ctf_primer_directory(self, primer_path: str) -> List[Dict]:
+        """Process all markdown files in CTF primer directory"""
+        return list(self.iter_processed_files(list(self.iter_content_files(primer_path)), root=primer_path))
+    
+    def process_ctf_primer_directory_incremental(self, primer_path: str, output_path: str, full: bool = False,
+                                                 progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Re-process primer_path, embedding only sections that changed since the last run.
+        
+        Sections whose content hash was embedded by the run that wrote
+        output_path reuse that embedding; with full=True everything is
+        re-embedded. Sections that disappeared are returned as tombstones.
+        Returns all processed content in memory; ingest_directory streams it
+        into a store instead.
+        
+        progress, if given, receives dicts of counters as the run advances.
+        """
+        processed_content = []
+        result = self._ingest(primer_path, output_path, full, progress, processed_content.append)
+        result["processed_content"] = processed_content
+        return result
+    
+    def ingest_directory(self, primer_path: str, output_path: str, full: bool = False,
+                         progress: Optional[Callable[[Dict], None]] = None) -> Dict:
+        """Process primer_path incrementally and save it, with its manifest, to output_path.
+        
+        For a processed store every file is written to the new generation as
+        soon as its window is embedded, so memory stays bounded for any
+        corpus size. Legacy *.json output is still collected and dumped at
+        the end.
+        """
+        if output_path.endswith(".json"):
+            result = self.process_ctf_primer_directory_incremental(primer_path, output_path, full, progress)
+            self.save_processed_content(result.pop("processed_content"), output_path)
+        else:
+            with ProcessedStoreWriter(output_path, dtype=PROCESSED_EMBEDDING_DTYPE,
+                                      embedding=self.embedder.info()) as writer:
+                result = self._ingest(primer_path, output_path, full, progress, writer.add_file)
+            print(f"Wrote {writer.meta['sections']} sections ({writer.meta['rows']} embeddings, {writer.meta['dtype']})")
+            print(f"Processed content saved to: {output_path}")
+        self.save_manifest(result["manifest"], output_path)
+        return result
+    
+    def _ingest(self, primer_path: str, output_path: str, full: bool,
+                progress: Optional[Callable[[Dict], None]], sink: Callable[[Dict], None]) -> Dict:
+        """Run the parse -> embed pipeline over primer_path, handing every processed file to sink"""
+        report = progress or (lambda update: None)
+        manifest = {"files": {}} if full else self.load_manifest(output_path)
+        mismatch = self.embedder.mismatch(manifest.get("embedding") or store_embedding(output_path))
+        if manifest.get("chunking") != chunking_settings():
+            # Every file is chunked differently now; unchanged chunks still keep their embeddings
+            manifest = {"files": {}}
+        # Read even for a full run: its section ids are still needed for the tombstones
+        previous = self.load_previous_content(output_path)
+        reuse = None if full else previous
+        if reuse is not None and mismatch:
+            # Vectors from another provider cannot be mixed with new ones
+            print(f"Re-embedding every section: {mismatch}")
+            reuse = None
+        
+        file_stats = {}
+        file_sections = {}
+        current_ids = set()
+        errors = []
+        stats = {"files_unchanged": 0, "files_parsed": 0, "sections_reused": 0, "sections_embedded": 0,
+                 "slowest_file": None, "slowest_file_seconds": 0.0}
+        
+        file_paths = list(self.iter_content_files(primer_path))
+        for file_path in file_paths:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            # Keyed like the section ids, so another spelling of primer_path still matches
+            path = source_path(file_path, primer_path)
+            file_stats[path] = {"mtime": stat.st_mtime, "size": stat.st_size}
+            known = manifest["files"].get(path)
+            if known and known["mtime"] == stat.st_mtime and known["size"] == stat.st_size:
+                stats["files_unchanged"] += 1
+        
+        report({"stage": "processing", "files_total": len(file_paths), "files_done": 0,
+                "sections_to_embed": 0, "sections_embedded": 0})
+        for content_data in self.iter_processed_files(file_paths, reuse, stats, errors, report, primer_path):
+            sink(content_data)
+            file_sections[content_data["source_path"]] = [section["content_hash"] for section in content_data["sections"]]
+            current_ids.update(section["id"] for section in content_data["sections"])
+        
+        tombstones = [
+            {"id": section["id"], "file_path": file_path, "content_hash": section["content_hash"]}
+            for file_path, section in (previous.iter_sections() if previous else ())
+            if section["id"] not in current_ids
+        ]
+        stats["sections_removed"] = len(tombstones)
         
-        with open(output_path, 'w', encoding='utf-8') as f:
-            json.dump(processed_content, f, indent=2, ensure_ascii=False)
+        print(f"Incremental run: {stats}")
+        return {
+            "files": len(file_sections),
+            "tombstones": tombstones,
+            "manifest": self.build_manifest(file_sections, file_stats, tombstones),
+            "stats": stats,
+            "errors": errors
+        }
+    
+    def embed_sections(self, sections: List[Dict], on_batch: Optional[Callable[[int, int], None]] = None):
+        """Attach embeddings to sections using batched, concurrent requests"""
+        embeddings = self.create_embeddings([section["content"] for section in sections], on_batch=on_batch)
+        for section, embedding in zip(sections, embeddings):
+            # Arrays take a fraction of the memory of lists of Python floats
+            section["embedding"] = np.asarray(embedding, dtype=np.float32) if embedding else embedding
+    
+    @staticmethod
+    def manifest_path(output_path: str) -> str:
+        """Location of the ingestion manifest that belongs to output_path"""
+        return f"{os.path.splitext(output_path)[0]}_manifest.json"
+    
+    def build_manifest(self, file_sections: Dict[str, List[str]], file_stats: Dict, tombstones: List[Dict]) -> Dict:
+        """Describe processed files (mtime, size, section hashes by source path) for the next incremental run"""
+        files = {}
+        for path, section_hashes in file_sections.items():
+            if path not in file_stats:
+                continue
+            files[path] = dict(file_stats[path], sections=section_hashes)
+        return {
+            "version": 1,
+            "generated_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "chunking": chunking_settings(),
+            "embedding": self.embedder.info(),
+            "files": files,
+            "tombstones": tombstones
+        }
+    
+    def load_manifest(self, output_path: str) -> Dict:
+        """Load the manifest written by the previous run, if any"""
+        path = self.manifest_path(output_path)
+        if not os.path.exists(path):
+            return {"files": {}}
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable manifest {path}: {e}")
+            return {"files": {}}
+    
+    def load_previous_content(self, output_path: str) -> Optional["PreviousContent"]:
+        """Embeddings and section ids of the previous run, or None if there is none.
+        
+        Reads the processed store at output_path, or a legacy JSON file
+        (output_path itself or output_path + ".json").
+        """
+        try:
+            return PreviousContent(output_path)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable processed content {output_path}: {e}")
+            return None
+    
+    def save_manifest(self, manifest: Dict, output_path: str):
+        """Save the ingestion manifest next to the processed content"""
+        path = self.manifest_path(output_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+    
+    def save_processed_content(self, processed_content: List[Dict], output_path: str):
+        """Save processed content as a processed store (or legacy JSON for *.json paths)"""
+        if output_path.endswith(".json"):
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with open(output_path, 'w', encoding='utf-8') as f:
+                json.dump(processed_content, f, indent=2, ensure_ascii=False, default=lambda value: value.tolist())
+        else:
+            meta = save_processed_store(processed_content, output_path, dtype=PROCESSED_EMBEDDING_DTYPE,
+                                        embedding=self.embedder.info())
+            print(f"Wrote {meta['sections']} sections ({meta['rows']} embeddings, {meta['dtype']})")
         
         print(f"Processed content saved to: {output_path}")
 
+
+class PreviousContent:
+    """Embeddings and section ids written by the previous run.
+    
+    For a processed store only a content hash -> embedding row map is kept
+    in memory; vectors are read from the memory-mapped matrix on demand and
+    section records are streamed again for tombstones. Legacy JSON output is
+    loaded whole.
+    """
+    
+    def __init__(self, output_path: str):
+        self.store = None
+        self.legacy = None
+        self.rows = {}
+        if store_exists(output_path):
+            self.store = ProcessedStore(output_path)
+            for _, section in self.store.iter_sections():
+                if section["row"] >= 0:
+                    self.rows[section["content_hash"]] = section["row"]
+            return
+        
+        json_path = output_path if output_path.endswith(".json") else f"{output_path}.json"
+        with open(json_path, 'r', encoding='utf-8') as f:
+            self.legacy = json.load(f)
+        for content_data in self.legacy:
+            # Content written before section ids existed
+            ContentProcessor.assign_section_ids(content_data)
+            for section in content_data["sections"]:
+                if has_embedding(section):
+                    self.rows[section["content_hash"]] = section["embedding"]
+    
+    def embedding(self, content_hash: str):
+        """Previous embedding of a section with this content hash, or None"""
+        row = self.rows.get(content_hash)
+        if row is None or self.store is None:
+            return row
+        return self.store.embeddings[row]
+    
+    def iter_sections(self) -> Iterator[Tuple[str, Dict]]:
+        """(file_path, section) for every previous section"""
+        if self.store is not None:
+            for file_record, section in self.store.iter_sections():
+                yield file_record["file_path"], section
+        else:
+            for content_data in self.legacy:
+                for section in content_data["sections"]:
+                    yield content_data["file_path"], section
+
+
+_parser = None
+
+
+def parse_file(file_path: str, root: Optional[str] = None) -> Tuple[Optional[Dict], Optional[str], float]:
+    """Parse one file; returns (content_data, error, seconds).
+    
+    Module level so process-pool workers can run it. Errors are returned as
+    text rather than raised so one bad file does not stop the pipeline.
+    """
+    global _parser
+    if _parser is None:
+        _parser = ContentProcessor()
+    start = time.perf_counter()
+    try:
+        return _parser.process_markdown_file(file_path, root), None, time.perf_counter() - start
+    except Exception as e:
+        return None, str(e), time.perf_counter() - start
+
 # Usage script
 if __name__ == "__main__":
     processor = ContentProcessor()
@@ -159,13 +578,16 @@ if __name__ == "__main__":
     # Replace with your actual CTF primer path
     ctf_primer_path = "./content/raw/ctf-primer"
     
+    output_path = "./content/processed/ctf_primer_processed"
+    
     if os.path.exists(ctf_primer_path):
-        processed_content = processor.process_ctf_primer_directory(ctf_primer_path)
-        processor.save_processed_content(
-            processed_content, 
-            "./content/processed/ctf_primer_processed.json"
+        # Only re-embed what changed since the last run unless --full is given
+        result = processor.ingest_directory(
+            ctf_primer_path,
+            output_path,
+            full="--full" in sys.argv
         )
-        print(f"Processed {len(processed_content)} files")
+        print(f"Processed {result['files']} files")
     else:
         print(f"CTF primer path not found: {ctf_primer_path}")
         print("Please clone the CTF primer repository first:")
@@ -0,0 +1,182 @@
+# benchmarks/fake_openai.py
+"""Local stand-in for the OpenAI embeddings and chat-completions APIs.
+
+Embeddings are deterministic: each word of the input is hashed into a few
+dimensions and the result is normalized. Identical texts therefore get
+identical vectors, and texts that share words are close, so retrieval
+behaves sensibly. Latency is simulated with asyncio.sleep, so one process
+can serve a lot of concurrent load.
+
+    FAKE_OPENAI_EMBEDDING_LATENCY_MS=50 FAKE_OPENAI_CHAT_LATENCY_MS=300 \\
+        uvicorn fake_openai:app --port 9999
+
+Point the app at it with OPENAI_BASE_URL=http://127.0.0.1:9999/v1.
+
+Partial outages can be simulated with FAKE_OPENAI_ERROR_RATE (fraction of
+requests answered with a 500) and FAKE_OPENAI_SLOW_RATE /
+FAKE_OPENAI_SLOW_MS (fraction of requests delayed by that much more), or
+changed at runtime with POST /faults.
+"""
+import os
+import json
+import time
+import base64
+import asyncio
+import random
+import hashlib
+from typing import Optional
+
+import numpy as np
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# Simulated latency per embeddings request, plus a per-input increment
+EMBEDDING_LATENCY_MS = float(os.getenv("FAKE_OPENAI_EMBEDDING_LATENCY_MS", "50"))
+EMBEDDING_LATENCY_PER_INPUT_MS = float(os.getenv("FAKE_OPENAI_EMBEDDING_LATENCY_PER_INPUT_MS", "0.5"))
+# Simulated latency of a whole chat completion (spread over the chunks when streaming)
+CHAT_LATENCY_MS = float(os.getenv("FAKE_OPENAI_CHAT_LATENCY_MS", "300"))
+# Words in every generated answer
+CHAT_ANSWER_WORDS = int(os.getenv("FAKE_OPENAI_CHAT_ANSWER_WORDS", "120"))
+EMBEDDING_DIM = int(os.getenv("FAKE_OPENAI_EMBEDDING_DIM", "1536"))
+# Dimensions each word is hashed into
+HASHES_PER_WORD = 4
+# Injected faults: share of failing requests, share of slow requests and their extra delay
+faults = {
+    "error_rate": float(os.getenv("FAKE_OPENAI_ERROR_RATE", "0")),
+    "slow_rate": float(os.getenv("FAKE_OPENAI_SLOW_RATE", "0")),
+    "slow_ms": float(os.getenv("FAKE_OPENAI_SLOW_MS", "5000"))
+}
+
+app = FastAPI(title="Fake OpenAI API")
+
+calls = {"embeddings": 0, "embedding_inputs": 0, "chat_completions": 0, "chat_streams": 0, "models": 0, "faults": 0}
+
+
+def _tokens(text: str) -> int:
+    return len(text) // 4 + 1
+
+
+def embed(text: str) -> np.ndarray:
+    """Deterministic bag-of-words vector for text"""
+    vector = np.zeros(EMBEDDING_DIM, dtype=np.float32)
+    for word in text.lower().split():
+        digest = hashlib.blake2b(word.encode("utf-8"), digest_size=4 * HASHES_PER_WORD).digest()
+        for i in range(HASHES_PER_WORD):
+            value = int.from_bytes(digest[4 * i:4 * i + 4], "little")
+            vector[value % EMBEDDING_DIM] += 1.0 if value & (1 << 31) else -1.0
+    norm = np.linalg.norm(vector)
+    if not norm:
+        vector[0] = norm = 1.0
+    return vector / norm
+
+
+async def _inject_fault() -> Optional[JSONResponse]:
+    """Delay and/or fail the current request according to faults"""
+    if random.random() < faults["slow_rate"]:
+        calls["faults"] += 1
+        await asyncio.sleep(faults["slow_ms"] / 1000)
+    if random.random() < faults["error_rate"]:
+        calls["faults"] += 1
+        return JSONResponse({"error": {"message": "Injected fault", "type": "server_error"}}, status_code=500)
+    return None
+
+
+def _answer(question: str) -> str:
+    words = (f"Here is a beginner friendly explanation of {question}".split() +
+             ["practice", "with", "small", "challenges", "and", "read", "the", "tool", "documentation"] * CHAT_ANSWER_WORDS)
+    return " ".join(words[:CHAT_ANSWER_WORDS])
+
+
+@app.post("/v1/embeddings")
+async def embeddings(request: Request):
+    body = await request.json()
+    fault = await _inject_fault()
+    if fault:
+        return fault
+    inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+    calls["embeddings"] += 1
+    calls["embedding_inputs"] += len(inputs)
+    await asyncio.sleep((EMBEDDING_LATENCY_MS + EMBEDDING_LATENCY_PER_INPUT_MS * len(inputs)) / 1000)
+    tokens = sum(_tokens(text) for text in inputs)
+    # The official client asks for base64 (little-endian float32) unless told otherwise
+    if body.get("encoding_format") == "base64":
+        encode = lambda vector: base64.b64encode(vector.astype("<f4").tobytes()).decode("ascii")
+    else:
+        encode = lambda vector: vector.tolist()
+    return {
+        "object": "list",
+        "model": body.get("model", "text-embedding-ada-002"),
+        "data": [{"object": "embedding", "index": i, "embedding": encode(embed(text))} for i, text in enumerate(inputs)],
+        "usage": {"prompt_tokens": tokens, "total_tokens": tokens}
+    }
+
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    body = await request.json()
+    fault = await _inject_fault()
+    if fault:
+        return fault
+    question = body["messages"][-1]["content"]
+    answer = _answer(question)
+    prompt_tokens = sum(_tokens(message["content"]) for message in body["messages"])
+    usage = {"prompt_tokens": prompt_tokens, "completion_tokens": CHAT_ANSWER_WORDS,
+             "total_tokens": prompt_tokens + CHAT_ANSWER_WORDS}
+    created = int(time.time())
+
+    if body.get("stream"):
+        calls["chat_streams"] += 1
+        include_usage = (body.get("stream_options") or {}).get("include_usage")
+        words = answer.split(" ")
+
+        async def stream():
+            for i, word in enumerate(words):
+                await asyncio.sleep(CHAT_LATENCY_MS / 1000 / len(words))
+                chunk = {
+                    "id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created, "model": body["model"],
+                    "choices": [{"index": 0, "delta": {"content": word if i == 0 else " " + word}, "finish_reason": None}]
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+            if include_usage:
+                chunk = {"id": "chatcmpl-fake", "object": "chat.completion.chunk", "created": created,
+                         "model": body["model"], "choices": [], "usage": usage}
+                yield f"data: {json.dumps(chunk)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(stream(), media_type="text/event-stream")
+
+    calls["chat_completions"] += 1
+    await asyncio.sleep(CHAT_LATENCY_MS / 1000)
+    return {
+        "id": "chatcmpl-fake",
+        "object": "chat.completion",
+        "created": created,
+        "model": body["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": answer}, "finish_reason": "stop"}],
+        "usage": usage
+    }
+
+
+@app.get("/v1/models")
+async def models():
+    """Used by the app's upstream warm-up to open connections"""
+    calls["models"] += 1
+    return {"object": "list", "data": [{"id": "gpt-4", "object": "model", "created": 0, "owned_by": "fake"}]}
+
+
+@app.get("/calls")
+async def get_calls():
+    """Request counters, used by the benchmark runner to report API usage"""
+    return calls
+
+
+@app.post("/faults")
+async def set_faults(request: Request):
+    """Change the injected faults, e.g. {"error_rate": 0.2}"""
+    faults.update({key: float(value) for key, value in (await request.json()).items() if key in faults})
+    return faults
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok"}
@@ -0,0 +1,70 @@
+# benchmarks/generate_corpus.py
+"""Generate a synthetic CTF-primer style .adoc corpus of configurable size.
+
+The same arguments always produce the same files:
+
+    python generate_corpus.py ./corpus --files 200 --sections 8 --words 150 --seed 1
+"""
+import os
+import sys
+import random
+import argparse
+from typing import Dict
+
+TOPICS = {
+    "web": ["sql injection", "xss", "csrf", "cookie", "http", "session", "burp", "payload", "parameter", "header"],
+    "crypto": ["rsa", "aes", "cipher", "hash", "modulus", "exponent", "xor", "padding", "nonce", "key"],
+    "pwn": ["buffer overflow", "stack", "heap", "rop", "shellcode", "canary", "libc", "gdb", "pwntools", "exploit"],
+    "forensics": ["steganography", "binwalk", "exiftool", "metadata", "pcap", "wireshark", "file analysis", "carving", "strings", "recovery"],
+    "reversing": ["assembly", "disassembly", "ghidra", "binary", "executable", "decompiler", "register", "opcode", "patch", "elf"],
+    "networking": ["tcp", "udp", "packet", "nmap", "port", "dns", "netcat", "handshake", "firewall", "proxy"]
+}
+FILLER = ("the a to of and in is for with this that you on it can by as be an are or from your "
+          "we use when first then try each flag challenge value input output step example").split()
+
+
+def make_section(rng: random.Random, topic: str, words: int) -> str:
+    """One paragraph mixing topic keywords and filler words, sometimes with a listing"""
+    keywords = TOPICS[topic]
+    body = [rng.choice(keywords) if rng.random() < 0.25 else rng.choice(FILLER) for _ in range(words)]
+    text = " ".join(body).capitalize() + "."
+    if rng.random() < 0.3:
+        text += f"\n\n----\n$ {rng.choice(keywords).replace(' ', '_')} --input challenge.bin\n----"
+    return text
+
+
+def generate(output_dir: str, files: int = 200, sections: int = 8, words: int = 150, seed: int = 1) -> Dict:
+    """Write the corpus below output_dir and return its size"""
+    rng = random.Random(seed)
+    topics = sorted(TOPICS)
+    total_words = 0
+    for i in range(files):
+        topic = topics[i % len(topics)]
+        directory = os.path.join(output_dir, topic)
+        os.makedirs(directory, exist_ok=True)
+        lines = [f"= {topic.title()} notes {i}", ""]
+        for j in range(sections):
+            heading_keyword = rng.choice(TOPICS[topic])
+            level = "==" if j % 3 == 0 else "==="
+            lines.append(f"{level} {heading_keyword.title()} part {j}")
+            lines.append("")
+            lines.append(make_section(rng, topic, words))
+            lines.append("")
+            total_words += words
+        with open(os.path.join(directory, f"{topic}_{i:05d}.adoc"), "w", encoding="utf-8") as f:
+            f.write("\n".join(lines))
+    return {"files": files, "sections": files * sections, "words": total_words, "seed": seed}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("output_dir")
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--sections", type=int, default=8, help="sections per file")
+    parser.add_argument("--words", type=int, default=150, help="words per section")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+    if os.path.exists(args.output_dir) and os.listdir(args.output_dir):
+        print(f"Output directory is not empty: {args.output_dir}")
+        sys.exit(1)
+    print(generate(args.output_dir, args.files, args.sections, args.words, args.seed))
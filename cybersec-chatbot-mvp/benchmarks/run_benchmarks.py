@@ -0,0 +1,442 @@
+# benchmarks/run_benchmarks.py
+"""Reproducible performance benchmarks for the CyberMentor backend.
+
+Runs everything against a local fake OpenAI server (fake_openai.py) and a
+synthetic corpus (generate_corpus.py), so results do not depend on the
+network or on API quotas:
+
+1. ingestion: ContentProcessor.ingest_directory throughput, streaming
+   parsed and embedded files into the processed store
+2. cold start: CybersecurityChatbot creation plus load_processed_content in
+   a fresh process, first with an empty index and then with a warm one
+3. chat: time until a real uvicorn server is live (/health) and ready
+   (/ready), then /chat latency percentiles and requests/sec at each
+   concurrency level
+4. peak RSS of every phase, and of the API server's processes
+
+Results are written as JSON (default: benchmarks/results/<timestamp>.json)
+so runs can be compared later:
+
+    python benchmarks/run_benchmarks.py --files 200 --concurrency 1,8,32 --requests 200
+    python benchmarks/run_benchmarks.py --compare results/old.json results/new.json
+"""
+import os
+import sys
+import json
+import time
+import socket
+import shutil
+import asyncio
+import argparse
+import platform
+import tempfile
+import resource
+import subprocess
+import contextlib
+from typing import List, Dict, Optional
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.join(os.path.dirname(BENCHMARKS_DIR), "backend")
+PROCESSED_NAME = "ctf_primer_processed"
+
+QUESTIONS = [
+    "How do I get started with {}?",
+    "Can you explain {} for a beginner?",
+    "What tools help with {} challenges?",
+    "Give me a hint about {} in a CTF",
+]
+KEYWORDS = ["rsa", "sql injection", "buffer overflow", "steganography", "ghidra", "nmap", "xss", "aes", "heap", "pcap"]
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _peak_rss_mb() -> float:
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _process_peak_rss_mb(pid: int) -> Optional[float]:
+    """Peak RSS (VmHWM) of another process, Linux only"""
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def _child_pids(pid: int) -> List[int]:
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", "r") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def _backend_env(workdir: str, openai_port: int, args) -> Dict[str, str]:
+    """Environment for backend code: fake OpenAI, all state inside workdir"""
+    env = dict(os.environ)
+    env.update({
+        "PYTHONPATH": BACKEND_DIR,
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": f"http://127.0.0.1:{openai_port}/v1",
+        "CONTENT_PATH": os.path.join(workdir, "content", "processed"),
+        "CHROMA_DB_PATH": os.path.join(workdir, "data", "chromadb"),
+        "RETRIEVAL_BACKEND": args.backend,
+        "EMBEDDING_PROVIDER": args.embedding_provider,
+        "WEB_CONCURRENCY": str(args.workers),
+        "ANONYMIZED_TELEMETRY": "False"
+    })
+    return env
+
+
+def _run_phase(phase: str, workdir: str, env: Dict[str, str]) -> Dict:
+    """Run one phase in a fresh interpreter and return the JSON it prints last"""
+    result = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--phase", phase, "--workdir", workdir],
+        cwd=workdir, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Phase {phase} failed:\n{result.stderr[-4000:]}")
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+# Phases (run inside a child process started by _run_phase)
+
+def phase_ingest(workdir: str) -> Dict:
+    from content_processor import ContentProcessor
+
+    processor = ContentProcessor()
+    primer_path = os.path.join(workdir, "content", "raw", "ctf-primer")
+    output_path = os.path.join(workdir, "content", "processed", PROCESSED_NAME)
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        start = time.perf_counter()
+        result = processor.ingest_directory(primer_path, output_path, full=True)
+        process_seconds = time.perf_counter() - start
+    sections = result["stats"]["sections_embedded"]
+    return {
+        "files": result["files"],
+        "sections": sections,
+        "process_seconds": round(process_seconds, 3),
+        "files_per_sec": round(result["files"] / process_seconds, 2),
+        "sections_per_sec": round(sections / process_seconds, 2),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+def phase_load(workdir: str) -> Dict:
+    start = time.perf_counter()
+    from app.chatbot import CybersecurityChatbot
+    import_seconds = time.perf_counter() - start
+
+    with contextlib.redirect_stdout(open(os.devnull, "w")):
+        start = time.perf_counter()
+        chatbot = CybersecurityChatbot()
+        init_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        chatbot.load_processed_content(os.path.join(workdir, "content", "processed", PROCESSED_NAME))
+        load_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        results = chatbot.search_relevant_content("How does an RSA modulus work?")
+        first_query_seconds = time.perf_counter() - start
+    return {
+        "import_seconds": round(import_seconds, 3),
+        "init_seconds": round(init_seconds, 3),
+        "load_seconds": round(load_seconds, 3),
+        "first_query_seconds": round(first_query_seconds, 3),
+        "sections_indexed": chatbot.retriever.count(),
+        "first_query_results": len(results["ids"][0]),
+        "peak_rss_mb": _peak_rss_mb()
+    }
+
+
+PHASES = {"ingest": phase_ingest, "load": phase_load}
+
+
+# Chat load test
+
+async def _load_level(base_url: str, concurrency: int, requests: int, offset: int, repeat_ratio: float) -> Dict:
+    import httpx
+
+    latencies = []
+    errors = 0
+    next_request = 0
+
+    def message(i: int) -> str:
+        # Every 1/repeat_ratio-th request repeats an earlier question to exercise the caches
+        if repeat_ratio > 0 and i % max(1, int(round(1 / repeat_ratio))) == 0:
+            i = 0
+        question = QUESTIONS[i % len(QUESTIONS)].format(KEYWORDS[(i // len(QUESTIONS)) % len(KEYWORDS)])
+        return f"{question} (request {i})" if i else question
+
+    async def worker(client):
+        nonlocal next_request, errors
+        while next_request < requests:
+            i = offset + next_request
+            next_request += 1
+            start = time.perf_counter()
+            try:
+                response = await client.post("/chat", json={"message": message(i)})
+                response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except Exception:
+                errors += 1
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+        "requests_per_sec": round(len(latencies) / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "p50": round(_percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 1),
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0
+        }
+    }
+
+
+def _wait_for(url: str, process: subprocess.Popen, timeout: float = 120, interval: float = 0.2):
+    import httpx
+
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited early while waiting for {url}")
+        try:
+            if httpx.get(url, timeout=10).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(interval)
+    raise RuntimeError(f"Timed out waiting for {url}")
+
+
+def _stop(process: subprocess.Popen):
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def bench_chat(workdir: str, env: Dict[str, str], args) -> Dict:
+    import httpx
+
+    port = _free_port()
+    start = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(args.workers), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        _wait_for(f"{base_url}/health", server, interval=0.02)
+        startup = {"time_to_live_seconds": round(time.perf_counter() - start, 3)}
+        _wait_for(f"{base_url}/ready", server, interval=0.02)
+        startup["time_to_ready_seconds"] = round(time.perf_counter() - start, 3)
+        # Stage timings as measured by the worker that answered
+        startup["server"] = httpx.get(f"{base_url}/ready", timeout=10).json()
+        print(f"  live after {startup['time_to_live_seconds']}s, ready after {startup['time_to_ready_seconds']}s")
+        # Make sure every worker has warmed up before measuring
+        asyncio.run(_load_level(base_url, max(1, args.workers) * 2, max(1, args.workers) * 4, 10 ** 6, 0.0))
+
+        levels = []
+        offset = 0
+        for concurrency in args.concurrency:
+            level = asyncio.run(_load_level(base_url, concurrency, args.requests, offset, args.repeat_ratio))
+            offset += args.requests
+            print(f"  concurrency {concurrency:>4}: {level['requests_per_sec']:>8} req/s  "
+                  f"p50 {level['latency_ms']['p50']}ms  p95 {level['latency_ms']['p95']}ms  "
+                  f"p99 {level['latency_ms']['p99']}ms  errors {level['errors']}")
+            levels.append(level)
+
+        pids = [server.pid] + _child_pids(server.pid)
+        rss = {str(pid): _process_peak_rss_mb(pid) for pid in pids}
+        try:
+            server_metrics = httpx.get(f"{base_url}/health", timeout=10).json().get("caches")
+        except Exception:
+            server_metrics = None
+        return {
+            "startup": startup,
+            "levels": levels,
+            "server_peak_rss_mb": rss,
+            "server_peak_rss_total_mb": round(sum(value for value in rss.values() if value), 1),
+            "caches": server_metrics
+        }
+    finally:
+        _stop(server)
+
+
+# Runner
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return None
+
+
+def run(args) -> Dict:
+    import httpx
+    sys.path.insert(0, BENCHMARKS_DIR)
+    from generate_corpus import generate
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="cybermentor-bench-")
+    primer_path = os.path.join(workdir, "content", "raw", "ctf-primer")
+    if os.path.exists(primer_path):
+        shutil.rmtree(primer_path)
+    for name in ("content/processed", "data"):
+        shutil.rmtree(os.path.join(workdir, name), ignore_errors=True)
+    os.makedirs(os.path.join(workdir, "content", "processed"))
+
+    results = {
+        "meta": {
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "params": {key: value for key, value in vars(args).items() if key not in ("phase", "compare")}
+        }
+    }
+
+    print(f"Generating corpus in {primer_path}")
+    results["corpus"] = generate(primer_path, args.files, args.sections, args.words, args.seed)
+
+    openai_port = _free_port()
+    fake_env = dict(os.environ, FAKE_OPENAI_EMBEDDING_LATENCY_MS=str(args.embedding_latency_ms),
+                    FAKE_OPENAI_CHAT_LATENCY_MS=str(args.chat_latency_ms))
+    fake_openai = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "fake_openai:app", "--host", "127.0.0.1", "--port", str(openai_port),
+         "--log-level", "warning"],
+        cwd=BENCHMARKS_DIR, env=fake_env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE
+    )
+    try:
+        _wait_for(f"http://127.0.0.1:{openai_port}/health", fake_openai)
+        env = _backend_env(workdir, openai_port, args)
+
+        print("Benchmarking ingestion")
+        results["ingestion"] = _run_phase("ingest", workdir, env)
+        print(f"  {results['ingestion']['sections_per_sec']} sections/sec, "
+              f"peak RSS {results['ingestion']['peak_rss_mb']} MB")
+
+        print("Benchmarking cold start")
+        results["cold_start"] = {
+            "empty_index": _run_phase("load", workdir, env),
+            "warm_index": _run_phase("load", workdir, env)
+        }
+        for name, phase in results["cold_start"].items():
+            print(f"  {name}: load {phase['load_seconds']}s, first query {phase['first_query_seconds']}s, "
+                  f"peak RSS {phase['peak_rss_mb']} MB")
+
+        if args.concurrency:
+            print("Benchmarking /chat")
+            results["chat"] = bench_chat(workdir, env, args)
+        results["openai_calls"] = httpx.get(f"http://127.0.0.1:{openai_port}/calls", timeout=10).json()
+    finally:
+        _stop(fake_openai)
+        if not args.workdir and not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+
+def compare(old_path: str, new_path: str):
+    """Print the relative change of the headline numbers between two result files"""
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+
+    rows = [
+        ("ingestion sections/sec", lambda r: r["ingestion"]["sections_per_sec"]),
+        ("ingestion peak RSS MB", lambda r: r["ingestion"]["peak_rss_mb"]),
+        ("cold start load s (empty index)", lambda r: r["cold_start"]["empty_index"]["load_seconds"]),
+        ("cold start load s (warm index)", lambda r: r["cold_start"]["warm_index"]["load_seconds"]),
+        ("cold start peak RSS MB", lambda r: r["cold_start"]["warm_index"]["peak_rss_mb"]),
+        ("server time to ready s", lambda r: r["chat"]["startup"]["time_to_ready_seconds"]),
+    ]
+    for level in (new.get("chat") or {}).get("levels", []):
+        concurrency = level["concurrency"]
+
+        def pick(r, key, concurrency=concurrency):
+            return next(l for l in r["chat"]["levels"] if l["concurrency"] == concurrency)[key]
+
+        rows.append((f"chat c={concurrency} req/s", lambda r, pick=pick: pick(r, "requests_per_sec")))
+        for p in ("p50", "p95", "p99"):
+            rows.append((f"chat c={concurrency} {p} ms", lambda r, pick=pick, p=p: pick(r, "latency_ms")[p]))
+
+    for name, getter in rows:
+        try:
+            before, after = getter(old), getter(new)
+        except (KeyError, StopIteration, TypeError):
+            continue
+        change = f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+        print(f"{name:<34} {before:>10} -> {after:>10}  {change}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CyberMentor performance benchmarks")
+    parser.add_argument("--files", type=int, default=200, help="files in the synthetic corpus")
+    parser.add_argument("--sections", type=int, default=8, help="sections per file")
+    parser.add_argument("--words", type=int, default=150, help="words per section")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--concurrency", type=lambda value: [int(v) for v in value.split(",") if v], default=[1, 8, 32],
+                        help="comma separated /chat concurrency levels (empty to skip)")
+    parser.add_argument("--requests", type=int, default=200, help="/chat requests per concurrency level")
+    parser.add_argument("--repeat-ratio", type=float, default=0.0,
+                        help="fraction of /chat requests that repeat an earlier question")
+    parser.add_argument("--embedding-latency-ms", type=float, default=50)
+    parser.add_argument("--chat-latency-ms", type=float, default=300)
+    parser.add_argument("--backend", default="numpy", help="RETRIEVAL_BACKEND for the app")
+    parser.add_argument("--embedding-provider", default="openai", help="EMBEDDING_PROVIDER for the app (openai or local)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for the /chat benchmark")
+    parser.add_argument("--workdir", help="directory for corpus and state (default: a temporary directory)")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary directory")
+    parser.add_argument("--output", help="results file (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--phase", choices=sorted(PHASES), help=argparse.SUPPRESS)
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two results files")
+    args = parser.parse_args()
+
+    if args.phase:
+        print(json.dumps(PHASES[args.phase](args.workdir)))
+        sys.exit(0)
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    results = run(args)
+    output = args.output or os.path.join(BENCHMARKS_DIR, "results", f"{time.strftime('%Y%m%dT%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {output}")